@@ -1,6 +1,67 @@
 import numpy as np
 from scipy.signal import savgol_filter
+from .profiling import profiled
 
+def _density_ratio(density):
+    """
+    3点滑动平均后的密度比 rho_smooth[i-1] / rho_smooth[i+1]，对整个 (nt, nr) 数组计算
+    分母非正处与首末区域为0，边界处的平滑与 np.convolve(rho, np.ones(3)/3, mode='same') 的定义相同；
+    平滑逐项相乘再相加（不使用 FMA），结果只由这一种算法给出，不依赖 np.convolve 的实现
+    """
+    ratio = np.zeros_like(density)
+    if density.shape[1] < 3:
+        return ratio
+    w = np.ones(3) / 3
+    smooth = np.empty(density.shape, dtype=np.result_type(density, w))
+    smooth[:, 1:-1] = density[:, :-2] * w[0] + density[:, 1:-1] * w[1] + density[:, 2:] * w[2]
+    smooth[:, 0] = density[:, 0] * w[1] + density[:, 1] * w[0]
+    smooth[:, -1] = density[:, -2] * w[2] + density[:, -1] * w[1]
+    np.divide(smooth[:, :-2], smooth[:, 2:], out=ratio[:, 1:-1], where=smooth[:, 2:] > 0)
+    return ratio
+
+def _shock_front_indices(density, grad, ratio, density_threshold):
+    """
+    在整个 (nt, nr) 数组上选取每个时刻的冲击波所在区域下标
+    - 满足 grad<0 且 ratio>阈值 的区域中取梯度最小者，否则取全局最小梯度
+    """
+    valid = (grad < 0) & (ratio > density_threshold)
+    masked = np.where(valid, grad, np.inf)
+    idx = np.where(valid.any(axis=1), np.argmin(masked, axis=1), np.argmin(grad, axis=1))
+    return np.clip(idx, 0, density.shape[1] - 1)
+
+def _shock_front_radius(radius_edges, idx, nt):
+    """按 radius_edges 的三种布局把区域下标换算为半径"""
+    rows = np.arange(nt)
+    if radius_edges.shape[0] == nt + 1:
+        r = 0.5 * (radius_edges[rows, idx] + radius_edges[rows, idx + 1])
+    elif radius_edges.shape[1] == nt:
+        r = radius_edges[idx, rows]
+    else:
+        r = radius_edges[rows, idx]
+    return np.asarray(r, dtype=float)
+
+@profiled('analysis.shock_front_rows')
+def shock_front_rows(density, radius_edges, density_threshold=1.1):
+    '''
+    逐时刻的冲击波半径（不替换第一个时刻），可对时间分块后的数据分别调用再拼接
+    - density_threshold: 单个阈值返回 shape (nt,)，阈值序列返回 shape (n_thresholds, nt)
+    其余参数含义同 detect_shock_front
+    '''
+    density = np.asarray(density)
+    radius_edges = np.asarray(radius_edges)
+    thresholds = np.atleast_1d(density_threshold)
+    nt = density.shape[0]
+    if nt == 0:
+        rows = np.zeros((len(thresholds), 0))
+    else:
+        # 梯度与密度比与阈值无关，只计算一次
+        grad = np.gradient(density, axis=1)
+        ratio = _density_ratio(density)
+        rows = np.array([_shock_front_radius(radius_edges, _shock_front_indices(density, grad, ratio, thr), nt)
+                         for thr in thresholds])
+    return rows if np.ndim(density_threshold) else rows[0]
+
+@profiled('analysis.detect_shock_front')
 def detect_shock_front(density, radius_edges, time_edges, density_threshold=1.1):
     '''
     检测主冲击波界面轨迹，返回每个时刻的冲击波半径坐标数组
@@ -8,61 +69,194 @@ def detect_shock_front(density, radius_edges, time_edges, density_threshold=1.1)
     - radius_edges: shape (nt, nr+1) 或 (nr+1, nt) 或 (nt, nr)
     - time_edges: shape (nt+1,)
     - density_threshold: 密度跳跃阈值
+    梯度、平滑、密度比与下标选取均在整个 (nt, nr) 数组上一次完成
     返回: shock_pos, shape (nt,)
     '''
-    shock_pos = []
-    nt = density.shape[0]
-    for t in range(nt):
-        rho = density[t, :]
-        grad = np.gradient(rho)
-        max_neg_grad_idx = np.argmin(grad)
-        rho_smooth = np.convolve(rho, np.ones(3)/3, mode='same')
-        density_ratio = np.zeros_like(rho)
-        for i in range(1, len(rho)-1):
-            if rho_smooth[i+1] > 0:
-                density_ratio[i] = rho_smooth[i-1] / rho_smooth[i+1]
-        valid_indices = np.where((grad < 0) & (density_ratio > density_threshold))[0]
-        if len(valid_indices) > 0:
-            local_grad = grad[valid_indices]
-            relative_idx = np.argmin(local_grad)
-            idx = valid_indices[relative_idx]
-        else:
-            idx = max_neg_grad_idx if grad[max_neg_grad_idx] < 0 else np.argmin(grad)
-        idx = max(0, min(idx, len(rho)-1))
-        # 计算对应的半径位置
-        if radius_edges.shape[0] == density.shape[0] + 1:
-            r = 0.5 * (radius_edges[t, idx] + radius_edges[t, idx+1])
-        elif radius_edges.shape[1] == density.shape[0]:
-            r = radius_edges[idx, t]
-        else:
-            r = radius_edges[t, idx]
-        shock_pos.append(r)
+    shock_pos = shock_front_rows(density, radius_edges, density_threshold)
     # 替换第一个为0
     if len(shock_pos) > 0:
         shock_pos[0] = 0
-    return np.array(shock_pos)
+    return shock_pos
+
+@profiled('analysis.detect_shock_fronts')
+def detect_shock_fronts(density, radius_edges, time_edges, density_thresholds):
+    '''
+    一次扫描多个密度跳跃阈值，检验冲击波轨迹对阈值的敏感性
+    - density_thresholds: 阈值序列
+    梯度与平滑后的密度比只计算一次，各阈值只重复掩码与下标选取
+    返回: shock_pos, shape (n_thresholds, nt)，每行与 detect_shock_front 的结果相同
+    '''
+    shock_pos = shock_front_rows(density, radius_edges, np.asarray(density_thresholds, dtype=float).ravel())
+    # 替换第一个为0
+    if shock_pos.shape[1] > 0:
+        shock_pos[:, 0] = 0
+    return shock_pos
+
+@profiled('analysis.smooth_series')
+def smooth_series(values, window_length=11, polyorder=3):
+    """
+    用savgol_filter平滑时间序列（最后一维为时间）
+    window_length 自动调整为不超过序列长度的奇数
+    """
+    n = np.shape(values)[-1]
+    # window_length必须为奇数且小于等于序列长度
+    wl = min(window_length, n if n%2==1 else n-1)
+    if wl < 3: wl = 3
+    if wl % 2 == 0: wl += 1
+    return savgol_filter(values, window_length=wl, polyorder=polyorder)
 
+@profiled('analysis.max_pressure')
 def max_pressure(pressure, smooth=True, window_length=11, polyorder=3):
     """
     计算每个时刻的最大压力，并可选用savgol_filter平滑
     """
     max_p = np.max(pressure, axis=1)
     if smooth:
-        # window_length必须为奇数且小于等于max_p长度
-        wl = min(window_length, len(max_p) if len(max_p)%2==1 else len(max_p)-1)
-        if wl < 3: wl = 3
-        if wl % 2 == 0: wl += 1
-        return savgol_filter(max_p, window_length=wl, polyorder=polyorder)
+        return smooth_series(max_p, window_length, polyorder)
     return max_p
 
+@profiled('analysis.max_density')
 def max_density(mass_density, smooth=True, window_length=11, polyorder=3):
     """
     计算每个时刻的最大质量密度，并可选用savgol_filter平滑
     """
     max_d = np.max(mass_density, axis=1)
     if smooth:
-        wl = min(window_length, len(max_d) if len(max_d)%2==1 else len(max_d)-1)
-        if wl < 3: wl = 3
-        if wl % 2 == 0: wl += 1
-        return savgol_filter(max_d, window_length=wl, polyorder=polyorder)
-    return max_d 
\ No newline at end of file
+        return smooth_series(max_d, window_length, polyorder)
+    return max_d
+
+def shock_breakout_time(shock_pos, time, rear_radius):
+    """
+    冲击波到达靶后表面的时刻
+    - shock_pos: shape (nt,) 冲击波半径（沿半径增大方向传播）
+    - time: shape (nt,)
+    - rear_radius: 标量或 shape (nt,)，后表面最后一个区域的内边界
+    第一个时刻（强制为0）不参与判断；冲击波未到达时返回 nan
+    """
+    shock_pos = np.asarray(shock_pos)
+    reached = np.nonzero(shock_pos[1:] >= np.broadcast_to(rear_radius, shock_pos.shape)[1:])[0]
+    if len(reached) == 0:
+        return np.nan
+    return float(np.asarray(time)[reached[0] + 1])
+
+# 逐时刻统计量 -> 额外需要的字段
+REDUCTION_STATS = {
+    'max': (),
+    'min': (),
+    'argmax_radius': ('zone_boundaries',),
+    'argmin_radius': ('zone_boundaries',),
+    'mass_mean': ('zone_mass',),
+    'volume_integral': ('volume',),
+}
+
+def _parse_stat(stat):
+    """'max:pressure' 或 ('max', 'pressure') -> ('max', 'pressure')"""
+    name, field = stat.split(':') if isinstance(stat, str) else stat
+    if name not in REDUCTION_STATS:
+        raise ValueError(f"未知的统计量: {name}，可选 {', '.join(REDUCTION_STATS)}")
+    return name, field
+
+def _reduce_chunk(name, values, chunk):
+    """对一个时间块计算单个统计量，返回 shape (块内时间步数,)"""
+    if name == 'max':
+        return np.max(values, axis=1)
+    if name == 'min':
+        return np.min(values, axis=1)
+    if name in ('argmax_radius', 'argmin_radius'):
+        idx = np.argmax(values, axis=1) if name == 'argmax_radius' else np.argmin(values, axis=1)
+        zb = chunk['zone_boundaries']
+        rows = np.arange(len(idx))
+        # 区域中心半径
+        return 0.5 * (zb[rows, idx] + zb[rows, idx + 1])
+    if name == 'mass_mean':
+        mass = np.broadcast_to(chunk['zone_mass'], values.shape)
+        return np.sum(values * mass, axis=1) / np.sum(mass, axis=1)
+    if name == 'volume_integral':
+        return np.sum(values * chunk['volume'], axis=1)
+
+@profiled('analysis.reduce_fields')
+def reduce_fields(helios_data, stats, smooth=False, window_length=11, polyorder=3):
+    """
+    一次遍历计算多个字段的逐时刻统计量
+    - helios_data: HeliosData，分块模式下按时间块流式计算
+    - stats: 统计量列表，每项为 'max:pressure' 或 ('mass_mean', 'ion_temperature')
+      可选统计量: max, min, argmax_radius/argmin_radius（极值所在区域中心半径），
+      mass_mean（以 zone_mass 加权的平均）, volume_integral（乘以 volume 求和）
+    - smooth: 是否对全部结果用一次批量 savgol_filter 平滑
+    返回: {'统计量_字段': shape (nt,) 数组}，例如 'max_pressure'
+    """
+    specs = [_parse_stat(stat) for stat in stats]
+    if not specs:
+        return {}
+    names = {field for _, field in specs}
+    for stat, _ in specs:
+        names.update(REDUCTION_STATS[stat])
+    parts = {spec: [] for spec in specs}
+    for _, chunk in helios_data.iter_chunks(*sorted(names)):
+        for stat, field in specs:
+            parts[(stat, field)].append(_reduce_chunk(stat, chunk[field], chunk))
+    series = np.array([np.concatenate(parts[spec]) for spec in specs], dtype=float)
+    if smooth:
+        series = smooth_series(series, window_length, polyorder)
+    return {f"{stat}_{field}": values for (stat, field), values in zip(specs, series)}
+
+def _interp_rows(x, xp, fp):
+    '''
+    逐行线性插值（每行各自的 xp），一次 searchsorted 完成全部行
+    - x: 共用的插值点 shape (m,)；xp: 每行单调递增 shape (nt, n)；fp: shape (nt, n)
+    超出每行范围的点取端点值，返回 shape (nt, m)
+    '''
+    nt, n = xp.shape
+    lo = min(xp.min(), x.min())
+    span = 2 * (max(xp.max(), x.max()) - lo) + 1
+    # 每行加上不同的偏移，拼接后整体单调，可以一次 searchsorted
+    shift = np.arange(nt)[:, None] * span
+    flat = (xp - lo + shift).ravel()
+    idx = np.searchsorted(flat, (x[None, :] - lo + shift).ravel(), side='right').reshape(nt, -1)
+    k = np.clip(idx - np.arange(nt)[:, None] * n - 1, 0, n - 2)
+    x0 = np.take_along_axis(xp, k, axis=1)
+    x1 = np.take_along_axis(xp, k + 1, axis=1)
+    f0 = np.take_along_axis(fp, k, axis=1)
+    f1 = np.take_along_axis(fp, k + 1, axis=1)
+    width = x1 - x0
+    frac = np.divide(x[None, :] - x0, width, out=np.zeros(width.shape), where=width > 0)
+    return f0 + np.clip(frac, 0, 1) * (f1 - f0)
+
+@profiled('analysis.remap_rows')
+def remap_rows(values, zone_boundaries, weights, grid_edges, return_weights=False):
+    '''
+    把 Lagrange 网格上的场守恒地投影到固定半径网格
+    - values: shape (nt, nr)；zone_boundaries: 每个时刻的区域边界 shape (nt, nr+1)
+    - weights: 每个区域的权重（zone_mass 或 volume），shape (nt, nr) 或 (nr,)
+    - grid_edges: 固定网格边界 shape (m+1,)，升序
+    每个区域内权重沿半径均匀分布；目标单元的值为重叠部分的加权平均，
+    因此 sum(结果 * 目标单元权重) 等于网格覆盖范围内的 sum(values * weights)
+    没有物质的目标单元为 nan。返回 shape (nt, m)，return_weights 时同时返回目标单元权重
+    '''
+    values = np.asarray(values, dtype=float)
+    weights = np.broadcast_to(weights, values.shape)
+    grid_edges = np.asarray(grid_edges, dtype=float)
+    nt, nr = values.shape
+    # 累积量在区域边界处分段线性，插值到网格边界后差分即得每个目标单元的量
+    cum_w = np.zeros((nt, nr + 1))
+    np.cumsum(weights, axis=1, out=cum_w[:, 1:])
+    cum_q = np.zeros((nt, nr + 1))
+    np.cumsum(values * weights, axis=1, out=cum_q[:, 1:])
+    w = np.diff(_interp_rows(grid_edges, zone_boundaries, cum_w), axis=1)
+    q = np.diff(_interp_rows(grid_edges, zone_boundaries, cum_q), axis=1)
+    out = np.divide(q, w, out=np.full(w.shape, np.nan), where=w > 0)
+    return (out, w) if return_weights else out
+
+def lineout(remapped, grid_edges, radius):
+    '''
+    固定半径处的时间序列
+    - remapped: remap_rows 的结果 shape (nt, m)；grid_edges: shape (m+1,)
+    - radius: 标量或序列；单个半径返回 shape (nt,)，序列返回 shape (n, nt)
+    取半径所在的网格单元，超出网格范围时为 nan
+    '''
+    radius = np.asarray(radius, dtype=float)
+    idx = np.searchsorted(grid_edges, np.atleast_1d(radius), side='right') - 1
+    inside = (idx >= 0) & (idx < remapped.shape[1])
+    out = np.full((len(idx), remapped.shape[0]), np.nan)
+    out[inside] = remapped[:, idx[inside]].T
+    return out if radius.ndim else out[0]
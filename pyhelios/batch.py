@@ -0,0 +1,221 @@
+"""
+多个 HELIOS 结果文件的批量分析
+每个文件在独立进程中处理，得到一行汇总结果，每完成一个即追加到 CSV，全部完成后整理为每个文件一行；
+已成功处理、源文件未改变且统计参数相同的文件在重新运行时跳过，其余文件重新处理后替换原来的行
+
+命令行用法:
+    python -m pyhelios.batch runs/ -o summary.csv -j 8 --density-threshold 2
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .analysis import shock_breakout_time
+from .config import get_default_config
+from .core import PyHelios
+
+REDUCTIONS = ('peak_pressure', 'peak_density', 'shock_trajectory', 'shock_breakout_time')
+
+COLUMNS = ('file', 'size', 'mtime_ns', 'params', 'status', 'error', 'n_times',
+           'peak_pressure', 'peak_pressure_time', 'peak_density', 'peak_density_time',
+           'shock_final_radius', 'shock_mean_velocity', 'shock_track_file', 'shock_breakout_time')
+
+
+def summarize_run(file_path, reductions=REDUCTIONS, density_threshold=1.1, track_dir=None, config=None,
+                  helios=None, **helios_kwargs):
+    """
+    处理单个文件并返回汇总行（dict），异常不会抛出，而是记录在 status/error 中
+    - reductions: REDUCTIONS 的子集
+    - track_dir: 冲击波轨迹 (time, shock_pos) 保存为 .npy 的目录
+    - helios: 已打开并处理的 PyHelios，None 时打开 file_path
+    - helios_kwargs: 传给 PyHelios 的选择/分块/缓存参数
+    """
+    row = {'file': os.path.abspath(file_path), 'status': 'ok'}
+    try:
+        st = os.stat(file_path)
+        row.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        if helios is None:
+            helios = PyHelios(file_path, config=config, **helios_kwargs)
+            helios.load_and_process()
+        time = np.asarray(helios.get('time_whole'))
+        row['n_times'] = len(time)
+        if 'peak_pressure' in reductions:
+            series = helios.get('max_pressure', smooth=False)
+            row['peak_pressure'] = float(np.max(series))
+            row['peak_pressure_time'] = float(time[np.argmax(series)])
+        if 'peak_density' in reductions:
+            series = helios.get('max_density', smooth=False)
+            row['peak_density'] = float(np.max(series))
+            row['peak_density_time'] = float(time[np.argmax(series)])
+        if 'shock_trajectory' in reductions or 'shock_breakout_time' in reductions:
+            shock_pos = np.asarray(helios.get('shock_pos', density_threshold=density_threshold))
+        if 'shock_trajectory' in reductions:
+            row['shock_final_radius'] = float(shock_pos[-1])
+            if len(time) > 2:
+                # 第一个时刻强制为0，从第二个时刻起算；um/ns 即 km/s
+                row['shock_mean_velocity'] = float((shock_pos[-1] - shock_pos[1]) / (time[-1] - time[1]))
+            if track_dir:
+                os.makedirs(track_dir, exist_ok=True)
+                track_file = os.path.join(track_dir, os.path.splitext(os.path.basename(file_path))[0] + '.npy')
+                np.save(track_file, np.vstack((time, shock_pos)))
+                row['shock_track_file'] = track_file
+        if 'shock_breakout_time' in reductions:
+            # 后表面为最外侧区域的内边界
+            rear_radius = np.asarray(helios.get('zone_boundaries'))[:, -2]
+            row['shock_breakout_time'] = shock_breakout_time(shock_pos, time, rear_radius)
+    except Exception as exc:
+        row['status'] = 'error'
+        row['error'] = f"{type(exc).__name__}: {exc}"
+        row['traceback'] = traceback.format_exc()
+    return row
+
+
+def find_runs(paths, pattern='*.exo'):
+    """展开文件与目录参数，目录中按 pattern 查找"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '**', pattern), recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
+def read_summary(output):
+    """读取已有的汇总 CSV，返回行列表；同一文件有多行时（追加后未整理）只保留最后一行"""
+    if not os.path.exists(output):
+        return []
+    with open(output, newline='') as f:
+        return list({row['file']: row for row in csv.DictReader(f)}.values())
+
+
+def write_summary(output, rows):
+    """以原子替换的方式写出汇总 CSV"""
+    directory = os.path.dirname(os.path.abspath(output))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.csv.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp, output)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _append_summary(output, row):
+    """向汇总 CSV 追加一行"""
+    with open(output, 'a', newline='') as f:
+        csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore').writerow(row)
+
+
+def _params_key(reductions, density_threshold, helios_kwargs):
+    """影响汇总结果的参数（统计量、阈值、数据选择与精度）的摘要，记录在每行的 params 列"""
+    params = {key: value for key, value in helios_kwargs.items() if key not in ('chunk_size', 'cache')}
+    params.update(reductions=sorted(reductions), density_threshold=density_threshold)
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def _is_done(row, params):
+    """汇总中记录为成功、源文件未改变且统计参数相同"""
+    try:
+        st = os.stat(row['file'])
+    except OSError:
+        return False
+    return row.get('status') == 'ok' and row.get('params') == params \
+        and str(st.st_size) == row.get('size') and str(st.st_mtime_ns) == row.get('mtime_ns')
+
+
+def run_batch(files, output, reductions=REDUCTIONS, workers=None, density_threshold=1.1, track_dir=None,
+              config=None, progress=None, **helios_kwargs):
+    """
+    用进程池并行处理多个文件，每完成一个即追加到 output (CSV)，结束时整理为每个文件一行，
+    重新处理的文件替换原有的行；统计参数改变后已有的行不再视为完成
+    - workers: 进程数，None 为 CPU 数，1 时在当前进程中顺序执行
+    - track_dir: 冲击波轨迹输出目录，默认为 output 旁的 <名称>_shock_tracks
+    - progress: 可选回调 progress(row, n_done, n_total)
+    返回本次处理得到的行
+    """
+    unknown = set(reductions) - set(REDUCTIONS)
+    if unknown:
+        raise ValueError(f"未知的统计量: {', '.join(sorted(unknown))}")
+    if track_dir is None:
+        track_dir = os.path.splitext(output)[0] + '_shock_tracks'
+    # 文件 -> 行，保持原有顺序
+    summary = {row['file']: row for row in read_summary(output)}
+    params = _params_key(reductions, density_threshold, helios_kwargs)
+    done = {file for file, row in summary.items() if _is_done(row, params)}
+    todo = [f for f in files if os.path.abspath(f) not in done]
+    kwargs = dict(reductions=tuple(reductions), density_threshold=density_threshold, track_dir=track_dir,
+                  config=config, **helios_kwargs)
+    rows = []
+    write_summary(output, summary.values())
+
+    def record(row):
+        # 每个文件只追加一行，不重写整个文件；结束时再整理
+        row['params'] = params
+        summary[row['file']] = row
+        _append_summary(output, row)
+        rows.append(row)
+        if progress:
+            progress(row, len(rows), len(todo))
+
+    try:
+        if workers == 1:
+            for file_path in todo:
+                record(summarize_run(file_path, **kwargs))
+            return rows
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(summarize_run, file_path, **kwargs): file_path for file_path in todo}
+            for future in as_completed(futures):
+                try:
+                    row = future.result()
+                except Exception as exc:
+                    # 工作进程异常退出等情况
+                    row = {'file': os.path.abspath(futures[future]), 'status': 'error',
+                           'error': f"{type(exc).__name__}: {exc}"}
+                record(row)
+        return rows
+    finally:
+        if rows:
+            write_summary(output, summary.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量分析 HELIOS 结果文件")
+    parser.add_argument('paths', nargs='+', help=".exo 文件或包含它们的目录")
+    parser.add_argument('-o', '--output', default='pyhelios_summary.csv', help="汇总 CSV 文件")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="并行进程数")
+    parser.add_argument('--pattern', default='*.exo', help="目录中查找文件的模式")
+    parser.add_argument('--reductions', default=','.join(REDUCTIONS), help="逗号分隔的统计量")
+    parser.add_argument('--density-threshold', type=float, default=1.1)
+    parser.add_argument('--chunk-size', type=int, default=None, help="分块模式下每块的时间步数")
+    parser.add_argument('--cache', action='store_true', help="使用处理后数据的磁盘缓存")
+    parser.add_argument('--compact', action='store_true', help="状态量以 float32 保存，降低内存占用")
+    args = parser.parse_args(argv)
+
+    files = find_runs(args.paths, args.pattern)
+    reductions = [r.strip() for r in args.reductions.split(',') if r.strip()]
+
+    def progress(row, n_done, n_total):
+        print(f"[{n_done}/{n_total}] {row['status']:5s} {row['file']} {row.get('error') or ''}".rstrip())
+
+    rows = run_batch(files, args.output, reductions=reductions, workers=args.workers,
+                     density_threshold=args.density_threshold, config=get_default_config(),
+                     progress=progress, chunk_size=args.chunk_size, cache=args.cache, compact=args.compact)
+    failed = sum(row['status'] != 'ok' for row in rows)
+    print(f"完成 {len(rows) - failed} 个，失败 {failed} 个，结果写入 {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+"""
+规模基准
+在不同 (nt, nr) 规模的合成数据上测量读取、处理、冲击波检测、归约与绘图各阶段的耗时与峰值内存，
+并检查检测到的冲击波是否与埋入的轨迹一致；可与保存的基准结果比较以发现性能退化
+
+命令行用法:
+    python -m pyhelios.benchmark --scales small,medium --repeat 3 -o bench.json
+    python -m pyhelios.benchmark --baseline bench.json --tolerance 1.5
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from .profiling import PROFILER
+
+# 规模名 -> (nt, nr)
+SCALES = {
+    'small': (200, 100),
+    'medium': (1000, 400),
+    'large': (4000, 1000),
+}
+
+STAGES = ('load', 'process', 'shock', 'reductions', 'render')
+
+
+def measure(fn, name='benchmark.measure'):
+    """
+    执行 fn()，返回 (结果, 秒, 峰值字节)；峰值由 tracemalloc 统计（包含 numpy 数组的分配）
+    已在统计时不启动/停止 tracemalloc：profile 内存模式下作为阶段 name 记录并取其峰值，
+    其他情况下峰值只取前后的内存差
+    """
+    if PROFILER.memory:
+        with PROFILER.stage(name) as args:
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+        return result, elapsed, args['peak_bytes']
+    if tracemalloc.is_tracing():
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        return result, elapsed, max(tracemalloc.get_traced_memory()[0] - before, 0)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _stages(path, config, helios_kwargs):
+    """按顺序返回 (阶段名, 函数)，后面的阶段使用前面阶段的结果"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from .dataio import HeliosData
+    from .plotting import HeliosPlotter
+
+    helios = HeliosData(path, config, **helios_kwargs)
+    plotter = HeliosPlotter(config)
+
+    def render():
+        # 直接画到 Agg 画布，不经过 pyplot
+        fig = Figure(figsize=config.get('figsize'), dpi=config.get('dpi'))
+        FigureCanvasAgg(fig)
+        plotter.plot_density(helios, shocktrack=True, ax=fig.add_subplot())
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png')
+        return buf.tell()
+
+    def reductions():
+        return (helios.get('max_pressure'), helios.get('max_density'),
+                helios.get('reductions', stats=['max:pressure', 'argmax_radius:pressure', 'mass_mean:mass_density']))
+
+    return helios, [
+        ('load', helios.load),
+        ('process', lambda: (helios.process(), helios.prefetch())),
+        ('shock', lambda: helios.get('shock_pos')),
+        ('reductions', reductions),
+        ('render', render),
+    ]
+
+
+def run_scale(nt, nr, repeat=1, work_dir=None, config=None, tolerance=1.0, **helios_kwargs):
+    """
+    在一个规模上运行全部阶段
+    - repeat: 重复次数，耗时取最小值，峰值内存取最大值
+    - tolerance: 冲击波偏差允许的区域宽度数
+    - helios_kwargs: 传给 HeliosData 的参数（如 chunk_size/compact）
+    返回 {'nt', 'nr', 'stages': {阶段: {'time', 'peak_bytes'}}, 'shock_error', 'shock_ok'}
+    """
+    from .config import get_default_config
+    from .synthetic import shock_error, write_synthetic
+
+    config = config or get_default_config()
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        run = write_synthetic(os.path.join(tmp, f"synthetic_{nt}x{nr}.exo"), nt=nt, nr=nr)
+        stages = {name: {'time': np.inf, 'peak_bytes': 0} for name in STAGES}
+        for _ in range(repeat):
+            helios, steps = _stages(run.path, config, helios_kwargs)
+            for name, fn in steps:
+                _, elapsed, peak = measure(fn, f'benchmark.{name}')
+                stages[name]['time'] = min(stages[name]['time'], elapsed)
+                stages[name]['peak_bytes'] = max(stages[name]['peak_bytes'], peak)
+            error = shock_error(helios.get('shock_pos'), run, helios.get('zone_boundaries'))
+            if helios.raw_data is not None:
+                helios.raw_data.close()
+    return {'nt': nt, 'nr': nr, 'stages': stages, 'shock_error': float(np.max(error, initial=0.0)),
+            'shock_ok': bool(np.all(error <= tolerance))}
+
+
+def run_benchmarks(scales=('small', 'medium'), repeat=1, progress=None, **kwargs):
+    """运行多个规模（SCALES 中的名字或 (nt, nr)），返回 {规模名: run_scale 结果}"""
+    results = {}
+    for scale in scales:
+        nt, nr = SCALES[scale] if isinstance(scale, str) else scale
+        name = scale if isinstance(scale, str) else f"{nt}x{nr}"
+        results[name] = run_scale(nt, nr, repeat=repeat, **kwargs)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def compare(results, baseline, tolerance=1.5):
+    """
+    与基准结果比较，返回退化列表 [(规模, 阶段, 指标, 当前值, 基准值)]
+    耗时或峰值内存超过基准的 tolerance 倍即视为退化
+    """
+    regressions = []
+    for scale, result in results.items():
+        base = baseline.get(scale)
+        if base is None or (base['nt'], base['nr']) != (result['nt'], result['nr']):
+            continue
+        for stage, values in result['stages'].items():
+            for metric in ('time', 'peak_bytes'):
+                old = base['stages'].get(stage, {}).get(metric)
+                if old and values[metric] > tolerance * old:
+                    regressions.append((scale, stage, metric, values[metric], old))
+    return regressions
+
+
+def format_results(results):
+    """把结果格式化为文本表格"""
+    lines = [f"{'scale':>10} {'stage':>10} {'time (s)':>10} {'peak (MiB)':>11}"]
+    for scale, result in results.items():
+        for stage, values in result['stages'].items():
+            lines.append(f"{scale:>10} {stage:>10} {values['time']:>10.4f} {values['peak_bytes'] / 2 ** 20:>11.1f}")
+        status = 'ok' if result['shock_ok'] else 'FAILED'
+        lines.append(f"{scale:>10} {'shock':>10} max error {result['shock_error']:.2f} zones ({status})")
+    return '\n'.join(lines)
+
+
+def _parse_scale(text):
+    return text if text in SCALES else tuple(int(v) for v in text.split('x'))
+
+
+def main(argv=None):
+    import matplotlib
+    matplotlib.use('Agg')
+
+    parser = argparse.ArgumentParser(description="PyHelios 规模基准")
+    parser.add_argument('--scales', default='small,medium',
+                        help=f"逗号分隔的规模：{', '.join(SCALES)} 或 NTxNR（如 500x200）")
+    parser.add_argument('--repeat', type=int, default=1, help="重复次数，耗时取最小值")
+    parser.add_argument('-o', '--output', default=None, help="把结果保存为 JSON")
+    parser.add_argument('--baseline', default=None, help="与之比较的 JSON 结果")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="超过基准的倍数视为退化")
+    parser.add_argument('--chunk-size', type=int, default=None, help="分块模式每块的时间步数")
+    parser.add_argument('--compact', action='store_true', help="状态量以 float32 保存")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks([_parse_scale(s.strip()) for s in args.scales.split(',') if s.strip()],
+                             repeat=args.repeat, chunk_size=args.chunk_size, compact=args.compact)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = not all(r['shock_ok'] for r in results.values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for scale, stage, metric, value, old in regressions:
+            print(f"regression: {scale} {stage} {metric} {value:.4g} (baseline {old:.4g})")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
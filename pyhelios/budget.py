@@ -0,0 +1,137 @@
+"""
+能量与质量收支
+一次计算所有时刻的动能、热能（离子 + 电子）、辐射能与区域内质量、烧蚀质量等积分，
+可按区域下标或半径限定范围，分块模式下按时间块流式计算
+
+单位: 能量 J，质量与 zone_mass 相同（g）；字段单位见 HeliosData（速度 km/s、压力 Mbar、
+温度 eV、密度 g/cc、电子数密度 cm^-3），体积 = zone_mass / mass_density（cm^3）
+"""
+import numpy as np
+
+from .analysis import smooth_series
+from .profiling import profiled
+
+EV_TO_J = 1.602176634e-19
+EV_TO_K = 11604.518
+# 辐射常数 a，J cm^-3 K^-4
+RADIATION_CONSTANT = 7.5657e-22
+MBAR_TO_J_PER_CC = 1e5
+# g * (km/s)^2 -> J
+KINETIC_FACTOR = 1e3
+
+# 收支量 -> 所需字段
+BUDGET_QUANTITIES = {
+    'mass': ('zone_mass',),
+    'ablated_mass': ('zone_mass', 'zone_boundaries'),
+    'kinetic': ('zone_mass', 'fluid_velocity'),
+    # 理想气体估计 3/2 P V，包含离子与电子
+    'thermal': ('pressure', 'volume'),
+    'thermal_elec': ('elec_density', 'elec_temperature', 'volume'),
+    'thermal_ion': ('pressure', 'elec_density', 'elec_temperature', 'volume'),
+    'radiation': ('rad_temperature', 'volume'),
+    'total': ('zone_mass', 'fluid_velocity', 'pressure', 'rad_temperature', 'volume'),
+}
+
+DEFAULT_BUDGET = ('kinetic', 'thermal', 'radiation', 'total', 'mass')
+
+
+def zone_centers(zone_boundaries):
+    """区域中心半径 shape (nt, nr)"""
+    return 0.5 * (zone_boundaries[..., :-1] + zone_boundaries[..., 1:])
+
+
+def region_mask(shape, zone_boundaries=None, zones=None, r_range=None):
+    '''
+    区域掩码，shape (nt, nr) 的布尔数组（只有 zones 时为 (nr,)，可广播）
+    - zones: (起始, 结束) 区域下标，含起始不含结束，可用 None 表示不限
+    - r_range: (r_min, r_max) 半径范围（um），按每个时刻的区域中心判断
+    '''
+    nr = shape[-1]
+    mask = np.ones(nr, dtype=bool)
+    if zones is not None:
+        mask = np.zeros(nr, dtype=bool)
+        mask[slice(*zones)] = True
+    if r_range is not None:
+        centers = zone_centers(zone_boundaries)
+        lo = -np.inf if r_range[0] is None else r_range[0]
+        hi = np.inf if r_range[1] is None else r_range[1]
+        mask = mask & (centers >= lo) & (centers <= hi)
+    return mask
+
+
+def _zone_velocity(velocity, nr):
+    """HELIOS 的流体速度在节点上时取区域两端节点的平均"""
+    if velocity.shape[-1] == nr + 1:
+        return 0.5 * (velocity[..., :-1] + velocity[..., 1:])
+    return velocity
+
+
+def _densities(quantities, chunk, nr, ablation_radius):
+    """每个区域的收支量 {名称: shape (块内时间步数, nr)}，按需计算共用的中间量"""
+    parts = {}
+
+    def part(name):
+        if name in parts:
+            return parts[name]
+        if name == 'mass':
+            value = chunk['zone_mass']
+        elif name == 'ablated_mass':
+            if ablation_radius is None:
+                raise ValueError("ablated_mass 需要 ablation_radius")
+            value = np.where(zone_centers(chunk['zone_boundaries']) > ablation_radius, chunk['zone_mass'], 0.0)
+        elif name == 'kinetic':
+            v = _zone_velocity(chunk['fluid_velocity'], nr)
+            value = 0.5 * KINETIC_FACTOR * chunk['zone_mass'] * v * v
+        elif name == 'thermal':
+            value = 1.5 * MBAR_TO_J_PER_CC * chunk['pressure'] * chunk['volume']
+        elif name == 'thermal_elec':
+            value = 1.5 * EV_TO_J * chunk['elec_density'] * chunk['elec_temperature'] * chunk['volume']
+        elif name == 'thermal_ion':
+            value = part('thermal') - part('thermal_elec')
+        elif name == 'radiation':
+            t = chunk['rad_temperature'] * EV_TO_K
+            value = RADIATION_CONSTANT * t ** 4 * chunk['volume']
+        elif name == 'total':
+            value = part('kinetic') + part('thermal') + part('radiation')
+        else:
+            raise ValueError(f"未知的收支量: {name}，可选 {', '.join(BUDGET_QUANTITIES)}")
+        parts[name] = value
+        return value
+    return {name: part(name) for name in quantities}
+
+
+@profiled('analysis.energy_budget')
+def energy_budget(helios_data, quantities=DEFAULT_BUDGET, zones=None, r_range=None, ablation_radius=None,
+                  smooth=False, window_length=11, polyorder=3):
+    """
+    逐时刻的能量与质量积分
+    - helios_data: HeliosData，分块模式下按时间块流式计算
+    - quantities: BUDGET_QUANTITIES 中的名称
+      mass: 区域内质量；ablated_mass: 区域中心在 ablation_radius（um）之外的质量；
+      kinetic: 动能；thermal: 热能 3/2 P V；thermal_elec: 电子热能 3/2 n_e T_e V；
+      thermal_ion: 离子热能（thermal - thermal_elec）；radiation: 辐射能 a T_r^4 V；
+      total: kinetic + thermal + radiation
+    - zones/r_range: 限定区域，见 region_mask
+    - smooth: 是否用 savgol_filter 平滑
+    返回 {名称: shape (nt,) 数组}
+    """
+    quantities = tuple(quantities)
+    unknown = set(quantities) - set(BUDGET_QUANTITIES)
+    if unknown:
+        raise ValueError(f"未知的收支量: {', '.join(sorted(unknown))}，可选 {', '.join(BUDGET_QUANTITIES)}")
+    if not quantities:
+        return {}
+    # zone_mass 用于确定区域数（可能不随时间变化）
+    names = {'zone_mass'}.union(*(BUDGET_QUANTITIES[q] for q in quantities))
+    if r_range is not None:
+        names.add('zone_boundaries')
+    parts = {q: [] for q in quantities}
+    for rows, chunk in helios_data.iter_chunks(*sorted(names)):
+        shape = (rows.stop - rows.start, np.shape(chunk['zone_mass'])[-1])
+        mask = region_mask(shape, chunk.get('zone_boundaries'), zones, r_range)
+        for name, values in _densities(quantities, chunk, shape[1], ablation_radius).items():
+            parts[name].append(np.sum(np.where(mask, np.broadcast_to(values, shape), 0.0), axis=-1))
+    series = np.array([np.concatenate(parts[q]) for q in quantities], dtype=float)
+    if smooth:
+        series = smooth_series(series, window_length, polyorder)
+    return dict(zip(quantities, series))
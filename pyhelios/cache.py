@@ -0,0 +1,152 @@
+"""
+处理后数据的磁盘缓存
+每个缓存条目是一个目录：每个字段保存为一个 .npy 文件（可直接内存映射读取），
+meta.json 记录源文件身份（路径、大小、修改时间）与处理参数
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+
+def default_cache_dir():
+    """默认缓存目录，可由环境变量 PYHELIOS_CACHE_DIR 指定"""
+    return os.environ.get('PYHELIOS_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'pyhelios')
+
+
+def source_identity(file_path):
+    """源文件身份：绝对路径、大小与修改时间"""
+    st = os.stat(file_path)
+    return {'path': os.path.abspath(file_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _dir_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class CacheEntry:
+    """一个已完成写入的缓存条目"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+    def __contains__(self, name):
+        return os.path.exists(self._file(name))
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.npy")
+
+    def load(self, name, rows=None):
+        """内存映射读取一个数组，rows 为时间轴上的切片"""
+        values = np.load(self._file(name), mmap_mode='r')
+        return values if rows is None else values[rows]
+
+    def save(self, name, values):
+        """向条目追加一个数组（原子替换）"""
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.npy.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.asarray(values))
+        os.replace(tmp, self._file(name))
+
+    def touch(self):
+        """更新访问时间，供 LRU 淘汰使用"""
+        os.utime(self.path)
+
+
+class ProcessedCache:
+    """
+    处理后数据缓存
+    - cache_dir: 缓存目录，None 为 default_cache_dir()
+    - max_bytes: 缓存总大小上限，超出时按最近访问时间淘汰最旧的条目
+    """
+    def __init__(self, cache_dir=None, max_bytes=10 * 1024 ** 3):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(self, file_path, params=None):
+        """由源文件身份与处理参数生成条目键"""
+        ident = dict(source_identity(file_path), params=params or {}, version=CACHE_VERSION)
+        return hashlib.sha1(json.dumps(ident, sort_keys=True, default=str).encode()).hexdigest()
+
+    def lookup(self, file_path, params=None):
+        """查找有效条目，不存在返回 None"""
+        path = os.path.join(self.cache_dir, self.key(file_path, params))
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        entry = CacheEntry(path)
+        entry.touch()
+        return entry
+
+    def store(self, file_path, params, fields, meta=None):
+        """
+        写入新条目并返回 CacheEntry
+        - fields: 可迭代的 (字段名, 数组)，逐个写盘，不需要同时驻留内存
+        同一源文件的旧条目（文件已改变）会被删除；同一键已有完整条目时（并发写入）使用已有条目
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = self.key(file_path, params)
+        tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix=f".{key}.")
+        try:
+            names = []
+            for name, values in fields:
+                np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(values))
+                names.append(name)
+            info = dict(meta or {}, source=source_identity(file_path), params=params or {},
+                        fields=names, created=time.time(), version=CACHE_VERSION)
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(info, f, default=str)
+            path = os.path.join(self.cache_dir, key)
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                # 中断写入留下的不完整目录
+                shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.replace(tmp, path)
+            except OSError:
+                # 其他进程已写完同一键的条目（源文件与参数相同），直接使用
+                if not os.path.exists(os.path.join(path, 'meta.json')):
+                    raise
+                shutil.rmtree(tmp, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self._remove_stale(file_path, key)
+        self.evict(keep=path)
+        return CacheEntry(path)
+
+    def entries(self):
+        """所有已完成的条目"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [CacheEntry(e.path) for e in os.scandir(self.cache_dir)
+                if e.is_dir() and not e.name.startswith('.') and os.path.exists(os.path.join(e.path, 'meta.json'))]
+
+    def _remove_stale(self, file_path, keep_key):
+        ident = source_identity(file_path)
+        for entry in self.entries():
+            source = entry.meta.get('source', {})
+            if source.get('path') == ident['path'] and os.path.basename(entry.path) != keep_key \
+                    and (source.get('size'), source.get('mtime_ns')) != (ident['size'], ident['mtime_ns']):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def evict(self, keep=None):
+        """总大小超过 max_bytes 时删除最久未访问的条目（keep 指定的条目除外）"""
+        entries = [(os.stat(e.path).st_mtime, _dir_size(e.path), e.path) for e in self.entries()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """删除全部缓存"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
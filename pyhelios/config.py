@@ -13,4 +13,18 @@ def get_default_config():
         'tick_width': 0.5,
         'figsize': (8.5 / 2.54, 8.5 / 1.618 / 2.54),
         'cmap': 'jet',
+        # 场图按输出分辨率降采样；只栅格化网格层
+        'lod': False,
+        'rasterized': False,
+        # 处理后数据的磁盘缓存
+        'cache': False,
+        'cache_dir': None,
+        'cache_max_bytes': 10 * 1024 ** 3,
+        'cache_analysis': True,
+        # 状态量以 float32 保存
+        'compact': False,
+        # 阶段计时：True 或 'memory'（同时统计峰值内存），也可用环境变量 PYHELIOS_PROFILE
+        'profile': False,
+        # 内存中记忆的分析结果个数
+        'result_cache_size': 32,
     }
@@ -4,17 +4,44 @@ PyHelios 高级接口
 
 from .config import get_default_config
 from .dataio import HeliosData
-from .plotting import HeliosPlotter
+from .plotting import HeliosPlotter, LivePlot
+from .profiling import PROFILER
 
 class PyHelios:
-    def __init__(self, file_path, config=None):
+    def __init__(self, file_path, config=None, time_range=None, zone_range=None, time_stride=None,
+                 chunk_size=None, cache=None, compact=None):
         self.config = config or get_default_config()
-        self.data = HeliosData(file_path, self.config)
+        self.data = HeliosData(file_path, self.config, time_range=time_range, zone_range=zone_range,
+                               time_stride=time_stride, chunk_size=chunk_size, cache=cache, compact=compact)
         self.plotter = HeliosPlotter(self.config)
 
-    def load_and_process(self):
+    def load_and_process(self, progress=None):
         self.data.load()
-        self.data.process()
+        self.data.process(progress=progress)
+
+    def select(self, time_range=None, zone_range=None, time_stride=None):
+        """重新选择时间窗口/区域范围/时间步间隔"""
+        self.data.select(time_range=time_range, zone_range=zone_range, time_stride=time_stride)
+
+    def refresh(self):
+        """读取仍在写入的文件中新追加的时间步，返回新增步数"""
+        return self.data.refresh()
+
+    def follow(self, interval=2.0, callback=None, stop=None, idle_timeout=None, plots=()):
+        """
+        跟随仍在写入的文件，见 HeliosData.follow
+        - plots: live_plot() 返回的 LivePlot 列表，有新时间步时自动刷新
+        """
+        def on_update(data, rows):
+            for plot in plots:
+                plot.refresh()
+            if callback:
+                callback(self, rows)
+        self.data.follow(interval, on_update, stop=stop, idle_timeout=idle_timeout)
+
+    def live_plot(self, method, fig=None, **kwargs):
+        """创建跟随模式下可刷新的图，如 live_plot('plot_density', shocktrack=True)"""
+        return LivePlot(self.plotter, self.data, method, fig, **kwargs)
 
     def plot_radius(self, **kwargs):
         return self.plotter.plot_radius(self.data, **kwargs)
@@ -37,6 +64,18 @@ class PyHelios:
     def plot_fluidvel(self, **kwargs):
         return self.plotter.plot_fluidvel(self.data, **kwargs)
 
+    def plot_remapped(self, key='mass_density', **kwargs):
+        return self.plotter.plot_remapped(self.data, key, **kwargs)
+
+    def plot_lineout(self, radius, key='mass_density', **kwargs):
+        return self.plotter.plot_lineout(self.data, radius, key, **kwargs)
+
+    def plot_dashboard(self, fields=None, **kwargs):
+        return self.plotter.plot_dashboard(self.data, fields, **kwargs)
+
+    def plot_budget(self, quantities=None, **kwargs):
+        return self.plotter.plot_budget(self.data, quantities, **kwargs)
+
     def plot_shocktrack(self, **kwargs):
         return self.plotter.plot_shocktrack(self.data, **kwargs)
 
@@ -46,5 +85,43 @@ class PyHelios:
     def plot_max_density(self, **kwargs):
         return self.plotter.plot_max_density(self.data, **kwargs)
 
-    def get(self, key):
-        return self.data.get(key)
+    def get(self, key, **params):
+        return self.data.get(key, **params)
+
+    def remap(self, field='mass_density', **kwargs):
+        """投影到固定半径网格，返回 (半径网格边界, 数值)"""
+        return self.data.remap(field, **kwargs)
+
+    def lineout(self, radius, field='mass_density', **kwargs):
+        return self.data.lineout(radius, field, **kwargs)
+
+    def budget(self, quantities=None, **kwargs):
+        """能量与质量收支的逐时刻序列，见 budget.energy_budget"""
+        if quantities is not None:
+            kwargs['quantities'] = quantities
+        return self.data.get('budget', **kwargs)
+
+    def export_store(self, path, **kwargs):
+        """导出为分块压缩存储，之后可用 PyHelios(path) 直接打开，参数见 store.export_store"""
+        return self.data.to_store(path, **kwargs)
+
+    def probe(self, field, t, r, time_interp=True):
+        """在 (t, r) 点上对字段取样，见 HeliosData.probe"""
+        return self.data.probe(field, t, r, time_interp)
+
+    def memory_footprint(self):
+        """已读入内存的各字段占用的字节数"""
+        return self.data.memory_footprint()
+
+    @staticmethod
+    def enable_profiling(memory=False):
+        """开启进程全局的阶段记录；memory=True 时同时统计峰值内存（只适用于单线程）"""
+        PROFILER.enable(memory=memory)
+
+    def profile_summary(self):
+        """各阶段/变量的耗时、读取字节数与峰值内存（需 enable_profiling()、configure(config) 或 PYHELIOS_PROFILE 开启）"""
+        return PROFILER.summary()
+
+    def export_trace(self, path):
+        """把记录的阶段导出为 Chrome trace 文件（chrome://tracing 或 Perfetto 打开）"""
+        return PROFILER.export_trace(path)
@@ -1,75 +1,696 @@
 """
 数据加载与处理模块
 """
+from collections import OrderedDict
+from collections.abc import Mapping
+import time
 import xarray as xr
 import numpy as np
-from .analysis import detect_shock_front
+from .analysis import detect_shock_front, detect_shock_fronts, lineout, remap_rows, shock_front_rows, smooth_series
+from .budget import DEFAULT_BUDGET
+from .cache import ProcessedCache
+from .probe import ProbeIndex
+from .profiling import stage
+from .store import export_store, is_store, open_store
+
+# 处理后字段 -> (原始变量名, 单位换算运算, 系数)
+_FIELD_SOURCES = {
+    "time_whole": ("time_whole", np.multiply, 1e9),  # ns
+    "zone_boundaries": ("zone_boundaries", np.multiply, 1e4),  # um
+    "mass_density": ("mass_density", None, None),
+    "elec_density": ("elec_density", None, None),
+    "ion_temperature": ("ion_temperature", None, None),
+    "elec_temperature": ("elec_temperature", None, None),
+    "rad_temperature": ("radiation_temperature", None, None),
+    "zone_mass": ("zone_mass", None, None),
+    "fluid_velocity": ("fluid_velocity", np.true_divide, 100000),  # Convert to km/s
+}
+
+# 由其他字段推导的量
+_DERIVED_FIELDS = ("pressure", "volume", "time_edges", "radius_edges")
+
+FIELDS = tuple(_FIELD_SOURCES) + _DERIVED_FIELDS
+
+# 紧凑模式下以 float32 保存的状态量；时间、坐标与区域质量保持 float64
+COMPACT_FIELDS = ("mass_density", "elec_density", "ion_temperature", "elec_temperature", "rad_temperature",
+                  "fluid_velocity", "pressure", "volume")
+
+# 可由 get() 获得的分析结果及其参数默认值
+ANALYSES = {
+    "reductions": {"stats": (), "smooth": False, "window_length": 11, "polyorder": 3},
+    "shock_pos": {"density_threshold": 1.1},
+    "shock_fronts": {"density_thresholds": (1.1,)},
+    "max_pressure": {"smooth": True, "window_length": 11, "polyorder": 3},
+    "max_density": {"smooth": True, "window_length": 11, "polyorder": 3},
+    "remap": {"field": "mass_density", "n_radius": None, "r_range": None, "weight": None},
+    "budget": {"quantities": DEFAULT_BUDGET, "zones": None, "r_range": None, "ablation_radius": None,
+               "smooth": False, "window_length": 11, "polyorder": 3},
+}
+
+# 投影到固定网格时按体积加权（守恒质量/能量）的字段，其余按 zone_mass 加权
+REMAP_VOLUME_WEIGHTED = ("mass_density", "elec_density", "pressure")
+
+# max_* 分析 -> 取最大值的字段
+ANALYSES_MAX = {"max_pressure": "pressure", "max_density": "mass_density"}
+
+
+def _freeze(value):
+    """把列表/数组参数转换为可哈希的元组"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _nbytes(value):
+    """数组及其容器（tuple/list/dict）占用的字节数"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _cell_edges(centers):
+    """沿第0轴由中心值计算 pcolormesh 所需的边界（首末外推半个间隔），直接写入输出数组"""
+    n = len(centers)
+    if n < 2:
+        half = np.diff(centers, axis=0) / 2
+        return np.concatenate((centers[:1] - half[:1], centers[:-1] + half, centers[-1:] + half[-1:]), axis=0)
+    out = np.empty((n + 1,) + centers.shape[1:], dtype=np.result_type(centers, 0.5))
+    # 中间的边界先存放半间隔，算出首末边界后再原地加上中心值
+    half = out[1:n]
+    np.subtract(centers[1:], centers[:-1], out=half)
+    np.divide(half, 2, out=half)
+    out[0] = centers[0] - half[0]
+    out[n] = centers[-1] + half[-1]
+    np.add(centers[:-1], half, out=half)
+    return out
+
+
+def _convert(values, op=None, factor=None, dtype=None):
+    """
+    单位与精度换算：数组可写且类型不变时原地计算，否则只分配一个输出数组
+    - op/factor: 如 np.multiply, 1e9；op 为 None 时只换算类型
+    """
+    dtype = np.dtype(dtype or values.dtype)
+    if values.dtype == dtype and values.flags.writeable:
+        out = values
+    else:
+        out = np.empty(values.shape, dtype=dtype)
+    if op is not None:
+        op(values, factor, out=out)
+    elif out is not values:
+        out[...] = values
+    return out
+
+
+class LazyFieldMap(Mapping):
+    """
+    按需读取的字段映射：首次访问时调用对应的加载函数并缓存结果
+    - loaders: {字段名: 无参加载函数}
+    """
+    def __init__(self, loaders=None):
+        self._loaders = dict(loaders or {})
+        self._values = {}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self._loaders:
+                raise KeyError(key)
+            self._values[key] = self._loaders[key]()
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+
+    def __contains__(self, key):
+        return key in self._values or key in self._loaders
+
+    def get(self, key, default=None):
+        """只有不在映射中的名字返回 default；加载函数中抛出的 KeyError（如文件缺少变量）照常抛出"""
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        yield from self._loaders
+        for key in self._values:
+            if key not in self._loaders:
+                yield key
+
+    def __len__(self):
+        return len(set(self._loaders) | set(self._values))
+
+    def materialized(self):
+        """返回已经读取到内存中的字段名"""
+        return [key for key in self if key in self._values]
+
+    def discard(self, key):
+        """丢弃已读取的值，下次访问时重新加载"""
+        self._values.pop(key, None)
+
 
 class HeliosData:
-    def __init__(self, file_path, config=None):
+    """
+    HELIOS 输出数据
+    - time_range: (t_start, t_end) 时间窗口，单位 ns，端点包含在内，任一端可为 None
+    - zone_range: (start, stop) 区域下标范围，与 Python 切片相同（不含 stop）
+    - time_stride: 每隔 N 个时间步取一个
+    选择在读取文件之前作用于 netCDF 变量，只读取子集部分
+    - chunk_size: 分块模式下每块的时间步数；读取字段与计算 shock_pos/max_* 时
+      按时间分块流式处理，峰值内存由块大小控制。None 表示一次读取整个数组
+    - cache: 是否使用处理后数据的磁盘缓存（True/False 或 ProcessedCache），
+      None 时取 config['cache']。命中时不再打开 netCDF 文件，字段以内存映射方式读取
+    - compact: COMPACT_FIELDS 中的状态量以 float32 保存，None 时取 config['compact']；
+      单位换算与推导量直接写入目标精度的数组，不产生整字段的中间数组
+    file_path 也可以是 export_store 导出的存储目录，字段按时间块惰性解压读取
+    """
+    def __init__(self, file_path, config=None, time_range=None, zone_range=None, time_stride=None,
+                 chunk_size=None, cache=None, compact=None):
         self.file_path = file_path
         self.config = config
+        self.compact = (config or {}).get('compact', False) if compact is None else compact
         self.raw_data = None
         self.processed = False
-        self.data = {}
+        self.data = LazyFieldMap()
+        self.time_range = time_range
+        self.zone_range = zone_range
+        self.time_stride = time_stride
+        self.chunk_size = chunk_size
+        self.cache = self._make_cache(cache)
+        self._cache_entry = None
+        self._results = OrderedDict()
+        # 每个时刻的最大值（未平滑），max_* 结果由它平滑得到，跟随模式下只追加新时刻
+        self._row_max = {}
+        # 跟随模式下字段的预留容量存储，追加时不复制历史数据
+        self._buffers = {}
+        self._probe_index = None
+        self._indexers = {}
+        self._time_dim = None
+        self.n_times = 0
+
+    def _make_cache(self, cache):
+        config = self.config or {}
+        if is_store(self.file_path):
+            # 存储本身就是处理后的数据
+            return None
+        if cache is None:
+            cache = config.get('cache', False)
+        if cache is True:
+            return ProcessedCache(config.get('cache_dir'), config.get('cache_max_bytes', 10 * 1024 ** 3))
+        return cache or None
+
+    def _cache_params(self):
+        """影响处理结果的参数，作为缓存键的一部分"""
+        params = {'time_range': self.time_range, 'zone_range': self.zone_range, 'time_stride': self.time_stride}
+        if self.compact:
+            params['compact'] = True
+        return params
+
+    def _lookup_cache(self):
+        """查找磁盘缓存，命中返回 True"""
+        if self.cache is None:
+            return False
+        with stage('io.cache_lookup'):
+            self._cache_entry = self.cache.lookup(self.file_path, self._cache_params())
+        if self._cache_entry is None:
+            return False
+        self.n_times = self._cache_entry.meta['n_times']
+        return True
 
     def load(self):
-        """加载原始数据"""
-        self.raw_data = xr.open_dataset(self.file_path)
+        """加载原始数据（只读取元数据，变量在访问时才读取）；磁盘缓存命中时不打开文件"""
+        self.invalidate()
+        if is_store(self.file_path):
+            self._cache_entry = open_store(self.file_path, time_range=self.time_range, zone_range=self.zone_range,
+                                           time_stride=self.time_stride)
+            self.n_times = self._cache_entry.meta['n_times']
+            return
+        if self._lookup_cache():
+            return
+        # 读取的数组由 data 映射缓存，xarray 不再另存一份
+        with stage('io.open_dataset'):
+            self.raw_data = xr.open_dataset(self.file_path, cache=False)
+        self._indexers = self._build_indexers()
 
-    def process(self):
-        """处理数据"""
-        if self.raw_data is None:
+    def process(self, progress=None):
+        """
+        建立处理后字段的惰性映射，每个字段在首次访问时读取、换算并缓存
+        - progress: 可选回调 progress(done, total, name)，写磁盘缓存时每个字段调用一次；
+          回调抛出的异常会中止处理（未完成的缓存条目被丢弃）
+        """
+        if self.cache is not None and self._cache_entry is None:
+            self._lookup_cache()
+        if self.raw_data is None and self._cache_entry is None:
             self.load()
-        data = self.raw_data
-        # Extract variables and convert to numpy arrays
-        time_whole = data['time_whole'].values *1e9 # ns
-        zone_boundaries = data['zone_boundaries'].values * 1e4 # um
-        mass_density = data['mass_density'].values
-        elec_density = data['elec_density'].values
-        ion_temperature = data['ion_temperature'].values
-        elec_temperature = data['elec_temperature'].values
-        rad_temperature = data['radiation_temperature'].values
-        zone_mass = data['zone_mass'].values
-        pressure = (data['ion_pressure'].values + data['elec_pressure'].values) *1e-5  #J/cm^3 ->  Mbar
-        fluid_velocity = data['fluid_velocity'].values / 100000  # Convert to km/s
-        volume = zone_mass / mass_density
-
-        # Calculate time edges for pcolormesh
-        time_diff = np.diff(time_whole) / 2
-        time_edges = np.concatenate(([time_whole[0] - time_diff[0]], time_whole[:-1] + time_diff, [time_whole[-1] + time_diff[-1]]))
-
-        # Calculate radius edges for pcolormesh
-        radius_diff = np.diff(zone_boundaries, axis=0) / 2
-        radius_edges = np.vstack((zone_boundaries[0, :] - radius_diff[0, :],
-                                  zone_boundaries[:-1, :] + radius_diff,
-                                  zone_boundaries[-1, :] + radius_diff[-1, :]))
-
-        self.data = {
-            "time_whole": time_whole,
-            "zone_boundaries": zone_boundaries,
-            "mass_density": mass_density,
-            "elec_density": elec_density,
-            "ion_temperature": ion_temperature,
-            "elec_temperature": elec_temperature,
-            "rad_temperature": rad_temperature,
-            "zone_mass": zone_mass,
-            "pressure": pressure,
-            "fluid_velocity": fluid_velocity,
-            "volume": volume,
-            "time_edges": time_edges,
-            "radius_edges": radius_edges
-        }
+        self.invalidate()
+        self._buffers.clear()
+        self.data = LazyFieldMap({name: (lambda name=name: self._load_field(name)) for name in FIELDS})
+        # 写缓存时分块模式会经由 iter_chunks 读取，此时不能再次调用 process()
         self.processed = True
+        if self.cache is not None and self._cache_entry is None:
+            try:
+                self._write_cache(progress)
+            except BaseException:
+                self.processed = False
+                raise
 
-    def get(self, key):
-        """获取处理后的数据或后处理数据"""
-        if key == 'shock_pos':
-            return detect_shock_front(self.data['mass_density'], self.data['radius_edges'], self.data['time_edges'])
-        if key == 'max_pressure':
-            from .analysis import max_pressure
-            return max_pressure(self.data['pressure'])
-        if key == 'max_density':
-            from .analysis import max_density
-            return max_density(self.data['mass_density'])
+    def prefetch(self, names=None, progress=None):
+        """
+        预先读取若干字段（None 为全部），供后台线程在绘图前准备数据
+        - progress: 可选回调 progress(done, total, name)，在读取每个字段之前调用
+        """
+        if not self.processed:
+            self.process()
+        names = list(FIELDS if names is None else names)
+        for i, name in enumerate(names):
+            if progress:
+                progress(i, len(names), name)
+            self.data[name]
+        if progress:
+            progress(len(names), len(names), '')
+
+    def _write_cache(self, progress=None):
+        """逐个字段计算并写入磁盘缓存，写完后字段改由缓存内存映射读取"""
+        def fields():
+            for i, name in enumerate(FIELDS):
+                if progress:
+                    progress(i, len(FIELDS), name)
+                # 依赖字段每次重新读取，不在 data 中累积整个数据集
+                yield name, self._load_field(name, field=self._load_field)
+        meta = {'n_times': self.n_times, 'time_axis': [name for name in FIELDS if self._has_time_axis(name)]}
+        with stage('io.cache_write'):
+            self._cache_entry = self.cache.store(self.file_path, self._cache_params(), fields(), meta)
+
+    def select(self, time_range=None, zone_range=None, time_stride=None):
+        """重新设置数据子集，已读取的字段全部丢弃"""
+        self.time_range = time_range
+        self.zone_range = zone_range
+        self.time_stride = time_stride
+        self._cache_entry = None
+        self.invalidate()
+        if self.raw_data is not None:
+            self._indexers = self._build_indexers()
+        if self.processed:
+            self.process()
+
+    def _build_indexers(self):
+        """把 time_range/zone_range/time_stride 换算为各维度上的切片"""
+        raw = self.raw_data
+        indexers = {}
+        time_dim = self._time_dim = raw['time_whole'].dims[0]
+        self.n_times = raw.sizes[time_dim]
+        if self.time_range is not None or self.time_stride not in (None, 1):
+            time_ns = raw['time_whole'].values * 1e9
+            t_start, t_end = self.time_range or (None, None)
+            start = 0 if t_start is None else int(np.searchsorted(time_ns, t_start, side='left'))
+            stop = len(time_ns) if t_end is None else int(np.searchsorted(time_ns, t_end, side='right'))
+            if stop <= start:
+                raise ValueError(f"time_range {self.time_range} 内没有时间步")
+            indexers[time_dim] = slice(start, stop, self.time_stride)
+            self.n_times = len(range(start, stop, self.time_stride or 1))
+        if self.zone_range is not None:
+            zone_dim = next(d for d in raw['mass_density'].dims if d != time_dim)
+            node_dim = next(d for d in raw['zone_boundaries'].dims if d != time_dim)
+            start, stop, _ = slice(*self.zone_range).indices(raw.sizes[zone_dim])
+            if stop <= start:
+                raise ValueError(f"zone_range {self.zone_range} 内没有区域")
+            indexers[zone_dim] = slice(start, stop)
+            # 区域 i 由节点 i 与 i+1 围成
+            indexers[node_dim] = slice(start, stop + 1)
+        return indexers
+
+    @property
+    def materialized_fields(self):
+        """已经读取/计算过的字段名列表"""
+        return self.data.materialized()
+
+    def _read(self, var, rows=None):
+        """
+        从 netCDF 文件读取一个原始变量（只读取所选子集）
+        - rows: 子集时间轴上的切片，只读取这些时间步
+        """
+        variable = self.raw_data[var]
+        indexers = {dim: s for dim, s in self._indexers.items() if dim in variable.dims}
+        if indexers:
+            variable = variable.isel(indexers)
+        if rows is not None and self._time_dim in variable.dims:
+            variable = variable.isel({self._time_dim: rows})
+        with stage('io.read', var=var) as info:
+            values = variable.values
+            info['bytes'] = values.nbytes
+        return values
+
+    def _has_time_axis(self, name):
+        """字段第0轴是否为时间"""
+        if self.raw_data is None and self._cache_entry is not None:
+            return name in self._cache_entry.meta['time_axis']
+        if name in _FIELD_SOURCES:
+            return self._time_dim in self.raw_data[_FIELD_SOURCES[name][0]].dims
+        return True
+
+    def _load_field(self, name, rows=None, field=None):
+        """
+        读取并换算单个处理后字段
+        - rows: 只计算这些时间步（分块模式）
+        - field: 取其他字段的函数，推导量由此获得依赖字段
+        """
+        with stage(f'io.field.{name}'):
+            return self._compute_field(name, rows, field)
+
+    def _compute_field(self, name, rows=None, field=None):
+        entry = self._cache_entry
+        if entry is not None and name in entry:
+            if rows is not None and name in entry.meta['time_axis']:
+                rows = slice(rows.start, rows.stop + (1 if name.endswith("_edges") else 0))
+            else:
+                rows = None
+            with stage('io.cache_load', var=name) as info:
+                values = np.asarray(entry.load(name, rows))
+                info['bytes'] = values.nbytes
+            return values
+        if rows is None and self.chunk_size and self._has_time_axis(name):
+            return self._assemble(name)
+        if field is None:
+            field = self.data.__getitem__
+        dtype = np.float32 if self.compact and name in COMPACT_FIELDS else None
+        if name in _FIELD_SOURCES:
+            source, op, factor = _FIELD_SOURCES[name]
+            return _convert(self._read(source, rows), op, factor, dtype)
+        if name == "pressure":
+            out = _convert(self._read("ion_pressure", rows), dtype=dtype)
+            np.add(out, self._read("elec_pressure", rows), out=out)
+            np.multiply(out, 1e-5, out=out)  # J/cm^3 ->  Mbar
+            return out
+        if name == "volume":
+            zone_mass, density = field("zone_mass"), field("mass_density")
+            return np.divide(zone_mass, density, out=np.empty(density.shape, dtype=dtype or np.result_type(zone_mass, density)))
+        if name in ("time_edges", "radius_edges"):
+            # Calculate time/radius edges for pcolormesh
+            source = "time_whole" if name == "time_edges" else "zone_boundaries"
+            if rows is None:
+                return _cell_edges(field(source))
+            # 边界需要相邻时间步，多读取前后各一步
+            lo, hi = max(rows.start - 1, 0), min(rows.stop + 1, self.n_times)
+            edges = _cell_edges(self._load_field(source, slice(lo, hi)))
+            return edges[rows.start - lo:rows.stop - lo + 1]
+        raise KeyError(name)
+
+    def memory_footprint(self):
+        """已读入内存的各字段占用的字节数 {字段名: 字节数}（磁盘缓存中的字段为映射大小）"""
+        return {name: self.data[name].nbytes for name in self.data.materialized()}
+
+    def resident_bytes(self):
+        """常驻内存的总字节数：已读入的字段（跟随模式下按预留容量计）、记忆的分析结果与每个时刻的最大值"""
+        fields = self.memory_footprint()
+        for name, buf in self._buffers.items():
+            fields[name] = max(fields.get(name, 0), buf.nbytes)
+        return sum(fields.values()) + _nbytes(list(self._results.values())) + _nbytes(self._row_max)
+
+    def _chunk_fields(self, names, rows):
+        """计算一个时间块内的若干字段，块内的依赖字段只读取一次"""
+        chunk = {}
+
+        def field(name):
+            if name not in chunk:
+                chunk[name] = self._load_field(name, rows, field)
+            return chunk[name]
+        return {name: field(name) for name in names}
+
+    def iter_chunks(self, *names, chunk_size=None):
+        """
+        按时间分块迭代处理后字段，返回 (rows, {字段名: 该块数组})
+        time_edges/radius_edges 在每块中包含 rows 对应的 len(rows)+1 个边界
+        非分块模式下只产生一个包含整个数组（取自 data 映射）的块
+        """
+        if not self.processed:
+            self.process()
+        if not (chunk_size or self.chunk_size):
+            yield slice(0, self.n_times), {name: self.data[name] for name in names}
+            return
+        chunk_size = max(chunk_size or self.chunk_size or self.n_times, 1)
+        for start in range(0, self.n_times, chunk_size):
+            rows = slice(start, min(start + chunk_size, self.n_times))
+            yield rows, self._chunk_fields(names, rows)
+
+    def _assemble(self, name):
+        """分块读取并写入预先分配的数组，避免整块的中间临时数组"""
+        out = None
+        for rows, chunk in self.iter_chunks(name):
+            values = chunk[name]
+            if out is None:
+                n_rows = self.n_times + (1 if name.endswith("_edges") else 0)
+                out = np.empty((n_rows,) + values.shape[1:], dtype=values.dtype)
+            out[rows.start:rows.start + len(values)] = values
+        return out
+
+    def _streaming(self, *names):
+        """分块模式下且所需字段尚未读入内存时，分析按块流式计算"""
+        return bool(self.chunk_size) and not any(name in self.data.materialized() for name in names)
+
+    def _stream_shock_front(self, density_threshold=1.1):
+        """逐块检测冲击波；density_threshold 为序列时返回 (n_thresholds, nt)"""
+        parts = [shock_front_rows(chunk['mass_density'], chunk['radius_edges'], density_threshold)
+                 for _, chunk in self.iter_chunks('mass_density', 'radius_edges')]
+        shock_pos = np.concatenate(parts, axis=-1)
+        # 替换第一个为0
+        if shock_pos.shape[-1] > 0:
+            shock_pos[..., 0] = 0
+        return shock_pos
+
+    def _series_max(self, name):
+        """每个时刻的最大值，分块模式下且字段不在内存中时逐块计算"""
+        series = self._row_max.get(name)
+        if series is None or len(series) != self.n_times:
+            if self._streaming(name):
+                series = np.concatenate([np.max(chunk[name], axis=1) for _, chunk in self.iter_chunks(name)])
+            else:
+                series = np.max(self.data[name], axis=1)
+            self._row_max[name] = series
+        return series
+
+    def refresh(self):
+        """
+        跟随模式：重新打开仍在写入的文件，只读取新追加的时间步
+        - 已读入内存的字段在末尾延长，time_edges/radius_edges 重新计算原来外推的最后一个边界
+        - shock_pos/shock_fronts 只对新时间步检测，max_* 只对新时间步求最大值后重新平滑，
+          其余记忆的分析结果被丢弃
+        文件变短（被重写）时重新处理。返回新增的时间步数
+        """
+        if not self.processed:
+            self.process()
+        if is_store(self.file_path):
+            # 存储是导出后不再改变的快照
+            return 0
+        raw = xr.open_dataset(self.file_path, cache=False)
+        if self.raw_data is not None:
+            self.raw_data.close()
+        self.raw_data = raw
+        # 文件已改变，不再从磁盘缓存读取
+        self._cache_entry = None
+        old_n = self.n_times
+        self._indexers = self._build_indexers()
+        if self.n_times < old_n:
+            self.process()
+            return self.n_times
+        if self.n_times == old_n:
+            return 0
+        rows = slice(old_n, self.n_times)
+        names = [name for name in self.data.materialized() if self._has_time_axis(name)]
+        keys = {key for key, _ in self._results}
+        if keys & {'shock_pos', 'shock_fronts'}:
+            names += ['mass_density', 'radius_edges']
+        row_max = {name: self._row_max[name] for name in ('pressure', 'mass_density')
+                   if name in self._row_max and len(self._row_max[name]) == old_n}
+        chunk = self._chunk_fields(list(dict.fromkeys(names + list(row_max))), rows)
+        for name in self.data.materialized():
+            if name in chunk:
+                self._extend(name, chunk[name], old_n)
+        for name, series in row_max.items():
+            self._row_max[name] = np.concatenate((series, np.max(chunk[name], axis=1)))
+        results = OrderedDict()
+        for memo_key, value in self._results.items():
+            key, params = memo_key[0], dict(memo_key[1])
+            if key in ('shock_pos', 'shock_fronts'):
+                thresholds = params['density_threshold'] if key == 'shock_pos' else list(params['density_thresholds'])
+                new = shock_front_rows(chunk['mass_density'], chunk['radius_edges'], thresholds)
+                results[memo_key] = np.concatenate((value, new), axis=-1)
+            elif key in ('max_pressure', 'max_density') and ANALYSES_MAX[key] in row_max:
+                results[memo_key] = self._smooth_max(self._row_max[ANALYSES_MAX[key]], **params)
+        self._results = results
+        self._probe_index = None
+        return self.n_times - old_n
+
+    def _extend(self, name, values, start):
+        """把新时间步写到字段 name 的第 start 行起；存储按倍增预留容量，不必每次复制全部历史"""
+        old = self.data[name]
+        end = start + len(values)
+        buf = self._buffers.get(name)
+        if buf is None or old.base is not buf or buf.shape[0] < end:
+            buf = np.empty((max(end, 2 * len(old)),) + old.shape[1:], dtype=np.result_type(old, values))
+            buf[:start] = old[:start]
+            self._buffers[name] = buf
+        buf[start:end] = values
+        self.data[name] = buf[:end]
+
+    def follow(self, interval=2.0, callback=None, stop=None, idle_timeout=None):
+        """
+        跟随仍在写入的文件：每隔 interval 秒调用 refresh()，有新时间步时调用 callback(self, rows)
+        - stop: threading.Event，置位后返回
+        - idle_timeout: 连续这么多秒没有新时间步时返回，None 为一直跟随
+        文件正在写入而暂时无法读取时，跳过这一次轮询
+        """
+        last = time.monotonic()
+        while stop is None or not stop.is_set():
+            try:
+                n_new = self.refresh()
+            except (OSError, ValueError):
+                n_new = 0
+            if n_new:
+                last = time.monotonic()
+                if callback:
+                    callback(self, slice(self.n_times - n_new, self.n_times))
+            elif idle_timeout is not None and time.monotonic() - last >= idle_timeout:
+                return
+            if stop is not None:
+                stop.wait(interval)
+            else:
+                time.sleep(interval)
+
+    def get(self, key, **params):
+        """
+        获取处理后的数据或后处理数据
+        分析结果（shock_pos/max_pressure/max_density）按分析名与参数记忆，
+        重复调用直接返回，例如 get('shock_pos', density_threshold=2)
+        """
+        if key in ANALYSES:
+            return self.result(key, **params)
         return self.data.get(key)
+
+    def result(self, key, **params):
+        """按 (分析名, 参数) 记忆的分析结果，依次查找内存、磁盘缓存，最后计算"""
+        params = self._result_params(key, params)
+        memo_key = (key, tuple(sorted(params.items())))
+        if memo_key in self._results:
+            self._results.move_to_end(memo_key)
+            return self._results[memo_key]
+        entry = self._cache_entry
+        disk_name = self.result_name(key, **params)
+        if entry is not None and disk_name in entry:
+            result = np.asarray(entry.load(disk_name))
+        else:
+            with stage(f'analysis.{key}'):
+                result = self._analyse(key, **params)
+            # 只有单个数组的结果写入磁盘缓存
+            if entry is not None and isinstance(result, np.ndarray) and (self.config or {}).get('cache_analysis', True):
+                entry.save(disk_name, result)
+        self._results[memo_key] = result
+        while len(self._results) > (self.config or {}).get('result_cache_size', 32):
+            self._results.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _result_params(key, params):
+        """补全默认参数并转换为可哈希的值"""
+        unknown = set(params) - set(ANALYSES[key])
+        if unknown:
+            raise TypeError(f"{key} 不支持参数: {', '.join(sorted(unknown))}")
+        return {k: _freeze(v) for k, v in dict(ANALYSES[key], **params).items()}
+
+    def result_name(self, key, **params):
+        """分析结果在磁盘缓存/存储中的名字，包含全部参数"""
+        params = self._result_params(key, params)
+        return key + ''.join(f"__{k}={'-'.join(map(str, v)) if isinstance(v, tuple) else v}"
+                             for k, v in sorted(params.items()))
+
+    def invalidate(self):
+        """清除记忆的分析结果（重新加载或重新选择子集时自动调用）"""
+        self._results.clear()
+        self._row_max.clear()
+        self._probe_index = None
+
+    @staticmethod
+    def _smooth_max(series, smooth=True, window_length=11, polyorder=3):
+        if smooth:
+            return smooth_series(series, window_length, polyorder)
+        return series
+
+    def radius_grid(self, n_radius=None, r_range=None):
+        """
+        固定半径网格的边界 shape (n_radius+1,)
+        - n_radius: 网格单元数，默认与区域数相同
+        - r_range: (r_min, r_max)，默认覆盖所有时刻的区域边界
+        """
+        if n_radius is None or r_range is None:
+            lo, hi, nr = np.inf, -np.inf, 0
+            for _, chunk in self.iter_chunks('zone_boundaries'):
+                zb = chunk['zone_boundaries']
+                lo, hi, nr = min(lo, np.min(zb)), max(hi, np.max(zb)), zb.shape[1] - 1
+            r_range = r_range or (lo, hi)
+            n_radius = n_radius or nr
+        return np.linspace(r_range[0], r_range[1], int(n_radius) + 1)
+
+    def remap(self, field='mass_density', n_radius=None, r_range=None, weight=None):
+        """
+        把字段守恒地投影到固定 (时间, 半径) 网格，结果按参数记忆（也写入磁盘缓存）
+        - weight: 'mass'（zone_mass 加权）或 'volume'，默认密度与压力按体积、其余按质量
+        返回 (半径网格边界 shape (m+1,), 数值 shape (nt, m))，没有物质的单元为 nan
+        """
+        values = self.result('remap', field=field, n_radius=n_radius, r_range=r_range, weight=weight)
+        return self.radius_grid(n_radius, r_range), values
+
+    def lineout(self, radius, field='mass_density', **remap_params):
+        """固定半径处的时间序列（取自 remap 的结果），radius 为序列时返回 shape (n, nt)"""
+        grid_edges, values = self.remap(field, **remap_params)
+        return lineout(values, grid_edges, radius)
+
+    def to_store(self, path, **kwargs):
+        """导出为分块压缩存储，参数见 store.export_store"""
+        return export_store(self, path, **kwargs)
+
+    def probe_index(self):
+        """(时间, 半径) 点查询索引，由 time_whole 与 zone_boundaries 构建一次后重复使用"""
+        if self._probe_index is None:
+            self._probe_index = ProbeIndex(self.data['time_whole'], self.data['zone_boundaries'])
+        return self._probe_index
+
+    def probe(self, field, t, r, time_interp=True):
+        """
+        在任意多个 (t, r) 点上对处理后字段取样，t 单位 ns、r 单位 um，可广播
+        相邻时刻之间线性插值（time_interp=False 时取最近时刻），超出范围为 nan；见 ProbeIndex.sample
+        """
+        return self.probe_index().sample(self.data[field], t, r, time_interp)
+
+    def _remap(self, field, n_radius=None, r_range=None, weight=None):
+        weight = weight or ('volume' if field in REMAP_VOLUME_WEIGHTED else 'mass')
+        if weight not in ('mass', 'volume'):
+            raise ValueError(f"weight 只能为 'mass' 或 'volume'，而不是 {weight!r}")
+        weight_field = 'zone_mass' if weight == 'mass' else 'volume'
+        grid_edges = self.radius_grid(n_radius, r_range)
+        # 每个时刻独立投影，分块模式下逐块计算
+        parts = [remap_rows(chunk[field], chunk['zone_boundaries'], chunk[weight_field], grid_edges)
+                 for _, chunk in self.iter_chunks(field, 'zone_boundaries', weight_field)]
+        return np.concatenate(parts)
+
+    def _analyse(self, key, **params):
+        if key == 'reductions':
+            from .analysis import reduce_fields
+            return reduce_fields(self, **params)
+        if key == 'shock_pos':
+            if self._streaming('mass_density', 'radius_edges'):
+                return self._stream_shock_front(**params)
+            return detect_shock_front(self.data['mass_density'], self.data['radius_edges'], self.data['time_edges'], **params)
+        if key == 'shock_fronts':
+            thresholds = list(params['density_thresholds'])
+            if self._streaming('mass_density', 'radius_edges'):
+                return self._stream_shock_front(thresholds)
+            return detect_shock_fronts(self.data['mass_density'], self.data['radius_edges'], self.data['time_edges'], thresholds)
+        if key == 'remap':
+            return self._remap(**params)
+        if key == 'budget':
+            from .budget import energy_budget
+            return energy_budget(self, **params)
+        if key in ANALYSES_MAX:
+            return self._smooth_max(self._series_max(ANALYSES_MAX[key]), **params)
@@ -0,0 +1,198 @@
+"""
+批量导出运行报告图
+对一个或多个结果文件绘制选定的图并直接保存为 PNG/PDF/SVG，每张图保存后立即关闭；
+图直接画在 Agg 画布上（不改变调用者的 matplotlib 后端），任务分配到多个进程，比源文件新的输出文件会被跳过
+
+命令行用法:
+    python -m pyhelios.export runs/ -o figures -f png,pdf -j 4 --xlim 0,5 --ylim -20,120
+"""
+import argparse
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .profiling import stage
+
+# 图名 -> (PyHelios 方法, 默认参数)
+REPORT_PLOTS = {
+    'radius': ('plot_radius', {}),
+    'density': ('plot_density', {'shocktrack': True}),
+    'eletemp': ('plot_eletemp', {}),
+    'iontemp': ('plot_iontemp', {}),
+    'radtemp': ('plot_radtemp', {}),
+    'pressure': ('plot_pressure', {}),
+    'fluidvel': ('plot_fluidvel', {}),
+    'shocktrack': ('plot_shocktrack', {}),
+    'max_pressure': ('plot_max_pressure', {}),
+    'max_density': ('plot_max_density', {}),
+}
+
+
+def output_path(file_path, out_dir, plot, fmt):
+    """输出文件路径: out_dir/<运行名>/<运行名>_<图名>.<格式>"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(out_dir, stem, f"{stem}_{plot}.{fmt}")
+
+
+def _up_to_date(path, source_mtime):
+    return os.path.exists(path) and os.path.getmtime(path) >= source_mtime
+
+
+def export_run(file_path, out_dir, plots=None, formats=('png',), common=None, plot_kwargs=None,
+               config=None, force=False, helios=None, **helios_kwargs):
+    """
+    为单个结果文件导出图
+    - plots: REPORT_PLOTS 中的图名列表，None 为全部
+    - formats: 输出格式，例如 ('png', 'pdf')
+    - common: 所有图共用的绘图参数（如 xlim/ylim/lod）
+    - plot_kwargs: {图名: 参数}，覆盖 common 与默认参数
+    - force: 为 True 时忽略已有的较新输出
+    - helios: 已打开并处理的 PyHelios，None 时在需要时打开 file_path
+    - helios_kwargs: 传给 PyHelios 的选择/分块/缓存参数
+    返回写出的文件路径列表；所有输出都是最新时不读取数据
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from .core import PyHelios
+
+    plots = list(plots or REPORT_PLOTS)
+    unknown = set(plots) - set(REPORT_PLOTS)
+    if unknown:
+        raise ValueError(f"未知的图: {', '.join(sorted(unknown))}")
+    source_mtime = os.path.getmtime(file_path)
+    todo = [plot for plot in plots
+            if force or not all(_up_to_date(output_path(file_path, out_dir, plot, fmt), source_mtime) for fmt in formats)]
+    if not todo:
+        return []
+    if helios is None:
+        helios = PyHelios(file_path, config=config, **helios_kwargs)
+        helios.load_and_process()
+    written = []
+    for plot in todo:
+        method, defaults = REPORT_PLOTS[plot]
+        kwargs = {**defaults, **(common or {}), **(plot_kwargs or {}).get(plot, {})}
+        # 直接用 Agg 画布绘制，不经过 pyplot，不改变调用者的后端；图不在 pyplot 中登记，保存后即可回收
+        fig = Figure(figsize=kwargs.get('figsize', helios.config.get('figsize')), dpi=helios.config.get('dpi'))
+        FigureCanvasAgg(fig)
+        getattr(helios, method)(ax=fig.add_subplot(), **kwargs)
+        for fmt in formats:
+            path = output_path(file_path, out_dir, plot, fmt)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with stage('plot.savefig', format=fmt):
+                fig.savefig(path, format=fmt, bbox_inches='tight')
+            written.append(path)
+    return written
+
+
+def _export_task(file_path, out_dir, plots, kwargs):
+    """工作进程中执行的任务，异常以字符串返回"""
+    try:
+        return file_path, plots, export_run(file_path, out_dir, plots=plots, **kwargs), None
+    except Exception as exc:
+        return file_path, plots, [], f"{type(exc).__name__}: {exc}\n{traceback.format_exc()}"
+
+
+def _cheap_to_reopen(file_path, config, helios_kwargs):
+    """运行已有磁盘缓存条目或为导出的存储时，多个任务各自打开它的代价很小"""
+    from .dataio import HeliosData
+    from .store import is_store
+
+    if is_store(file_path):
+        return True
+    try:
+        return HeliosData(file_path, config, **helios_kwargs)._lookup_cache()
+    except OSError:
+        return False
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def export_report(files, out_dir, plots=None, formats=('png',), workers=None, common=None, plot_kwargs=None,
+                  config=None, force=False, progress=None, **helios_kwargs):
+    """
+    用进程池为多个结果文件导出报告图
+    - workers: 进程数，None 为 CPU 数，1 时在当前进程中执行
+    文件数少于进程数时，已缓存（或为存储目录）的文件的图再拆分为多个任务；
+    未缓存的文件每个任务都要重新读取与处理整个运行，不拆分
+    - progress: 可选回调 progress(file_path, written, error)
+    返回 {文件: {'written': [...], 'errors': [...]}}
+    """
+    plots = list(plots or REPORT_PLOTS)
+    kwargs = dict(formats=tuple(formats), common=common, plot_kwargs=plot_kwargs, config=config, force=force,
+                  **helios_kwargs)
+    n_workers = workers or os.cpu_count() or 1
+    groups = max(1, min(len(plots), n_workers // max(len(files), 1)))
+    tasks = []
+    for file_path in files:
+        n = groups if groups > 1 and _cheap_to_reopen(file_path, config, helios_kwargs) else 1
+        tasks.extend((file_path, plots[i::n]) for i in range(n))
+    results = {file_path: {'written': [], 'errors': []} for file_path in files}
+
+    def record(file_path, written, error):
+        results[file_path]['written'].extend(written)
+        if error:
+            results[file_path]['errors'].append(error)
+        if progress:
+            progress(file_path, written, error)
+
+    if n_workers == 1:
+        for file_path, group in tasks:
+            _, _, written, error = _export_task(file_path, out_dir, group, kwargs)
+            record(file_path, written, error)
+        return results
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_export_task, file_path, out_dir, group, kwargs) for file_path, group in tasks]
+        for future in as_completed(futures):
+            file_path, _, written, error = future.result()
+            record(file_path, written, error)
+    return results
+
+
+def _parse_range(text):
+    return tuple(float(v) for v in text.split(',')) if text else None
+
+
+def main(argv=None):
+    import matplotlib
+    matplotlib.use('Agg')
+    from .batch import find_runs
+    from .config import get_default_config
+
+    parser = argparse.ArgumentParser(description="批量导出 HELIOS 运行报告图")
+    parser.add_argument('paths', nargs='+', help=".exo 文件或包含它们的目录")
+    parser.add_argument('-o', '--out-dir', default='figures', help="输出目录")
+    parser.add_argument('-f', '--formats', default='png', help="逗号分隔的输出格式，如 png,pdf,svg")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="并行进程数")
+    parser.add_argument('--plots', default=','.join(REPORT_PLOTS), help="逗号分隔的图名")
+    parser.add_argument('--pattern', default='*.exo', help="目录中查找文件的模式")
+    parser.add_argument('--xlim', type=_parse_range, default=None, help="例如 0,5")
+    parser.add_argument('--ylim', type=_parse_range, default=None, help="例如 -20,120")
+    parser.add_argument('--lod', action='store_true', help="场图按输出分辨率降采样")
+    parser.add_argument('--force', action='store_true', help="重新导出已是最新的图")
+    parser.add_argument('--cache', action='store_true', help="使用处理后数据的磁盘缓存")
+    parser.add_argument('--compact', action='store_true', help="状态量以 float32 保存，降低内存占用")
+    args = parser.parse_args(argv)
+
+    common = {key: value for key, value in (('xlim', args.xlim), ('ylim', args.ylim)) if value is not None}
+    if args.lod:
+        common['lod'] = True
+
+    def progress(file_path, written, error):
+        status = 'error' if error else f"{len(written)} files"
+        print(f"{file_path}: {status}")
+        if error:
+            print(error)
+
+    results = export_report(find_runs(args.paths, args.pattern), args.out_dir,
+                            plots=[p.strip() for p in args.plots.split(',') if p.strip()],
+                            formats=[f.strip() for f in args.formats.split(',') if f.strip()],
+                            workers=args.workers, common=common, config=get_default_config(),
+                            force=args.force, progress=progress, cache=args.cache, compact=args.compact)
+    return 1 if any(r['errors'] for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
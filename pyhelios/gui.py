@@ -2,16 +2,28 @@
 PyHelios GUI Demo (高度模块化/可扩展)
 """
 import sys
+import threading
+import traceback
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QFileDialog, QLabel, QLineEdit, QColorDialog, QGroupBox, QFormLayout
+    QFileDialog, QLabel, QLineEdit, QColorDialog, QGroupBox, QFormLayout, QProgressBar, QComboBox,
+    QCheckBox
 )
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+from .config import get_default_config
 from .core import PyHelios
+from .plotting import update_plot
+
+# 跟随模式的轮询间隔
+FOLLOW_INTERVAL_MS = 2000
+# 控制面板可选的颜色表
+CMAPS = ['jet', 'viridis', 'plasma', 'inferno', 'magma', 'cividis', 'turbo', 'coolwarm', 'gray']
 
 class PlotControlPanel(QGroupBox):
-    """参数设置面板，可扩展更多控件"""
+    """参数设置面板，可扩展更多控件；参数修改完成时发出 changed 信号"""
+    changed = pyqtSignal()
     def __init__(self, parent=None):
         super().__init__("Plot Controls", parent)
         self.xlim_edit = QLineEdit()
@@ -20,17 +32,26 @@ class PlotControlPanel(QGroupBox):
         self.linecolor_btn = QPushButton("Choose Color")
         self.linecolor = 'black'
         self.linecolor_btn.clicked.connect(self.choose_color)
+        self.cmap_combo = QComboBox()
+        default_cmap = get_default_config().get('cmap')
+        self.cmap_combo.addItems(CMAPS if default_cmap in CMAPS else [default_cmap] + CMAPS)
+        self.cmap_combo.setCurrentText(default_cmap)
+        for edit in (self.xlim_edit, self.ylim_edit, self.linewidth_edit):
+            edit.editingFinished.connect(self.changed.emit)
+        self.cmap_combo.currentTextChanged.connect(lambda _: self.changed.emit())
         layout = QFormLayout()
         layout.addRow("xlim (e.g. 0,5)", self.xlim_edit)
         layout.addRow("ylim (e.g. -20,120)", self.ylim_edit)
         layout.addRow("Line Width", self.linewidth_edit)
         layout.addRow("Line Color", self.linecolor_btn)
+        layout.addRow("Colormap", self.cmap_combo)
         self.setLayout(layout)
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.linecolor = color.name()
             self.linecolor_btn.setStyleSheet(f"background:{self.linecolor}")
+            self.changed.emit()
     def get_params(self):
         params = {}
         if self.xlim_edit.text():
@@ -48,8 +69,105 @@ class PlotControlPanel(QGroupBox):
         except Exception:
             pass
         params['line_color'] = self.linecolor
+        params['cmap'] = self.cmap_combo.currentText()
         return params
 
+# 读取后预先加载的网格字段
+GRID_FIELDS = ['time_whole', 'zone_boundaries', 'time_edges', 'radius_edges']
+# 每种图需要在后台准备的字段
+PLOT_FIELDS = {
+    'radius': ['zone_boundaries', 'time_whole'],
+    'density': ['time_edges', 'radius_edges', 'mass_density'],
+    'eletemp': ['time_edges', 'radius_edges', 'elec_temperature'],
+    'iontemp': ['time_edges', 'radius_edges', 'ion_temperature'],
+    'radtemp': ['time_edges', 'radius_edges', 'rad_temperature'],
+    'pressure': ['time_edges', 'radius_edges', 'pressure'],
+    'fluidvel': ['time_edges', 'radius_edges', 'fluid_velocity'],
+}
+
+class Cancelled(Exception):
+    """任务被取消或被新的请求取代"""
+
+class Task(QObject):
+    """
+    在后台线程中执行 fn(report)，report(done, total, text) 汇报进度并在取消后抛出 Cancelled
+    结果通过信号回到主线程
+    """
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self._cancel = threading.Event()
+    def cancel(self):
+        self._cancel.set()
+    def is_cancelled(self):
+        return self._cancel.is_set()
+    def report(self, done=0, total=0, text=''):
+        if self._cancel.is_set():
+            raise Cancelled()
+        self.progress.emit(done, total, text)
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = self.fn(self.report)
+            if self._cancel.is_set():
+                raise Cancelled()
+        except Cancelled:
+            self.cancelled.emit()
+        except Exception as exc:
+            self.failed.emit(f"{type(exc).__name__}: {exc}\n{traceback.format_exc()}")
+        else:
+            self.finished.emit(result)
+
+class TaskRunner(QObject):
+    """
+    同一时间只有一个当前任务：新请求会取消正在进行的任务，旧任务的结果被丢弃
+    旧线程在结束前保留引用，避免 QThread 在运行中被销毁
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.current = None
+        self._threads = {}
+    def start(self, fn, on_done, on_progress=None, on_error=None, on_cancel=None):
+        self.cancel()
+        task, thread = Task(fn), QThread()
+        task.moveToThread(thread)
+        thread.started.connect(task.run)
+        if on_progress:
+            task.progress.connect(lambda *args: task is self.current and on_progress(*args))
+        task.finished.connect(lambda result: self._finish(task, on_done, result))
+        task.failed.connect(lambda message: self._finish(task, on_error, message))
+        task.cancelled.connect(lambda: self._finish(task, on_cancel))
+        for signal in (task.finished, task.failed, task.cancelled):
+            signal.connect(thread.quit)
+        thread.finished.connect(lambda: self._threads.pop(task, None))
+        self._threads[task] = thread
+        self.current = task
+        thread.start()
+        return task
+    def _finish(self, task, callback, *args):
+        # 只处理当前任务的结果
+        if task is not self.current:
+            return
+        self.current = None
+        if callback:
+            callback(*args)
+    def cancel(self):
+        if self.current is not None:
+            self.current.cancel()
+            self.current = None
+    def running(self):
+        return self.current is not None
+    def shutdown(self):
+        """取消当前任务并等待所有后台线程结束"""
+        self.cancel()
+        for thread in list(self._threads.values()):
+            thread.quit()
+            thread.wait()
+
 class MatplotlibCanvas(FigureCanvas):
     def __init__(self, parent=None):
         self.fig = Figure()
@@ -58,14 +176,26 @@ class MatplotlibCanvas(FigureCanvas):
     def clear(self):
         self.fig.clf()
         self.ax = self.fig.add_subplot(111)
-        self.draw()
 
 class PyHeliosGUI(QMainWindow):
-    def __init__(self):
+    """
+    读取、处理与绘图数据准备都在后台线程中进行，主线程只负责绘制
+    新的读取/绘图请求会取代正在进行的请求
+    """
+    def __init__(self, config=None):
         super().__init__()
         self.setWindowTitle("PyHelios GUI Demo")
+        # 是否使用磁盘缓存等由配置决定
+        self.config = config or get_default_config()
         self.helios = None
         self.data_file = None
+        self.runner = TaskRunner(self)
+        self.follow_runner = TaskRunner(self)
+        # 当前画布上的图及其显示参数
+        self.plot_kind = None
+        self.plot_params = {}
+        # 后台任务之间串行访问同一个数据对象
+        self._data_lock = threading.Lock()
         self.init_ui()
     def init_ui(self):
         main_widget = QWidget()
@@ -77,6 +207,17 @@ class PyHeliosGUI(QMainWindow):
         self.btn_load.clicked.connect(self.choose_file)
         self.btn_read = QPushButton("读取数据")
         self.btn_read.clicked.connect(self.read_data)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        self.btn_cancel = QPushButton("取消")
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_task)
+        # 跟随模式：定时读取仍在写入的文件中新追加的时间步
+        self.follow_check = QCheckBox("跟随写入中的文件")
+        self.follow_check.toggled.connect(self.set_follow)
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(FOLLOW_INTERVAL_MS)
+        self.follow_timer.timeout.connect(self.poll_file)
         self.btn_plot = QPushButton("Plot Radius")
         self.btn_plot.clicked.connect(self.plot_radius)
         self.btn_plot_density = QPushButton("Plot Density (w/ Shock)")
@@ -91,17 +232,19 @@ class PyHeliosGUI(QMainWindow):
         self.btn_plot_pressure.clicked.connect(self.plot_pressure)
         self.btn_plot_fluidvel = QPushButton("Plot Fluid Vel")
         self.btn_plot_fluidvel.clicked.connect(self.plot_fluidvel)
+        self.plot_buttons = [self.btn_plot, self.btn_plot_density, self.btn_plot_eletemp, self.btn_plot_iontemp,
+                             self.btn_plot_radtemp, self.btn_plot_pressure, self.btn_plot_fluidvel]
+        self.set_plots_enabled(False)
         self.plot_controls = PlotControlPanel()
+        self.plot_controls.changed.connect(self.update_style)
         left_panel.addWidget(self.file_label)
         left_panel.addWidget(self.btn_load)
         left_panel.addWidget(self.btn_read)
-        left_panel.addWidget(self.btn_plot)
-        left_panel.addWidget(self.btn_plot_density)
-        left_panel.addWidget(self.btn_plot_eletemp)
-        left_panel.addWidget(self.btn_plot_iontemp)
-        left_panel.addWidget(self.btn_plot_radtemp)
-        left_panel.addWidget(self.btn_plot_pressure)
-        left_panel.addWidget(self.btn_plot_fluidvel)
+        left_panel.addWidget(self.progress_bar)
+        left_panel.addWidget(self.btn_cancel)
+        left_panel.addWidget(self.follow_check)
+        for btn in self.plot_buttons:
+            left_panel.addWidget(btn)
         left_panel.addWidget(self.plot_controls)
         left_panel.addStretch()
         # 中间：matplotlib画布
@@ -110,88 +253,151 @@ class PyHeliosGUI(QMainWindow):
         main_layout.addWidget(self.canvas, 3)
         main_widget.setLayout(main_layout)
         self.setCentralWidget(main_widget)
+    def set_plots_enabled(self, enabled):
+        for btn in self.plot_buttons:
+            btn.setEnabled(enabled)
     def choose_file(self):
         fname, _ = QFileDialog.getOpenFileName(self, "选择数据文件", "", "All Files (*)")
         if fname:
             self.data_file = fname
             self.file_label.setText(fname)
+    # ---- 后台任务 ----
+    def start_task(self, fn, on_done, message):
+        self.file_label.setText(message)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+        self.btn_cancel.setEnabled(True)
+        self.runner.start(fn, lambda result: self._task_done(on_done, result), on_progress=self.on_progress,
+                          on_error=self.on_error, on_cancel=self._task_ended)
+    def _task_done(self, on_done, result):
+        self._task_ended()
+        on_done(result)
+    def _task_ended(self):
+        self.progress_bar.setVisible(False)
+        self.btn_cancel.setEnabled(False)
+    def on_progress(self, done, total, text):
+        # total 为 0 时显示忙碌状态
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+        if text:
+            self.file_label.setText(text)
+    def on_error(self, message):
+        self._task_ended()
+        self.file_label.setText(f"出错: {message.splitlines()[0]}")
+        print(message, file=sys.stderr)
+    def cancel_task(self):
+        self.runner.cancel()
+        self._task_ended()
+        self.file_label.setText("已取消")
+    def closeEvent(self, event):
+        self.follow_timer.stop()
+        self.follow_runner.shutdown()
+        self.runner.shutdown()
+        super().closeEvent(event)
     def read_data(self):
         if not self.data_file:
             self.file_label.setText("请先选择数据文件！")
             return
-        self.helios = PyHelios(self.data_file)
-        self.helios.load_and_process()
-        self.file_label.setText(f"已读取: {self.data_file}")
-    def plot_radius(self):
+        data_file = self.data_file
+        config = self.config
+        self.helios = None
+        self.set_plots_enabled(False)
+
+        def job(report):
+            helios = PyHelios(data_file, config)
+            helios.load_and_process(progress=lambda done, total, name: report(done, total, f"处理 {name}"))
+            helios.data.prefetch(GRID_FIELDS, progress=lambda done, total, name: report(done, total, f"读取 {name}"))
+            return helios
+        self.start_task(job, self._on_loaded, f"正在读取: {data_file}")
+    def _on_loaded(self, helios):
+        self.helios = helios
+        self.set_plots_enabled(True)
+        self.file_label.setText(f"已读取: {helios.data.file_path}")
+    def request_plot(self, kind, **extra):
+        """在后台读取 kind 所需的字段（及激波位置），完成后在主线程中直接画到画布"""
         if not self.helios:
             self.file_label.setText("请先读取数据！")
             return
-        params = self.plot_controls.get_params()
+        helios = self.helios
+        params = dict(self.plot_controls.get_params(), **extra)
+
+        def job(report):
+            with self._data_lock:
+                helios.data.prefetch(PLOT_FIELDS[kind],
+                                     progress=lambda done, total, name: report(done, total, f"准备 {name}"))
+                if params.get('shocktrack'):
+                    report(0, 0, "计算激波位置")
+                    helios.get('shock_pos', density_threshold=params.get('density_threshold', 1.1))
+            return params
+        self.start_task(job, lambda params: self.render(kind, params), f"准备 {kind} ...")
+    # ---- 绘制（主线程） ----
+    def render(self, kind, params):
+        """用 HeliosPlotter 直接画到画布的 Axes 上"""
         self.canvas.clear()
-        ax = self.helios.plotter.plot_radius(self.helios.data, **params)
-        # 将ax绘制到self.canvas
-        self.canvas.ax.clear()
-        for line in ax.get_lines():
-            self.canvas.ax.plot(line.get_xdata(), line.get_ydata(), color=line.get_color(), lw=line.get_linewidth())
-        if 'xlim' in params:
-            self.canvas.ax.set_xlim(*params['xlim'])
-        if 'ylim' in params:
-            self.canvas.ax.set_ylim(*params['ylim'])
-        self.canvas.ax.set_xlabel(ax.get_xlabel())
-        self.canvas.ax.set_ylabel(ax.get_ylabel())
-        self.canvas.ax.set_title(ax.get_title())
-        self.canvas.draw()
-    def plot_density(self):
-        if not self.helios:
-            self.file_label.setText("请先读取数据！")
+        getattr(self.helios.plotter, f"plot_{kind}")(self.helios.data, ax=self.canvas.ax, **params)
+        self.canvas.draw_idle()
+        self.plot_kind, self.plot_params = kind, params
+        self.file_label.setText(f"已读取: {self.helios.data.file_path}")
+    def update_style(self):
+        """控制面板参数改变时只修改已有图元并重绘，不重新计算"""
+        if self.plot_kind is None:
             return
         params = self.plot_controls.get_params()
-        params['shocktrack'] = True
-        self.canvas.clear()
-        ax = self.helios.plotter.plot_density(self.helios.data, **params)
-        self.canvas.ax.clear()
-        self.canvas.ax.imshow(ax.images[0].get_array(), aspect='auto') if ax.images else None
-        self.canvas.draw()
-    def plot_eletemp(self):
-        if not self.helios:
-            self.file_label.setText("请先读取数据！")
+        changed = {key: value for key, value in params.items() if self.plot_params.get(key) != value}
+        ax = self.canvas.ax
+        for key, axis in (('xlim', 'x'), ('ylim', 'y')):
+            # 清空范围时恢复自动范围
+            if key in self.plot_params and key not in params:
+                ax.autoscale(enable=True, axis=axis)
+        update_plot(ax, **changed)
+        self.plot_params.update(changed)
+        for key in ('xlim', 'ylim'):
+            if key not in params:
+                self.plot_params.pop(key, None)
+        self.canvas.draw_idle()
+    # ---- 跟随模式 ----
+    def set_follow(self, enabled):
+        if enabled:
+            self.follow_timer.start()
+        else:
+            self.follow_timer.stop()
+            self.follow_runner.cancel()
+    def poll_file(self):
+        """在后台读取新追加的时间步；读取或绘图任务进行中时跳过这一次"""
+        if not self.helios or self.runner.running() or self.follow_runner.running():
             return
-        params = self.plot_controls.get_params()
-        self.canvas.clear()
-        ax = self.helios.plotter.plot_eletemp(self.helios.data, **params)
-        self.canvas.draw()
-    def plot_iontemp(self):
-        if not self.helios:
-            self.file_label.setText("请先读取数据！")
+        helios = self.helios
+
+        def job(report):
+            with self._data_lock:
+                try:
+                    return helios.refresh()
+                except (OSError, ValueError):
+                    # 文件正在写入，下次再读
+                    return 0
+        self.follow_runner.start(job, lambda n_new: self._on_followed(helios, n_new),
+                                 on_error=lambda message: print(message, file=sys.stderr))
+    def _on_followed(self, helios, n_new):
+        if not n_new or helios is not self.helios:
             return
-        params = self.plot_controls.get_params()
-        self.canvas.clear()
-        ax = self.helios.plotter.plot_iontemp(self.helios.data, **params)
-        self.canvas.draw()
+        self.file_label.setText(f"已读取: {helios.data.file_path} ({helios.data.n_times} steps)")
+        # 只用内存中已更新的数据重画，不重新读取历史数据
+        if self.plot_kind is not None and not self.runner.running():
+            self.render(self.plot_kind, self.plot_params)
+    def plot_radius(self):
+        self.request_plot('radius')
+    def plot_density(self):
+        self.request_plot('density', shocktrack=True)
+    def plot_eletemp(self):
+        self.request_plot('eletemp')
+    def plot_iontemp(self):
+        self.request_plot('iontemp')
     def plot_radtemp(self):
-        if not self.helios:
-            self.file_label.setText("请先读取数据！")
-            return
-        params = self.plot_controls.get_params()
-        self.canvas.clear()
-        ax = self.helios.plotter.plot_radtemp(self.helios.data, **params)
-        self.canvas.draw()
+        self.request_plot('radtemp')
     def plot_pressure(self):
-        if not self.helios:
-            self.file_label.setText("请先读取数据！")
-            return
-        params = self.plot_controls.get_params()
-        self.canvas.clear()
-        ax = self.helios.plotter.plot_pressure(self.helios.data, **params)
-        self.canvas.draw()
+        self.request_plot('pressure')
     def plot_fluidvel(self):
-        if not self.helios:
-            self.file_label.setText("请先读取数据！")
-            return
-        params = self.plot_controls.get_params()
-        self.canvas.clear()
-        ax = self.helios.plotter.plot_fluidvel(self.helios.data, **params)
-        self.canvas.draw()
+        self.request_plot('fluidvel')
 
 # 入口
 if __name__ == "__main__":
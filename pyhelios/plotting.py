@@ -1,12 +1,171 @@
 """
 绘图与风格模块
 """
+import matplotlib as mpl
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, QuadMesh
 import os
 import numpy as np
-from .analysis import detect_shock_front, max_pressure, max_density
+from .profiling import profiled, stage
+
+def _crop(edges, lim):
+    """返回与区间 lim 相交的单元下标范围 [start, stop)，edges 为升序边界"""
+    if lim is None:
+        return 0, len(edges) - 1
+    lo, hi = min(lim), max(lim)
+    start = min(max(int(np.searchsorted(edges, lo, side='right')) - 1, 0), len(edges) - 2)
+    stop = min(int(np.searchsorted(edges, hi, side='left')), len(edges) - 1)
+    return start, max(stop, start + 1)
+
+def _block_extrema(values, row_starts, col_starts):
+    """分块聚合：每块取绝对值最大的极值（最大值或最小值），使峰值等局部极值仍然可见"""
+    vmax = np.maximum.reduceat(np.maximum.reduceat(values, row_starts, axis=0), col_starts, axis=1)
+    vmin = np.minimum.reduceat(np.minimum.reduceat(values, row_starts, axis=0), col_starts, axis=1)
+    return np.where(np.abs(vmax) >= np.abs(vmin), vmax, vmin)
+
+class MeshPlan:
+    '''
+    降采样方案：裁剪范围与分块起点，同一网格上的多个字段可共用
+    - rows/zones: 裁剪后的时间步与区域切片
+    - row_starts/col_starts: 裁剪后每块的起始下标
+    '''
+    def __init__(self, time_edges, radius_edges, pixels, xlim=None, ylim=None):
+        t0, t1 = _crop(time_edges, xlim)
+        z0, z1 = 0, radius_edges.shape[1] - 1
+        if ylim is not None:
+            edges = radius_edges[t0:t1 + 1]
+            lo = np.minimum(edges[:, :-1], edges[:, 1:]).min(axis=0)
+            hi = np.maximum(edges[:, :-1], edges[:, 1:]).max(axis=0)
+            visible = np.nonzero((hi >= min(ylim)) & (lo <= max(ylim)))[0]
+            if len(visible) > 0:
+                z0, z1 = visible[0], visible[-1] + 1
+        nt, nr = t1 - t0, z1 - z0
+        kt = max(int(np.ceil(nt / max(pixels[0], 1))), 1)
+        kr = max(int(np.ceil(nr / max(pixels[1], 1))), 1)
+        self.rows, self.zones = slice(t0, t1), slice(z0, z1)
+        self.row_starts, self.col_starts = np.arange(0, nt, kt), np.arange(0, nr, kr)
+        self.blocked = kt > 1 or kr > 1
+        row_edges = np.append(self.row_starts, nt) + t0
+        col_edges = np.append(self.col_starts, nr) + z0
+        self.time_edges = time_edges[row_edges]
+        self.radius_edges = radius_edges[row_edges][:, col_edges]
+
+    def apply(self, values):
+        """对 shape (nt, nr) 的字段裁剪并按块取极值"""
+        values = values[self.rows, self.zones]
+        if self.blocked:
+            values = _block_extrema(values, self.row_starts, self.col_starts)
+        return values
+
+@profiled('plot.decimate_mesh')
+def decimate_mesh(time_edges, radius_edges, values, pixels, xlim=None, ylim=None):
+    '''
+    把 Lagrange 网格场降采样到输出像素分辨率
+    - time_edges: shape (nt+1,)；radius_edges: shape (nt+1, nr+1)；values: shape (nt, nr)
+    - pixels: (宽, 高) 像素数，时间方向单元数不超过宽，区域方向不超过高
+    - xlim/ylim: 只保留与显示范围相交的单元
+    每个块的网格取块角上的原始边界，数值取块内极值
+    返回降采样后的 (time_edges, radius_edges, values)
+    '''
+    plan = MeshPlan(time_edges, radius_edges, pixels, xlim, ylim)
+    return plan.time_edges, plan.radius_edges, plan.apply(values)
+
+# 场图字段 -> (标题, 色标标签)
+FIELD_LABELS = {
+    'mass_density': ('Mass Density', r"$\rho$ (g/cc)"),
+    'elec_temperature': ('Electron Temperature', r"$T_e$ (keV)"),
+    'ion_temperature': ('Ion Temperature', r"$T_i$ (keV)"),
+    'rad_temperature': ('Radiation Temperature', r"$T_r$ (keV)"),
+    'pressure': ('Pressure', r"P (Mbar)"),
+    'fluid_velocity': ('Fluid Velocity', r"Fluid Velocity (km/s)"),
+}
+
+class FieldDashboard:
+    '''
+    共用网格的多面板场图
+    所有面板的 QuadMesh 共享同一份网格坐标；set_field 只替换颜色数据，不重建图元
+    '''
+    def __init__(self, helios_data, fig, axes, meshes, colorbars, labels, fields, plan=None):
+        self.helios_data = helios_data
+        self.fig = fig
+        self.axes = axes
+        self.meshes = meshes
+        self.colorbars = colorbars
+        self.labels = labels
+        self.fields = fields
+        self.plan = plan
+
+    def values(self, key):
+        """面板中显示的数值（已按降采样方案处理）"""
+        values = self.helios_data.data[key]
+        return self.plan.apply(values) if self.plan is not None else values
+
+    def set_field(self, panel, key):
+        """把第 panel 个面板切换为字段 key"""
+        values = self.values(key)
+        mesh = self.meshes[panel]
+        mesh.set_array(values.T)
+        mesh.set_clim(np.nanmin(values), np.nanmax(values))
+        name, cbar_label = FIELD_LABELS.get(key, (key, key))
+        file_path = getattr(self.helios_data, 'file_path', None)
+        fname = os.path.splitext(os.path.basename(file_path))[0] if file_path else ''
+        self.axes[panel].set_title(f"{fname} {name}")
+        self.labels[panel].set_text(cbar_label)
+        self.fields[panel] = key
+        self.fig.canvas.draw_idle()
+
+def update_plot(ax, xlim=None, ylim=None, cmap=None, line_width=None, line_color=None):
+    '''
+    只修改已有图元的显示属性，不重新计算数据，调用方随后重绘画布即可
+    - xlim/ylim: 坐标范围
+    - cmap: 场图（QuadMesh）的颜色表，色标随之更新
+    - line_width/line_color: 轨迹图（LineCollection）的线宽与颜色
+    使用 lod 且按 xlim/ylim 裁剪过的场图在范围扩大时需要重新绘制
+    '''
+    if xlim is not None:
+        ax.set_xlim(xlim)
+    if ylim is not None:
+        ax.set_ylim(ylim)
+    for coll in ax.collections:
+        if isinstance(coll, QuadMesh):
+            if cmap is not None:
+                coll.set_cmap(cmap)
+        elif isinstance(coll, LineCollection):
+            if line_width is not None:
+                coll.set_linewidth(line_width)
+            if line_color is not None:
+                coll.set_color(line_color)
+    return ax
+
+class LivePlot:
+    '''
+    跟随模式下可刷新的图：refresh() 清空 figure，用内存中已更新的数据重画到同一 figure
+    - method: HeliosPlotter 的单图方法名，如 'plot_density'
+    - kwargs: 传给绘图方法的参数
+    '''
+    def __init__(self, plotter, helios_data, method, fig=None, **kwargs):
+        self.plotter = plotter
+        self.helios_data = helios_data
+        self.method = method
+        self.kwargs = kwargs
+        config = plotter.config
+        self.fig = fig if fig is not None else plt.figure(figsize=kwargs.get('figsize', config.get('figsize')),
+                                                          dpi=config.get('dpi'))
+        self.ax = None
+        self.refresh()
+
+    def refresh(self):
+        self.fig.clf()
+        self.ax = self.fig.add_subplot(111)
+        getattr(self.plotter, self.method)(self.helios_data, ax=self.ax, **self.kwargs)
+        self.fig.canvas.draw_idle()
+        self.fig.canvas.flush_events()
+        return self.ax
 
 class HeliosPlotter:
+    '''
+    绘图器，单图方法都接受 ax 参数：给出时直接画到该 Axes（如 GUI 画布），否则新建图
+    '''
     def __init__(self, config=None):
         self.config = config or {}
         self._apply_style()
@@ -22,8 +181,21 @@ class HeliosPlotter:
         mpl.rcParams['xtick.major.width'] = self.config.get('tick_width', 0.5)
         mpl.rcParams['ytick.major.width'] = self.config.get('tick_width', 0.5)
 
+    @staticmethod
+    def _axes(kwargs, figsize, dpi):
+        """kwargs 中给出 ax 时使用它，否则新建 figure"""
+        ax = kwargs.get('ax')
+        if ax is None:
+            return plt.subplots(figsize=figsize, dpi=dpi)
+        return ax.figure, ax
+
+    @profiled('plot.plot_radius')
     def plot_radius(self, helios_data, **kwargs):
-        """绘制半径演化图"""
+        """
+        绘制半径演化图，全部区域边界轨迹作为一个 LineCollection 绘制
+        - zone_stride: 每隔 N 条边界绘制一条（最外侧边界总是绘制）
+        - regions: [(start, stop, color), ...] 按边界下标范围分区着色，其余用 line_color
+        """
         data = helios_data.data
         time = data['time_whole']
         radius = data['zone_boundaries']
@@ -36,6 +208,8 @@ class HeliosPlotter:
         figsize = kwargs.get('figsize', self.config.get('figsize'))
         line_width = kwargs.get('line_width', 0.5)
         line_color = kwargs.get('line_color', 'black')
+        zone_stride = kwargs.get('zone_stride', 1)
+        regions = kwargs.get('regions')
         font_size = self.config.get('font_size')
         font_family = self.config.get('font_family')
         dpi = self.config.get('dpi')
@@ -43,9 +217,18 @@ class HeliosPlotter:
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
 
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        for i in range(radius.shape[1]):
-            ax.plot(time, radius[:, i], color=line_color, lw=line_width)
+        fig, ax = self._axes(kwargs, figsize, dpi)
+        n_lines = radius.shape[1]
+        idx = np.unique(np.append(np.arange(0, n_lines, zone_stride), n_lines - 1))
+        segments = np.empty((len(idx), len(time), 2))
+        segments[:, :, 0] = time
+        segments[:, :, 1] = radius[:, idx].T
+        colors = [line_color] * len(idx)
+        for start, stop, color in regions or []:
+            for j in np.nonzero((idx >= start) & (idx < stop))[0]:
+                colors[j] = color
+        ax.add_collection(LineCollection(segments, colors=colors, linewidths=line_width))
+        ax.autoscale_view()
 
         ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
         ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
@@ -59,62 +242,21 @@ class HeliosPlotter:
             ax.set_ylim(kwargs['ylim'])
         return ax
 
-    def plot_density(self, helios_data, **kwargs):
+    def _plot_field(self, helios_data, key, name, cbar_label, **kwargs):
         '''
-        绘制密度图,支持shocktrack叠加主冲击波界面，负梯度最大密度梯度法
+        绘制 (time, radius) 场图的公共部分
+        - lod: True 时按输出像素分辨率对网格降采样（保留每块中的极值），见 decimate_mesh
+        - lod_pixels: 降采样目标 (宽, 高) 像素数，默认由 figsize 与 dpi 计算
+        - rasterized: 只把网格层栅格化，矢量输出（PDF/SVG）中坐标轴与文字仍为矢量
+        - ax: 画到已有的 Axes，色标占用该 Axes 所在 figure 的空间
         '''
         data = helios_data.data
         time_edges = data['time_edges']
         radius_edges = data['radius_edges']
-        density = data['mass_density']
-        file_path = getattr(helios_data, 'file_path', None)
-        if file_path:
-            fname = os.path.splitext(os.path.basename(file_path))[0]
-        else:
-            fname = ''
-        title = f"{fname} Mass Density"
-        figsize = kwargs.get('figsize', self.config.get('figsize'))
-        cmap = kwargs.get('cmap', self.config.get('cmap'))
-        font_size = self.config.get('font_size')
-        font_family = self.config.get('font_family')
-        dpi = self.config.get('dpi')
-        border_width = self.config.get('border_width')
-        tick_length = self.config.get('tick_length')
-        tick_width = self.config.get('tick_width')
-        shocktrack = kwargs.get('shocktrack', False)
-        density_threshold = kwargs.get('density_threshold', 1.1)
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        cmesh = ax.pcolormesh(time_edges, radius_edges.T, density.T, shading='auto', cmap=cmap)
-        cbar = fig.colorbar(cmesh, ax=ax)
-        cbar.ax.tick_params(labelsize=font_size, length=tick_length, width=tick_width)
-        cbar.outline.set_linewidth(border_width)
-        cbar_label = r"$\rho$ (g/cc)"
-        cbar.ax.text(0.5, 1.02, cbar_label, ha='center', va='bottom', fontsize=font_size, fontfamily=font_family, transform=cbar.ax.transAxes)
-        ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
-        ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
-        ax.set_title(title, fontsize=font_size, fontfamily=font_family)
-        ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
-        for label in (ax.get_xticklabels() + ax.get_yticklabels()):
-            label.set_fontname(font_family)
-        for spine in ax.spines.values():
-            spine.set_linewidth(border_width)
-        if 'xlim' in kwargs:
-            ax.set_xlim(kwargs['xlim'])
-        if 'ylim' in kwargs:
-            ax.set_ylim(kwargs['ylim'])
-        if shocktrack:
-            shock_pos = detect_shock_front(density, radius_edges, time_edges, density_threshold)
-            ax.plot(time_edges[:-1], shock_pos, 'w--', lw=1)
-        return ax
-
-    def plot_eletemp(self, helios_data, **kwargs):
-        data = helios_data.data
-        time_edges = data['time_edges']
-        radius_edges = data['radius_edges']
-        elec_temperature = data['elec_temperature']
+        values = data[key]
         file_path = getattr(helios_data, 'file_path', None)
         fname = os.path.splitext(os.path.basename(file_path))[0] if file_path else ''
-        title = f"{fname} Electron Temperature"
+        title = f"{fname} {name}"
         figsize = kwargs.get('figsize', self.config.get('figsize'))
         cmap = kwargs.get('cmap', self.config.get('cmap'))
         font_size = self.config.get('font_size')
@@ -123,12 +265,23 @@ class HeliosPlotter:
         border_width = self.config.get('border_width')
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        cmesh = ax.pcolormesh(time_edges, radius_edges.T, elec_temperature.T, shading='auto', cmap=cmap)
+        lod = kwargs.get('lod', self.config.get('lod', False))
+        rasterized = kwargs.get('rasterized', self.config.get('rasterized', False))
+        fig, ax = self._axes(kwargs, figsize, dpi)
+        if lod:
+            pixels = kwargs.get('lod_pixels')
+            if pixels is None:
+                # 画到已有 Axes 时按其实际像素大小降采样
+                bbox = ax.get_window_extent() if kwargs.get('ax') is not None else None
+                pixels = (int(bbox.width), int(bbox.height)) if bbox is not None \
+                    else (int(figsize[0] * dpi), int(figsize[1] * dpi))
+            time_edges, radius_edges, values = decimate_mesh(time_edges, radius_edges, values, pixels,
+                                                             kwargs.get('xlim'), kwargs.get('ylim'))
+        with stage('plot.pcolormesh', cells=values.size):
+            cmesh = ax.pcolormesh(time_edges, radius_edges.T, values.T, shading='auto', cmap=cmap, rasterized=rasterized)
         cbar = fig.colorbar(cmesh, ax=ax)
         cbar.ax.tick_params(labelsize=font_size, length=tick_length, width=tick_width)
         cbar.outline.set_linewidth(border_width)
-        cbar_label = r"$T_e$ (keV)"
         cbar.ax.text(0.5, 1.02, cbar_label, ha='center', va='bottom', fontsize=font_size, fontfamily=font_family, transform=cbar.ax.transAxes)
         ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
         ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
@@ -144,51 +297,54 @@ class HeliosPlotter:
             spine.set_linewidth(border_width)
         return ax
 
-    def plot_iontemp(self, helios_data, **kwargs):
-        data = helios_data.data
-        time_edges = data['time_edges']
-        radius_edges = data['radius_edges']
-        ion_temperature = data['ion_temperature']
-        file_path = getattr(helios_data, 'file_path', None)
-        fname = os.path.splitext(os.path.basename(file_path))[0] if file_path else ''
-        title = f"{fname} Ion Temperature"
-        figsize = kwargs.get('figsize', self.config.get('figsize'))
-        cmap = kwargs.get('cmap', self.config.get('cmap'))
-        font_size = self.config.get('font_size')
-        font_family = self.config.get('font_family')
-        dpi = self.config.get('dpi')
-        border_width = self.config.get('border_width')
-        tick_length = self.config.get('tick_length')
-        tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        cmesh = ax.pcolormesh(time_edges, radius_edges.T, ion_temperature.T, shading='auto', cmap=cmap)
-        cbar = fig.colorbar(cmesh, ax=ax)
-        cbar.ax.tick_params(labelsize=font_size, length=tick_length, width=tick_width)
-        cbar.outline.set_linewidth(border_width)
-        cbar_label = r"$T_i$ (keV)"
-        cbar.ax.text(0.5, 1.02, cbar_label, ha='center', va='bottom', fontsize=font_size, fontfamily=font_family, transform=cbar.ax.transAxes)
-        ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
-        ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
-        ax.set_title(title, fontsize=font_size, fontfamily=font_family)
-        ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
-        if 'xlim' in kwargs:
-            ax.set_xlim(kwargs['xlim'])
-        if 'ylim' in kwargs:
-            ax.set_ylim(kwargs['ylim'])
-        for label in (ax.get_xticklabels() + ax.get_yticklabels()):
-            label.set_fontname(font_family)
-        for spine in ax.spines.values():
-            spine.set_linewidth(border_width)
+    @profiled('plot.plot_density')
+    def plot_density(self, helios_data, **kwargs):
+        '''
+        绘制密度图,支持shocktrack叠加主冲击波界面，负梯度最大密度梯度法
+        '''
+        ax = self._plot_field(helios_data, 'mass_density', *FIELD_LABELS['mass_density'], **kwargs)
+        if kwargs.get('shocktrack', False):
+            density_threshold = kwargs.get('density_threshold', 1.1)
+            shock_pos = helios_data.get('shock_pos', density_threshold=density_threshold)
+            ax.plot(helios_data.data['time_edges'][:-1], shock_pos, 'w--', lw=1)
         return ax
 
+    @profiled('plot.plot_eletemp')
+    def plot_eletemp(self, helios_data, **kwargs):
+        return self._plot_field(helios_data, 'elec_temperature', *FIELD_LABELS['elec_temperature'], **kwargs)
+
+    @profiled('plot.plot_iontemp')
+    def plot_iontemp(self, helios_data, **kwargs):
+        return self._plot_field(helios_data, 'ion_temperature', *FIELD_LABELS['ion_temperature'], **kwargs)
+
+    @profiled('plot.plot_radtemp')
     def plot_radtemp(self, helios_data, **kwargs):
-        data = helios_data.data
-        time_edges = data['time_edges']
-        radius_edges = data['radius_edges']
-        rad_temperature = data['rad_temperature']
+        return self._plot_field(helios_data, 'rad_temperature', *FIELD_LABELS['rad_temperature'], **kwargs)
+
+    @profiled('plot.plot_pressure')
+    def plot_pressure(self, helios_data, **kwargs):
+        return self._plot_field(helios_data, 'pressure', *FIELD_LABELS['pressure'], **kwargs)
+
+    @profiled('plot.plot_fluidvel')
+    def plot_fluidvel(self, helios_data, **kwargs):
+        return self._plot_field(helios_data, 'fluid_velocity', *FIELD_LABELS['fluid_velocity'], **kwargs)
+
+    @profiled('plot.plot_remapped')
+    def plot_remapped(self, helios_data, key='mass_density', **kwargs):
+        '''
+        场投影到固定半径网格后用 imshow 绘制，不需要逐单元的非均匀网格
+        - n_radius/r_range/weight: 见 HeliosData.remap，投影结果按参数缓存
+        - 时间步不等间隔时改用 NonUniformImage（同样按图像绘制）
+        其余参数同单个场图
+        '''
+        from matplotlib.image import NonUniformImage
+        grid_edges, values = helios_data.remap(key, n_radius=kwargs.get('n_radius'), r_range=kwargs.get('r_range'),
+                                               weight=kwargs.get('weight'))
+        time_edges = helios_data.data['time_edges']
+        time = helios_data.data['time_whole']
+        name, cbar_label = FIELD_LABELS.get(key, (key, key))
         file_path = getattr(helios_data, 'file_path', None)
         fname = os.path.splitext(os.path.basename(file_path))[0] if file_path else ''
-        title = f"{fname} Radiation Temperature"
         figsize = kwargs.get('figsize', self.config.get('figsize'))
         cmap = kwargs.get('cmap', self.config.get('cmap'))
         font_size = self.config.get('font_size')
@@ -197,73 +353,83 @@ class HeliosPlotter:
         border_width = self.config.get('border_width')
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        cmesh = ax.pcolormesh(time_edges, radius_edges.T, rad_temperature.T, shading='auto', cmap=cmap)
-        cbar = fig.colorbar(cmesh, ax=ax)
+        fig, ax = self._axes(kwargs, figsize, dpi)
+        extent = (time_edges[0], time_edges[-1], grid_edges[0], grid_edges[-1])
+        dt = np.diff(time)
+        with stage('plot.imshow', cells=values.size):
+            if len(dt) == 0 or np.allclose(dt, dt[0], rtol=1e-3):
+                image = ax.imshow(values.T, origin='lower', aspect='auto', extent=extent, cmap=cmap,
+                                  interpolation='nearest')
+            else:
+                image = NonUniformImage(ax, cmap=cmap, extent=extent, interpolation='nearest')
+                image.set_data(time, 0.5 * (grid_edges[:-1] + grid_edges[1:]), values.T)
+                ax.add_image(image)
+                ax.set_xlim(extent[:2])
+                ax.set_ylim(extent[2:])
+        cbar = fig.colorbar(image, ax=ax)
         cbar.ax.tick_params(labelsize=font_size, length=tick_length, width=tick_width)
         cbar.outline.set_linewidth(border_width)
-        cbar_label = r"$T_r$ (keV)"
         cbar.ax.text(0.5, 1.02, cbar_label, ha='center', va='bottom', fontsize=font_size, fontfamily=font_family, transform=cbar.ax.transAxes)
         ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
         ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
-        ax.set_title(title, fontsize=font_size, fontfamily=font_family)
+        ax.set_title(f"{fname} {name} (remapped)", fontsize=font_size, fontfamily=font_family)
         ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
         if 'xlim' in kwargs:
             ax.set_xlim(kwargs['xlim'])
         if 'ylim' in kwargs:
             ax.set_ylim(kwargs['ylim'])
-        for label in (ax.get_xticklabels() + ax.get_yticklabels()):
-            label.set_fontname(font_family)
         for spine in ax.spines.values():
             spine.set_linewidth(border_width)
         return ax
 
-    def plot_pressure(self, helios_data, **kwargs):
-        data = helios_data.data
-        time_edges = data['time_edges']
-        radius_edges = data['radius_edges']
-        pressure = data['pressure']
-        file_path = getattr(helios_data, 'file_path', None)
-        fname = os.path.splitext(os.path.basename(file_path))[0] if file_path else ''
-        title = f"{fname} Pressure"
+    @profiled('plot.plot_lineout')
+    def plot_lineout(self, helios_data, radius, key='mass_density', **kwargs):
+        '''
+        固定半径处字段随时间的变化，radius 可为序列（每个半径一条线）
+        - n_radius/r_range/weight: 见 HeliosData.remap
+        '''
+        time = helios_data.data['time_whole']
+        series = helios_data.lineout(radius, key, n_radius=kwargs.get('n_radius'), r_range=kwargs.get('r_range'),
+                                     weight=kwargs.get('weight'))
+        name, cbar_label = FIELD_LABELS.get(key, (key, key))
         figsize = kwargs.get('figsize', self.config.get('figsize'))
-        cmap = kwargs.get('cmap', self.config.get('cmap'))
         font_size = self.config.get('font_size')
         font_family = self.config.get('font_family')
         dpi = self.config.get('dpi')
         border_width = self.config.get('border_width')
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        cmesh = ax.pcolormesh(time_edges, radius_edges.T, pressure.T, shading='auto', cmap=cmap)
-        cbar = fig.colorbar(cmesh, ax=ax)
-        cbar.ax.tick_params(labelsize=font_size, length=tick_length, width=tick_width)
-        cbar.outline.set_linewidth(border_width)
-        cbar_label = r"P (Mbar)"
-        cbar.ax.text(0.5, 1.02, cbar_label, ha='center', va='bottom', fontsize=font_size, fontfamily=font_family, transform=cbar.ax.transAxes)
+        fig, ax = self._axes(kwargs, figsize, dpi)
+        for r, values in zip(np.atleast_1d(radius), np.atleast_2d(series)):
+            ax.plot(time, values, lw=kwargs.get('line_width', 1), label=f"r = {r:g} $\\mu$m")
         ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
-        ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
-        ax.set_title(title, fontsize=font_size, fontfamily=font_family)
-        ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
+        ax.set_ylabel(cbar_label, fontsize=font_size, fontfamily=font_family)
+        ax.set_title(f"{name} Lineout", fontsize=font_size, fontfamily=font_family)
         if 'xlim' in kwargs:
             ax.set_xlim(kwargs['xlim'])
         if 'ylim' in kwargs:
             ax.set_ylim(kwargs['ylim'])
-        for label in (ax.get_xticklabels() + ax.get_yticklabels()):
-            label.set_fontname(font_family)
+        ax.legend(fontsize=font_size)
+        ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
         for spine in ax.spines.values():
             spine.set_linewidth(border_width)
         return ax
 
-    def plot_fluidvel(self, helios_data, **kwargs):
+    @profiled('plot.plot_dashboard')
+    def plot_dashboard(self, helios_data, fields=None, ncols=3, **kwargs):
+        '''
+        多面板场图：网格几何（及降采样方案）只构建一次，所有面板共享坐标与缩放
+        - fields: FIELD_LABELS 中的字段列表，默认全部六个
+        - ncols: 每行面板数
+        - xlim/ylim/cmap/lod/lod_pixels/rasterized 同单个场图
+        返回 FieldDashboard，可用 set_field(panel, key) 只替换颜色数据
+        '''
         data = helios_data.data
-        time_edges = data['time_edges']
-        radius_edges = data['radius_edges']
-        fluid_velocity = data['fluid_velocity']
-        file_path = getattr(helios_data, 'file_path', None)
-        fname = os.path.splitext(os.path.basename(file_path))[0] if file_path else ''
-        title = f"{fname} Fluid Velocity"
-        figsize = kwargs.get('figsize', self.config.get('figsize'))
+        fields = list(fields or FIELD_LABELS)
+        nrows = int(np.ceil(len(fields) / ncols))
+        ncols = min(ncols, len(fields))
+        base = self.config.get('figsize')
+        figsize = kwargs.get('figsize', (base[0] * ncols, base[1] * nrows))
         cmap = kwargs.get('cmap', self.config.get('cmap'))
         font_size = self.config.get('font_size')
         font_family = self.config.get('font_family')
@@ -271,35 +437,70 @@ class HeliosPlotter:
         border_width = self.config.get('border_width')
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        cmesh = ax.pcolormesh(time_edges, radius_edges.T, fluid_velocity.T, shading='auto', cmap=cmap)
-        cbar = fig.colorbar(cmesh, ax=ax)
-        cbar.ax.tick_params(labelsize=font_size, length=tick_length, width=tick_width)
-        cbar.outline.set_linewidth(border_width)
-        cbar_label = r"Fluid Velocity (km/s)"
-        cbar.ax.text(0.5, 1.02, cbar_label, ha='center', va='bottom', fontsize=font_size, fontfamily=font_family, transform=cbar.ax.transAxes)
-        ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
-        ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
-        ax.set_title(title, fontsize=font_size, fontfamily=font_family)
-        ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
+        lod = kwargs.get('lod', self.config.get('lod', False))
+        rasterized = kwargs.get('rasterized', self.config.get('rasterized', False))
+        time_edges = data['time_edges']
+        radius_edges = data['radius_edges']
+        plan = None
+        if lod:
+            pixels = kwargs.get('lod_pixels') or (int(figsize[0] * dpi / ncols), int(figsize[1] * dpi / nrows))
+            plan = MeshPlan(time_edges, radius_edges, pixels, kwargs.get('xlim'), kwargs.get('ylim'))
+            time_edges, radius_edges = plan.time_edges, plan.radius_edges
+        # 网格坐标只构建一次，各面板的 QuadMesh 共用
+        coords = np.empty((radius_edges.shape[1], len(time_edges), 2))
+        coords[..., 0] = time_edges
+        coords[..., 1] = radius_edges.T
+        corners = [[np.min(time_edges), np.min(radius_edges)], [np.max(time_edges), np.max(radius_edges)]]
+        fig, axes = plt.subplots(nrows, ncols, figsize=figsize, dpi=dpi, sharex=True, sharey=True, squeeze=False)
+        axes = list(axes.flat)
+        meshes, colorbars, labels = [], [], []
+        for ax in axes[len(fields):]:
+            ax.set_visible(False)
+        for i, ax in enumerate(axes[:len(fields)]):
+            mesh = QuadMesh(coords, cmap=cmap, rasterized=rasterized, edgecolors='none', antialiased=False,
+                            snap=mpl.rcParams['pcolormesh.snap'])
+            mesh.set_array(np.zeros((coords.shape[0] - 1, coords.shape[1] - 1)))
+            ax.add_collection(mesh)
+            ax.update_datalim(corners)
+            cbar = fig.colorbar(mesh, ax=ax)
+            cbar.ax.tick_params(labelsize=font_size, length=tick_length, width=tick_width)
+            cbar.outline.set_linewidth(border_width)
+            labels.append(cbar.ax.text(0.5, 1.02, '', ha='center', va='bottom', fontsize=font_size, fontfamily=font_family, transform=cbar.ax.transAxes))
+            if i // ncols == nrows - 1 or i + ncols >= len(fields):
+                ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
+            if i % ncols == 0:
+                ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
+            ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
+            for spine in ax.spines.values():
+                spine.set_linewidth(border_width)
+            meshes.append(mesh)
+            colorbars.append(cbar)
+        axes[0].autoscale_view()
         if 'xlim' in kwargs:
-            ax.set_xlim(kwargs['xlim'])
+            axes[0].set_xlim(kwargs['xlim'])
         if 'ylim' in kwargs:
-            ax.set_ylim(kwargs['ylim'])
-        for label in (ax.get_xticklabels() + ax.get_yticklabels()):
-            label.set_fontname(font_family)
-        for spine in ax.spines.values():
-            spine.set_linewidth(border_width)
-        return ax
+            axes[0].set_ylim(kwargs['ylim'])
+        dashboard = FieldDashboard(helios_data, fig, axes[:len(fields)], meshes, colorbars, labels, list(fields), plan)
+        for i, key in enumerate(fields):
+            dashboard.set_field(i, key)
+            dashboard.axes[i].title.set_fontsize(font_size)
+            dashboard.axes[i].title.set_fontfamily(font_family)
+        return dashboard
 
+    @profiled('plot.plot_shocktrack')
     def plot_shocktrack(self, helios_data, **kwargs):
-        '''独立可视化主冲击波界面随时间的演化，返回shock_pos数组'''
+        '''
+        独立可视化主冲击波界面随时间的演化
+        - density_thresholds: 阈值序列，给出时叠加各阈值下的轨迹族（一次检测完成）
+        '''
         data = helios_data.data
         time_edges = data['time_edges']
-        radius_edges = data['radius_edges']
-        density = data['mass_density']
         density_threshold = kwargs.get('density_threshold', 1.1)
-        shock_pos = detect_shock_front(density, radius_edges, time_edges, density_threshold)
+        density_thresholds = kwargs.get('density_thresholds')
+        if density_thresholds is None:
+            shock_pos = helios_data.get('shock_pos', density_threshold=density_threshold)
+        else:
+            shock_family = helios_data.get('shock_fronts', density_thresholds=density_thresholds)
         file_path = getattr(helios_data, 'file_path', None)
         if file_path:
             fname = os.path.splitext(os.path.basename(file_path))[0]
@@ -313,8 +514,13 @@ class HeliosPlotter:
         border_width = self.config.get('border_width')
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        ax.plot(time_edges[:-1], shock_pos, 'r-', lw=2, label='Shock Front')
+        fig, ax = self._axes(kwargs, figsize, dpi)
+        if density_thresholds is None:
+            ax.plot(time_edges[:-1], shock_pos, 'r-', lw=2, label='Shock Front')
+        else:
+            colors = plt.get_cmap(kwargs.get('cmap', self.config.get('cmap')))(np.linspace(0, 1, len(shock_family)))
+            for thr, pos, color in zip(np.ravel(density_thresholds), shock_family, colors):
+                ax.plot(time_edges[:-1], pos, '-', color=color, lw=1, label=f'Shock Front ({thr:g})')
         ax.set_xlabel("Time (ns)", fontsize=font_size, fontfamily=font_family)
         ax.set_ylabel(r"Radius ($\mu$m)", fontsize=font_size, fontfamily=font_family)
         ax.set_title(title, fontsize=font_size, fontfamily=font_family)
@@ -328,11 +534,12 @@ class HeliosPlotter:
             spine.set_linewidth(border_width)
         return ax
 
+    @profiled('plot.plot_max_pressure')
     def plot_max_pressure(self, helios_data, **kwargs):
         data = helios_data.data
         time = data['time'] if 'time' in data else data['time_whole']
-        pressure = data['pressure']
-        max_p = max_pressure(pressure)
+        max_p = helios_data.get('max_pressure', smooth=kwargs.get('smooth', True),
+                                window_length=kwargs.get('window_length', 11), polyorder=kwargs.get('polyorder', 3))
         figsize = kwargs.get('figsize', self.config.get('figsize'))
         font_size = self.config.get('font_size')
         font_family = self.config.get('font_family')
@@ -340,7 +547,7 @@ class HeliosPlotter:
         border_width = self.config.get('border_width')
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+        fig, ax = self._axes(kwargs, figsize, dpi)
         ax.plot(time, max_p, label='Max Pressure (smoothed)', color='tab:blue')
         ax.set_xlabel('Time (ns)', fontsize=font_size, fontfamily=font_family)
         ax.set_ylabel('Max Pressure (Mbar)', fontsize=font_size, fontfamily=font_family)
@@ -351,12 +558,12 @@ class HeliosPlotter:
             spine.set_linewidth(border_width)
         return ax
 
+    @profiled('plot.plot_max_density')
     def plot_max_density(self, helios_data, **kwargs):
-        from .analysis import max_density
         data = helios_data.data
         time = data['time'] if 'time' in data else data['time_whole']
-        mass_density = data['mass_density']
-        max_d = max_density(mass_density)
+        max_d = helios_data.get('max_density', smooth=kwargs.get('smooth', True),
+                                window_length=kwargs.get('window_length', 11), polyorder=kwargs.get('polyorder', 3))
         figsize = kwargs.get('figsize', self.config.get('figsize'))
         font_size = self.config.get('font_size')
         font_family = self.config.get('font_family')
@@ -364,7 +571,7 @@ class HeliosPlotter:
         border_width = self.config.get('border_width')
         tick_length = self.config.get('tick_length')
         tick_width = self.config.get('tick_width')
-        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+        fig, ax = self._axes(kwargs, figsize, dpi)
         ax.plot(time, max_d, label='Max Mass Density (smoothed)', color='tab:orange')
         ax.set_xlabel('Time (ns)', fontsize=font_size, fontfamily=font_family)
         ax.set_ylabel('Max Mass Density (g/cc)', fontsize=font_size, fontfamily=font_family)
@@ -375,6 +582,48 @@ class HeliosPlotter:
             spine.set_linewidth(border_width)
         return ax
 
+    @profiled('plot.plot_budget')
+    def plot_budget(self, helios_data, quantities=None, **kwargs):
+        '''
+        能量收支随时间的变化，质量类的量（mass/ablated_mass）画在右侧纵轴
+        - quantities: 默认 kinetic/thermal/radiation/total，见 budget.BUDGET_QUANTITIES
+        - zones/r_range/ablation_radius/smooth/window_length/polyorder: 见 budget.energy_budget
+        '''
+        data = helios_data.data
+        time = data['time'] if 'time' in data else data['time_whole']
+        quantities = tuple(quantities or ('kinetic', 'thermal', 'radiation', 'total'))
+        params = {k: kwargs[k] for k in ('zones', 'r_range', 'ablation_radius', 'smooth', 'window_length', 'polyorder')
+                  if k in kwargs}
+        budget = helios_data.get('budget', quantities=quantities, **params)
+        figsize = kwargs.get('figsize', self.config.get('figsize'))
+        font_size = self.config.get('font_size')
+        font_family = self.config.get('font_family')
+        dpi = self.config.get('dpi')
+        border_width = self.config.get('border_width')
+        tick_length = self.config.get('tick_length')
+        tick_width = self.config.get('tick_width')
+        fig, ax = self._axes(kwargs, figsize, dpi)
+        masses = [q for q in quantities if q in ('mass', 'ablated_mass')]
+        mass_ax = ax.twinx() if masses and len(masses) < len(quantities) else ax
+        for q in quantities:
+            target = mass_ax if q in masses else ax
+            target.plot(time, budget[q], label=q.replace('_', ' ').capitalize(), lw=kwargs.get('line_width', 1.5),
+                        ls='--' if q in masses else '-')
+        ax.set_xlabel('Time (ns)', fontsize=font_size, fontfamily=font_family)
+        ax.set_ylabel('Mass (g)' if mass_ax is ax else 'Energy (J)', fontsize=font_size, fontfamily=font_family)
+        if mass_ax is not ax:
+            mass_ax.set_ylabel('Mass (g)', fontsize=font_size, fontfamily=font_family)
+            mass_ax.tick_params(axis='y', labelsize=font_size, length=tick_length, width=tick_width)
+        ax.set_title('Energy Budget vs Time', fontsize=font_size, fontfamily=font_family)
+        if 'xlim' in kwargs:
+            ax.set_xlim(kwargs['xlim'])
+        lines = ax.get_lines() + (mass_ax.get_lines() if mass_ax is not ax else [])
+        ax.legend(lines, [line.get_label() for line in lines], fontsize=font_size)
+        ax.tick_params(axis='both', which='major', labelsize=font_size, length=tick_length, width=tick_width)
+        for spine in ax.spines.values():
+            spine.set_linewidth(border_width)
+        return ax
+
     # def plot_mass_density(self, helios_data, **kwargs):
     #     data = helios_data.data
     #     time_edges = data['time_edges']
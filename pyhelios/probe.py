@@ -0,0 +1,84 @@
+"""
+(时间, 半径) 点查询
+用于合成诊断（VISAR 式速度探针、条纹自发光线、后表面跟踪等）在大量 (t, r) 点上对字段取样
+"""
+import numpy as np
+
+
+class ProbeIndex:
+    '''
+    点查询索引：每个时刻的区域边界加上不同偏移后拼接成一个整体有序的数组，
+    任意多个查询点只需一次 searchsorted 即可定位所在区域；索引构建一次后重复使用
+    - time: 时刻 shape (nt,)，升序
+    - zone_boundaries: 每个时刻的区域边界 shape (nt, nr+1)，每行升序
+    '''
+    def __init__(self, time, zone_boundaries):
+        self.time = np.asarray(time, dtype=float)
+        self.zone_boundaries = np.asarray(zone_boundaries, dtype=float)
+        nt = self.zone_boundaries.shape[0]
+        self._lo = float(self.zone_boundaries.min())
+        self._hi = float(self.zone_boundaries.max())
+        self._span = 2 * (self._hi - self._lo) + 1
+        self._flat = (self.zone_boundaries - self._lo + np.arange(nt)[:, None] * self._span).ravel()
+
+    def locate(self, rows, r):
+        """
+        时刻下标 rows 处半径 r 所在的区域下标，返回 (区域下标, 是否在物质范围内)
+        rows 与 r 为同形状的数组
+        """
+        n = self.zone_boundaries.shape[1]
+        # 限制在全局范围内，保证落在本时刻的偏移段中；范围外的点由 inside 标记
+        key = np.clip(r, self._lo, self._hi) - self._lo + rows * self._span
+        idx = np.searchsorted(self._flat, key, side='right') - rows * n - 1
+        zones = np.clip(idx, 0, n - 2)
+        inside = (r >= self.zone_boundaries[rows, 0]) & (r <= self.zone_boundaries[rows, -1])
+        return zones, inside
+
+    def _at(self, values, rows, r):
+        """在时刻 rows 取样：区域量取所在区域的值，节点量在区域两端节点间线性插值"""
+        n_nodes = self.zone_boundaries.shape[1]
+        zones, inside = self.locate(rows, r)
+        if values.ndim == 1:
+            # 不随时间变化的字段
+            values, rows = values[None, :], np.zeros_like(rows)
+        if values.shape[1] == n_nodes:
+            x0 = self.zone_boundaries[rows, zones]
+            x1 = self.zone_boundaries[rows, zones + 1]
+            frac = np.divide(r - x0, x1 - x0, out=np.zeros(r.shape), where=x1 > x0)
+            v0, v1 = values[rows, zones], values[rows, zones + 1]
+            sample = v0 + frac * (v1 - v0)
+        elif values.shape[1] == n_nodes - 1:
+            sample = values[rows, zones]
+        else:
+            raise ValueError(f"字段的第二维 {values.shape[1]} 既不是区域数也不是节点数")
+        return np.where(inside, sample, np.nan)
+
+    def sample(self, values, t, r, time_interp=True):
+        '''
+        在 (t, r) 点上对字段取样
+        - values: 区域量 shape (nt, nr)、节点量 shape (nt, nr+1) 或不随时间变化的 (nr,)
+        - t/r: 可广播的数组（单位与 time/zone_boundaries 相同）
+        - time_interp: True 时在相邻两个时刻之间线性插值（各自在该时刻的网格上取样），
+          False 时取最近的时刻
+        超出时间范围或物质范围的点为 nan，返回与广播后的 t/r 同形状的数组
+        '''
+        values = np.asarray(values)
+        t, r = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(r, dtype=float))
+        shape = t.shape
+        t, r = t.ravel(), r.ravel()
+        nt = len(self.time)
+        i0 = np.clip(np.searchsorted(self.time, t, side='right') - 1, 0, max(nt - 2, 0))
+        i1 = np.minimum(i0 + 1, nt - 1)
+        dt = self.time[i1] - self.time[i0]
+        w = np.clip(np.divide(t - self.time[i0], dt, out=np.zeros(t.shape), where=dt > 0), 0, 1)
+        if not time_interp:
+            i0 = np.where(w >= 0.5, i1, i0)
+            w = np.zeros_like(w)
+        v0 = self._at(values, i0, r)
+        out = v0
+        if np.any(w > 0):
+            v1 = self._at(values, i1, r)
+            # 端点处只用一侧的值，另一侧在物质范围外时不会变为 nan
+            out = np.where(w == 0, v0, np.where(w == 1, v1, v0 + w * (v1 - v0)))
+        out = np.where((t >= self.time[0]) & (t <= self.time[-1]), out, np.nan)
+        return out.reshape(shape)
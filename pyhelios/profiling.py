@@ -0,0 +1,230 @@
+"""
+阶段计时与内存统计
+记录读取、处理、分析与绘图各阶段的耗时、读取字节数与峰值内存，
+可汇总为按阶段/变量的统计，或导出为 Chrome trace（chrome://tracing、Perfetto 可直接打开）
+
+开启方式: 命令行工具按 config['profile'] = True 或 'memory'，或环境变量 PYHELIOS_PROFILE=1 / memory 开启；
+在代码中调用 configure(config) 或 PROFILER.enable()。记录器是进程全局的，只由这些入口开启，
+打开数据文件不会改变它的状态
+'memory' 时用 tracemalloc 统计各阶段的峰值内存（开销较大）；tracemalloc 的峰值是进程全局的，
+各阶段开始时会重置它，因此内存模式只适用于单线程：多个线程同时记录阶段时峰值会相互干扰
+（GUI、服务器等多线程场景只应使用计时模式）。未开启时各记录点只做一次判断
+汇总按阶段/变量即时累计；Chrome trace 只保留最近 max_events 个事件，长期运行时内存不增长
+"""
+import collections
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class _Span:
+    """一个正在进行的阶段"""
+    __slots__ = ('name', 'args', 'start', 'start_memory', 'peak_seen', 'child_bytes')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = 0.0
+        self.start_memory = 0
+        self.peak_seen = 0
+        self.child_bytes = 0
+
+
+class Profiler:
+    """
+    阶段记录器，嵌套的阶段各自记录，父阶段的时间与峰值包含子阶段
+    - max_events: 保留的最近事件数（用于 export_trace），汇总不受此限制
+    """
+    def __init__(self, max_events=100000):
+        self.enabled = False
+        self.memory = False
+        self.events = collections.deque(maxlen=max_events)
+        self._stages = {}
+        self._variables = {}
+        self._lock = threading.Lock()
+        self._owns_tracemalloc = False
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+
+    def enable(self, memory=False):
+        """开启记录；memory=True 时同时统计峰值内存（只适用于单线程，见模块说明）"""
+        self.enabled = True
+        if memory and not self.memory:
+            self.memory = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+
+    def disable(self):
+        self.enabled = False
+        if self.memory:
+            self.memory = False
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+
+    def reset(self):
+        """清除已记录的阶段"""
+        with self._lock:
+            self.events.clear()
+            self._stages = {}
+            self._variables = {}
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name, **args):
+        """记录一个阶段的上下文管理器；args 为附加信息，如 var=变量名、bytes=读取字节数"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageContext(self, _Span(name, args))
+
+    def _enter(self, span):
+        stack = self._stack()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+            tracemalloc.reset_peak()
+            span.start_memory = span.peak_seen = current
+        stack.append(span)
+        span.start = time.perf_counter()
+
+    def _exit(self, span):
+        end = time.perf_counter()
+        stack = self._stack()
+        stack.pop()
+        # 读取字节数计入所有外层阶段
+        read_bytes = span.args.get('bytes', 0) + span.child_bytes
+        if stack:
+            stack[-1].child_bytes += read_bytes
+        if read_bytes:
+            span.args['read_bytes'] = read_bytes
+        event = {'name': span.name, 'ts': span.start - self._origin, 'dur': end - span.start,
+                 'tid': threading.get_ident(), 'depth': len(stack), 'args': span.args}
+        if self.memory:
+            peak = max(span.peak_seen, tracemalloc.get_traced_memory()[1])
+            span.args['peak_bytes'] = peak - span.start_memory
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+        with self._lock:
+            self.events.append(event)
+            self._aggregate(event)
+
+    def _aggregate(self, event):
+        args = event['args']
+        item = self._stages.setdefault(event['name'], {'count': 0, 'time': 0.0, 'bytes': 0, 'peak_bytes': 0})
+        item['count'] += 1
+        item['time'] += event['dur']
+        item['bytes'] += args.get('read_bytes', 0)
+        item['peak_bytes'] = max(item['peak_bytes'], args.get('peak_bytes', 0))
+        if 'var' in args and 'bytes' in args:
+            var = self._variables.setdefault(args['var'], {'count': 0, 'time': 0.0, 'bytes': 0})
+            var['count'] += 1
+            var['time'] += event['dur']
+            var['bytes'] += args['bytes']
+
+    def summary(self):
+        """
+        按阶段与变量汇总
+        返回 {'stages': {阶段: {'count', 'time', 'bytes', 'peak_bytes'}},
+              'variables': {变量: {'count', 'time', 'bytes'}}}
+        阶段的 bytes 包含其中嵌套阶段读取的字节数；包含 reset() 以来的全部阶段（不限于保留的事件）
+        """
+        with self._lock:
+            return {'stages': {name: dict(item) for name, item in self._stages.items()},
+                    'variables': {name: dict(item) for name, item in self._variables.items()}}
+
+    def format_summary(self):
+        """汇总的文本表格，阶段按总耗时排序"""
+        summary = self.summary()
+        lines = [f"{'stage':<28} {'count':>6} {'time (s)':>10} {'read (MiB)':>11} {'peak (MiB)':>11}"]
+        for name, item in sorted(summary['stages'].items(), key=lambda kv: -kv[1]['time']):
+            lines.append(f"{name:<28} {item['count']:>6} {item['time']:>10.4f} {item['bytes'] / 2 ** 20:>11.2f} "
+                         f"{item['peak_bytes'] / 2 ** 20:>11.2f}")
+        if summary['variables']:
+            lines.append(f"{'variable':<28} {'count':>6} {'time (s)':>10} {'read (MiB)':>11}")
+            for name, item in sorted(summary['variables'].items(), key=lambda kv: -kv[1]['time']):
+                lines.append(f"{name:<28} {item['count']:>6} {item['time']:>10.4f} {item['bytes'] / 2 ** 20:>11.2f}")
+        return '\n'.join(lines)
+
+    def export_trace(self, path):
+        """导出为 Chrome trace 事件格式（JSON），时间单位为微秒；只包含保留的最近事件"""
+        pid = os.getpid()
+        with self._lock:
+            retained = list(self.events)
+        events = [{'name': e['name'], 'cat': e['name'].split('.')[0], 'ph': 'X', 'pid': pid, 'tid': e['tid'],
+                   'ts': e['ts'] * 1e6, 'dur': e['dur'] * 1e6, 'args': e['args']} for e in retained]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+        return path
+
+
+class _StageContext:
+    __slots__ = ('profiler', 'span')
+
+    def __init__(self, profiler, span):
+        self.profiler = profiler
+        self.span = span
+
+    def __enter__(self):
+        self.profiler._enter(self.span)
+        return self.span.args
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self.span)
+        return False
+
+
+class _NullStage:
+    """未开启时使用的空上下文"""
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+PROFILER = Profiler()
+
+
+def stage(name, **args):
+    """在全局记录器中记录一个阶段，见 Profiler.stage"""
+    return PROFILER.stage(name, **args)
+
+
+def profiled(name):
+    """函数装饰器：每次调用记录为阶段 name"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+            with PROFILER.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def configure(config=None):
+    """按 config['profile'] 或环境变量 PYHELIOS_PROFILE 开启记录；两者都未设置时保持当前状态"""
+    setting = (config or {}).get('profile') or os.environ.get('PYHELIOS_PROFILE', '')
+    if isinstance(setting, str):
+        setting = setting.strip().lower()
+        if setting in ('', '0', 'false', 'no', 'off'):
+            return PROFILER
+    if setting:
+        PROFILER.enable(memory=setting == 'memory')
+    return PROFILER
+
+
+# 环境变量对整个进程生效，导入时按它开启一次
+configure()
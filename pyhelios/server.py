@@ -0,0 +1,440 @@
+"""
+常驻本地分析服务
+在一个进程中保留已打开的运行（HeliosData），按内存预算以 LRU 方式淘汰，多个笔记本/脚本通过
+本地 HTTP 共享同一份数据：字段切片、点查询、分析结果与渲染好的 PNG，重复请求直接由内存返回
+
+命令行用法:
+    python -m pyhelios.server --port 8765 --max-bytes 8G --root runs/
+
+客户端:
+    from pyhelios.server import HeliosClient
+    helios = HeliosClient('http://127.0.0.1:8765').open('runs/shot1.exo')
+    density = helios.get('mass_density')
+    png = helios.plot_density(shocktrack=True)
+
+协议: GET /runs 列出常驻的运行；其余请求为 POST /<操作>，请求体为 JSON，
+数组以 .npy 返回，多个数组（如 reductions/budget）以 .npz 返回，图为 PNG，其他为 JSON
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+DEFAULT_PORT = 8765
+
+# 单个运行中记忆的 PNG 个数
+PNG_CACHE_SIZE = 16
+
+# 运行的选择参数
+SELECTION = ('time_range', 'zone_range', 'time_stride', 'chunk_size', 'compact')
+
+
+def _parse_bytes(text):
+    """'8G'/'512M'/'1000000' -> 字节数"""
+    text = str(text).strip().upper().rstrip('B')
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class ResidentRun:
+    """一个常驻的运行：HeliosData、绘图器与渲染过的 PNG；lock 保证同一运行上的请求依次执行"""
+    def __init__(self, key, helios):
+        self.key = key
+        self.helios = helios
+        self.lock = threading.Lock()
+        self.png = OrderedDict()
+        self.last_used = time.time()
+        # 最近一次请求结束时的字节数，淘汰时使用，不必等待其他运行上正在执行的请求
+        self.size = 0
+
+    def nbytes(self):
+        """已读入字段、跟随模式预留存储、记忆的分析结果与 PNG 的字节数（需持有 lock）"""
+        return self.helios.resident_bytes() + sum(len(v) for v in self.png.values())
+
+
+class RunPool:
+    '''
+    常驻运行池
+    - max_bytes: 全部运行常驻数据（字段、分析结果与 PNG）的总字节数上限，超出时淘汰最久未使用的运行
+    - root: 只允许打开该目录下的文件（None 不限制）
+    - config: 配置字典，None 为默认配置
+    '''
+    def __init__(self, max_bytes=4 * 1024 ** 3, root=None, config=None):
+        from .config import get_default_config
+        from .plotting import HeliosPlotter
+        self.max_bytes = max_bytes
+        self.root = os.path.realpath(root) if root else None
+        self.config = config or get_default_config()
+        self.plotter = HeliosPlotter(self.config)
+        self.runs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, path, selection):
+        path = os.path.realpath(path)
+        if self.root and os.path.commonpath([self.root, path]) != self.root:
+            raise PermissionError(f"{path} 不在 {self.root} 之下")
+        return json.dumps([path, {k: selection.get(k) for k in SELECTION}], sort_keys=True)
+
+    def get(self, path, **selection):
+        """取得（必要时打开并处理）一个运行，并标记为最近使用"""
+        from .dataio import HeliosData
+
+        unknown = set(selection) - set(SELECTION)
+        if unknown:
+            raise TypeError(f"不支持的选择参数: {', '.join(sorted(unknown))}")
+        key = self._key(path, selection)
+        with self._lock:
+            run = self.runs.get(key)
+            if run is None:
+                run = self.runs[key] = ResidentRun(key, HeliosData(os.path.realpath(path), self.config, **selection))
+            self.runs.move_to_end(key)
+            run.last_used = time.time()
+        with run.lock:
+            if not run.helios.processed:
+                try:
+                    run.helios.process()
+                except BaseException:
+                    # 打开失败（文件不存在或损坏）时不留在池中，下次请求重新打开
+                    with self._lock:
+                        if self.runs.get(key) is run:
+                            del self.runs[key]
+                    raise
+                run.size = run.nbytes()
+        return run
+
+    def trim(self, keep=None):
+        """总字节数超过 max_bytes 时按 LRU 淘汰（keep 指定的运行除外），返回淘汰的运行数"""
+        evicted = 0
+        with self._lock:
+            sizes = {key: run.size for key, run in self.runs.items()}
+            total = sum(sizes.values())
+            for key in list(self.runs):
+                if total <= self.max_bytes:
+                    break
+                if keep is not None and key == keep.key:
+                    continue
+                run = self.runs.pop(key)
+                if run.helios.raw_data is not None:
+                    run.helios.raw_data.close()
+                total -= sizes[key]
+                evicted += 1
+        return evicted
+
+    def close(self, path=None):
+        """关闭一个文件的全部运行（path 为 None 时关闭全部）"""
+        with self._lock:
+            for key in list(self.runs):
+                if path is None or json.loads(key)[0] == os.path.realpath(path):
+                    run = self.runs.pop(key)
+                    if run.helios.raw_data is not None:
+                        run.helios.raw_data.close()
+
+    def describe(self):
+        with self._lock:
+            return [{'path': json.loads(key)[0], 'selection': json.loads(key)[1], 'bytes': run.size,
+                     'n_times': run.helios.n_times, 'last_used': run.last_used} for key, run in self.runs.items()]
+
+    def render(self, run, method, kwargs):
+        """渲染 PNG 并在运行中记忆；kwargs 相同的重复请求直接返回"""
+        import matplotlib.pyplot as plt
+
+        if not method.startswith('plot_') or not hasattr(self.plotter, method):
+            raise ValueError(f"未知的绘图方法: {method}")
+        memo = json.dumps([method, kwargs], sort_keys=True)
+        png = run.png.get(memo)
+        if png is None:
+            with _PLOT_LOCK:
+                result = getattr(self.plotter, method)(run.helios, **kwargs)
+                fig = result.fig if hasattr(result, 'fig') else result.figure
+                buf = io.BytesIO()
+                fig.savefig(buf, format='png')
+                plt.close(fig)
+            png = run.png[memo] = buf.getvalue()
+            while len(run.png) > PNG_CACHE_SIZE:
+                run.png.popitem(last=False)
+        run.png.move_to_end(memo)
+        return png
+
+
+# pyplot 不是线程安全的
+_PLOT_LOCK = threading.Lock()
+
+
+def _npy(values):
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(values), allow_pickle=False)
+    return buf.getvalue()
+
+
+def _npz(values):
+    buf = io.BytesIO()
+    np.savez(buf, **{k: np.asarray(v) for k, v in values.items()})
+    return buf.getvalue()
+
+
+def _bounded(bounds, n, extra):
+    """
+    把 (start, stop)（与 Python 切片相同，可为负数或 None）换算为 n 个单元上的切片，
+    extra=1 时多包含一个边界（*_edges 的时间轴、节点量的区域轴）
+    """
+    start, stop, _ = slice(*bounds).indices(n)
+    return slice(start, max(stop, start) + extra)
+
+
+def _field_slice(helios, name, rows=None, zones=None):
+    """字段的时间步/区域切片（rows/zones 为 [start, stop]，与 Python 切片相同，下标按时间步/区域计）"""
+    values = helios.data[name]
+    if rows is not None and helios._has_time_axis(name) and np.ndim(values) >= 1:
+        edges = name.endswith('_edges')
+        values = values[_bounded(rows, len(values) - edges, edges)]
+    if zones is not None and np.ndim(values) >= 2:
+        nodes = values.shape[-1] == helios.data['zone_boundaries'].shape[-1]
+        values = values[..., _bounded(zones, values.shape[-1] - nodes, nodes)]
+    return values
+
+
+def handle(pool, op, request):
+    '''
+    执行一个请求，返回 (内容类型, 字节)
+    - op: field/get/probe/remap/lineout/plot/memory/refresh/profile/open/close
+    - request: {'path', 选择参数..., 各操作的参数}
+    '''
+    from .dataio import FIELDS
+
+    if op == 'close':
+        pool.close(request.get('path'))
+        return 'application/json', b'{}'
+    selection = {k: request[k] for k in SELECTION if request.get(k) is not None}
+    run = pool.get(request['path'], **selection)
+    helios = run.helios
+    with run.lock:
+        if op == 'open':
+            body = 'application/json', json.dumps({'n_times': helios.n_times, 'fields': list(FIELDS)}).encode()
+        elif op == 'field':
+            body = 'application/x-npy', _npy(_field_slice(helios, request['name'], request.get('rows'),
+                                                          request.get('zones')))
+        elif op == 'get':
+            result = helios.get(request['key'], **request.get('params', {}))
+            if result is None:
+                raise KeyError(request['key'])
+            body = ('application/x-npz', _npz(result)) if isinstance(result, dict) else ('application/x-npy', _npy(result))
+        elif op == 'probe':
+            body = 'application/x-npy', _npy(helios.probe(request['field'], request['t'], request['r'],
+                                                          request.get('time_interp', True)))
+        elif op == 'remap':
+            grid_edges, values = helios.remap(**request.get('params', {}))
+            body = 'application/x-npz', _npz({'grid_edges': grid_edges, 'values': values})
+        elif op == 'lineout':
+            body = 'application/x-npy', _npy(helios.lineout(request['radius'], request.get('field', 'mass_density'),
+                                                            **request.get('params', {})))
+        elif op == 'plot':
+            body = 'image/png', pool.render(run, request['method'], request.get('kwargs', {}))
+        elif op == 'refresh':
+            added = helios.refresh()
+            if added:
+                # 数据已变化，之前渲染的图作废
+                run.png.clear()
+            body = 'application/json', json.dumps(added).encode()
+        elif op == 'profile':
+            from .profiling import PROFILER
+            body = 'application/json', json.dumps(PROFILER.summary()).encode()
+        elif op == 'memory':
+            body = 'application/json', json.dumps(helios.memory_footprint()).encode()
+        else:
+            raise ValueError(f"未知的操作: {op}")
+        run.size = run.nbytes()
+    pool.trim(keep=run)
+    return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    pool = None
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/runs':
+            self._send(200, 'application/json', json.dumps(self.pool.describe()).encode())
+        else:
+            self._send(404, 'application/json', json.dumps({'error': f"未知的路径: {self.path}"}).encode())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            content_type, body = handle(self.pool, self.path.strip('/'), request)
+        except (KeyError, TypeError, ValueError) as exc:
+            self._send(400, 'application/json', json.dumps({'error': f"{type(exc).__name__}: {exc}"}).encode())
+        except PermissionError as exc:
+            self._send(403, 'application/json', json.dumps({'error': str(exc)}).encode())
+        except OSError as exc:
+            self._send(404, 'application/json', json.dumps({'error': str(exc)}).encode())
+        except Exception as exc:
+            self._send(500, 'application/json', json.dumps({'error': f"{type(exc).__name__}: {exc}"}).encode())
+        else:
+            self._send(200, content_type, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=DEFAULT_PORT, pool=None, **pool_kwargs):
+    """创建（未启动的）服务，port=0 时自动选择空闲端口；用 serve_forever() 运行"""
+    handler = type('Handler', (_Handler,), {'pool': pool or RunPool(**pool_kwargs)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class HeliosClient:
+    """常驻服务的客户端，url 如 'http://127.0.0.1:8765'"""
+    def __init__(self, url=f'http://127.0.0.1:{DEFAULT_PORT}', timeout=600):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, op, **payload):
+        """发送一个请求，按内容类型解码为数组、{名称: 数组}、PNG 字节或 JSON"""
+        req = Request(f"{self.url}/{op}", data=json.dumps(payload, default=_json_default).encode(),
+                      headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urlopen(req, timeout=self.timeout) as resp:
+                content_type, body = resp.headers.get('Content-Type'), resp.read()
+        except HTTPError as exc:
+            message = json.loads(exc.read() or b'{}').get('error', exc.reason)
+            raise RuntimeError(f"服务返回 {exc.code}: {message}") from None
+        if content_type == 'application/x-npy':
+            return np.load(io.BytesIO(body), allow_pickle=False)
+        if content_type == 'application/x-npz':
+            with np.load(io.BytesIO(body), allow_pickle=False) as npz:
+                return {k: npz[k] for k in npz.files}
+        if content_type == 'image/png':
+            return body
+        return json.loads(body)
+
+    def runs(self):
+        """服务中常驻的运行"""
+        with urlopen(f"{self.url}/runs", timeout=self.timeout) as resp:
+            return json.loads(resp.read())
+
+    def open(self, file_path, **selection):
+        """打开（或复用服务中已常驻的）运行，返回与 PyHelios 接口相同的 RemoteHelios"""
+        return RemoteHelios(self, file_path, **selection)
+
+    def close(self, file_path=None):
+        self.request('close', path=file_path and os.path.realpath(file_path))
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(type(value).__name__)
+
+
+class RemoteHelios:
+    '''
+    服务中一个运行的代理，方法与 PyHelios 相同；plot_* 返回 PNG 字节（给出 path 时同时写入文件）
+    - selection: time_range/zone_range/time_stride/chunk_size/compact
+    select() 只改变本代理使用的子集（服务中每个子集是独立的常驻运行），profile_summary() 为服务进程的统计；
+    只在本地有意义的 follow/live_plot/export_trace/export_store 不提供
+    '''
+    def __init__(self, client, file_path, **selection):
+        self.client = client
+        self.selection = {'path': os.path.realpath(file_path), **selection}
+        self.info = self._request('open')
+
+    def _request(self, op, **payload):
+        return self.client.request(op, **self.selection, **payload)
+
+    def get(self, key, **params):
+        return self._request('get', key=key, params=params)
+
+    def field(self, name, rows=None, zones=None):
+        """字段的时间步/区域切片，rows/zones 为 (start, stop)"""
+        return self._request('field', name=name, rows=rows, zones=zones)
+
+    def probe(self, field, t, r, time_interp=True):
+        return self._request('probe', field=field, t=t, r=r, time_interp=time_interp)
+
+    def remap(self, field='mass_density', **kwargs):
+        result = self._request('remap', params=dict(kwargs, field=field))
+        return result['grid_edges'], result['values']
+
+    def lineout(self, radius, field='mass_density', **kwargs):
+        return self._request('lineout', radius=radius, field=field, params=kwargs)
+
+    def select(self, time_range=None, zone_range=None, time_stride=None):
+        self.selection.update(time_range=time_range, zone_range=zone_range, time_stride=time_stride)
+        self.info = self._request('open')
+
+    def refresh(self):
+        return self._request('refresh')
+
+    def profile_summary(self):
+        return self._request('profile')
+
+    def budget(self, quantities=None, **kwargs):
+        if quantities is not None:
+            kwargs['quantities'] = quantities
+        return self.get('budget', **kwargs)
+
+    def memory_footprint(self):
+        return self._request('memory')
+
+    def plot(self, method, path=None, **kwargs):
+        png = self._request('plot', method=method, kwargs=kwargs)
+        if path is not None:
+            with open(path, 'wb') as f:
+                f.write(png)
+        return png
+
+    def __getattr__(self, name):
+        if name.startswith('plot_'):
+            return lambda path=None, **kwargs: self.plot(name, path, **kwargs)
+        raise AttributeError(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PyHelios 常驻本地分析服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址（默认只接受本机连接）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-bytes', default='4G', help="常驻数据的内存预算，如 8G")
+    parser.add_argument('--root', default=None, help="只允许打开该目录下的文件")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    from .config import get_default_config
+    from .profiling import configure as configure_profiling
+    configure_profiling(get_default_config())
+
+    server = make_server(args.host, args.port, max_bytes=_parse_bytes(args.max_bytes), root=args.root)
+    print(f"serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,247 @@
+"""
+处理后数据的分块压缩存储
+把处理后（已换算单位）的字段、time_edges/radius_edges、分析结果与来源信息导出为一个目录：
+    run.phstore/
+        meta.json             格式版本、来源、处理参数、每个数组的形状/类型/分块
+        mass_density/0, 1...  每个数组一个子目录，按时间分块，每块单独用 zlib 压缩
+只读取某个字段某个时间窗口时，只解压覆盖该窗口的块
+HeliosData 可直接打开存储目录（与 .exo 文件用法相同，支持 time_range/zone_range/time_stride）
+
+命令行用法:
+    python -m pyhelios.store runs/*.exo -o stores/ --chunk-rows 64
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from .cache import source_identity
+
+STORE_FORMAT = 'pyhelios-store'
+STORE_VERSION = 1
+STORE_SUFFIX = '.phstore'
+
+# 默认导出的分析结果（默认参数，单个数组的结果）
+STORE_ANALYSES = ('shock_pos', 'max_pressure', 'max_density')
+
+
+def is_store(path):
+    """path 是否为导出的存储目录"""
+    return os.path.isfile(os.path.join(path, 'meta.json')) and os.path.isdir(path)
+
+
+def _zone_axis(shape, nr):
+    """最后一维是区域（zones）、节点（nodes）还是都不是（None）"""
+    if len(shape) < 2:
+        return None
+    return {nr: 'zones', nr + 1: 'nodes'}.get(shape[-1])
+
+
+def _write_array(directory, name, parts, level):
+    """逐块压缩写出一个数组，parts 为按时间顺序的块，返回数组的元信息"""
+    os.makedirs(os.path.join(directory, name))
+    offsets, shape, dtype = [0], None, None
+    for i, values in enumerate(parts):
+        values = np.ascontiguousarray(values)
+        with open(os.path.join(directory, name, str(i)), 'wb') as f:
+            f.write(zlib.compress(values.tobytes(), level))
+        offsets.append(offsets[-1] + len(values))
+        shape, dtype = values.shape, values.dtype
+    return {'shape': [offsets[-1]] + list(shape[1:]), 'dtype': dtype.str, 'offsets': offsets}
+
+
+def export_store(helios_data, path, chunk_rows=64, level=4, analyses=STORE_ANALYSES, overwrite=False):
+    '''
+    把处理后的运行导出为分块压缩存储
+    - helios_data: HeliosData（未处理时先处理）；已读入内存的字段直接分块写出，其余按块读取，
+      不需要整个数据集同时驻留内存
+    - chunk_rows: 每块的时间步数
+    - level: zlib 压缩级别（0-9）
+    - analyses: 要导出的分析结果（ANALYSES 中的名字，取默认参数；只导出单个数组的结果）
+    - overwrite: 目标已存在时是否覆盖
+    返回存储目录路径
+    '''
+    from .dataio import FIELDS
+
+    if not helios_data.processed:
+        helios_data.process()
+    if os.path.exists(path):
+        if not overwrite:
+            raise FileExistsError(path)
+        shutil.rmtree(path)
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(path)}.")
+    try:
+        chunk_rows = max(int(chunk_rows), 1)
+        arrays, materialized = {}, set(helios_data.materialized_fields)
+        nr = None
+        for name in FIELDS:
+            if name in materialized or not helios_data._has_time_axis(name):
+                values = helios_data.data[name]
+                parts = [values[i:i + chunk_rows] for i in range(0, max(len(values), 1), chunk_rows)] \
+                    if helios_data._has_time_axis(name) else [values]
+            else:
+                # 每块的 *_edges 含 len(rows)+1 个边界，只有最后一块保留末尾的边界
+                parts = (chunk[name] if rows.stop == helios_data.n_times else chunk[name][:rows.stop - rows.start]
+                         for rows, chunk in helios_data.iter_chunks(name, chunk_size=chunk_rows))
+            arrays[name] = _write_array(tmp, name, parts, level)
+            arrays[name]['time_axis'] = helios_data._has_time_axis(name)
+            if name == 'mass_density':
+                nr = arrays[name]['shape'][-1]
+        stored = []
+        for key in analyses:
+            result = helios_data.get(key)
+            if isinstance(result, np.ndarray):
+                # 与 HeliosData.result 查找磁盘缓存时的名字相同，打开存储后直接命中
+                name = helios_data.result_name(key)
+                arrays[name] = _write_array(tmp, name, [result], level)
+                arrays[name]['time_axis'] = False
+                stored.append(name)
+        for info in arrays.values():
+            info['zone_axis'] = _zone_axis(info['shape'], nr)
+        source = helios_data.file_path
+        meta = {
+            'format': STORE_FORMAT, 'version': STORE_VERSION, 'codec': 'zlib', 'level': level,
+            'n_times': helios_data.n_times, 'chunk_rows': chunk_rows,
+            'arrays': arrays, 'fields': list(FIELDS), 'analyses': stored,
+            'provenance': {
+                'source': source_identity(source) if os.path.isfile(source) else {'path': os.path.abspath(source)},
+                'selection': {'time_range': helios_data.time_range, 'zone_range': helios_data.zone_range,
+                              'time_stride': helios_data.time_stride},
+                'compact': bool(helios_data.compact), 'created': time.time(),
+            },
+        }
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1, default=str)
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+class StoreReader:
+    '''
+    惰性读取导出的存储，接口与磁盘缓存条目相同（meta、in、load），可直接作为 HeliosData 的数据来源
+    - time_range/zone_range/time_stride: 与 HeliosData 相同的子集选择，作用于存储中的时间步与区域；
+      有选择时 *_edges 与分析结果不从存储读取（由所选字段重新计算）
+    '''
+    def __init__(self, path, time_range=None, zone_range=None, time_stride=None):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            stored = json.load(f)
+        if stored.get('format') != STORE_FORMAT or stored.get('version', 0) > STORE_VERSION:
+            raise ValueError(f"不支持的存储格式: {path}")
+        self.stored = stored
+        self.arrays = stored['arrays']
+        self.selected = time_range is not None or zone_range is not None or time_stride not in (None, 1)
+        n = stored['n_times']
+        start, stop = 0, n
+        if time_range is not None:
+            time_ns = self._read('time_whole', 0, n)
+            t_start, t_end = time_range
+            start = 0 if t_start is None else int(np.searchsorted(time_ns, t_start, side='left'))
+            stop = n if t_end is None else int(np.searchsorted(time_ns, t_end, side='right'))
+            if stop <= start:
+                raise ValueError(f"time_range {time_range} 内没有时间步")
+        self._time = range(start, stop, time_stride or 1)
+        self._zones = None
+        if zone_range is not None:
+            nr = self.arrays['mass_density']['shape'][-1]
+            z0, z1, _ = slice(*zone_range).indices(nr)
+            if z1 <= z0:
+                raise ValueError(f"zone_range {zone_range} 内没有区域")
+            self._zones = (z0, z1)
+        time_axis = [name for name, info in self.arrays.items() if info['time_axis']]
+        self.meta = dict(stored, n_times=len(self._time), time_axis=time_axis)
+
+    @property
+    def provenance(self):
+        return self.stored['provenance']
+
+    def __contains__(self, name):
+        if name not in self.arrays:
+            return False
+        # 子集的边界与分析结果需要重新计算
+        return not (self.selected and (name.endswith('_edges') or name in self.stored['analyses']))
+
+    def save(self, name, values):
+        """存储是只读的快照，新的分析结果只记忆在内存中"""
+
+    def _read(self, name, start, stop):
+        """读取第 start 到 stop 行（存储中的下标），只解压覆盖这些行的块"""
+        info = self.arrays[name]
+        offsets = info['offsets']
+        dtype = np.dtype(info['dtype'])
+        first = max(int(np.searchsorted(offsets, start, side='right')) - 1, 0)
+        last = int(np.searchsorted(offsets, stop, side='left'))
+        parts = []
+        for i in range(first, last):
+            with open(os.path.join(self.path, name, str(i)), 'rb') as f:
+                block = np.frombuffer(zlib.decompress(f.read()), dtype=dtype)
+            block = block.reshape([offsets[i + 1] - offsets[i]] + info['shape'][1:])
+            parts.append(block[max(start - offsets[i], 0):stop - offsets[i]])
+        if not parts:
+            return np.empty([0] + info['shape'][1:], dtype=dtype)
+        return parts[0].copy() if len(parts) == 1 else np.concatenate(parts)
+
+    def load(self, name, rows=None):
+        '''
+        读取一个数组
+        - rows: 所选子集时间轴上的切片（*_edges 可多包含一个边界），只解压需要的块
+        '''
+        info = self.arrays[name]
+        if not info['time_axis']:
+            values = self._read(name, 0, info['shape'][0])
+        else:
+            selected = self._time
+            if name.endswith('_edges'):
+                selected = range(selected.start, selected.stop + 1, selected.step)
+            if rows is not None:
+                selected = selected[rows]
+            if len(selected) == 0:
+                values = self._read(name, 0, 0)
+            else:
+                values = self._read(name, selected[0], selected[-1] + 1)[::selected.step]
+        if self._zones is not None and info['zone_axis'] is not None:
+            z0, z1 = self._zones
+            values = values[..., z0:z1 + (1 if info['zone_axis'] == 'nodes' else 0)]
+        return values
+
+
+def open_store(path, **selection):
+    """打开存储，selection 见 StoreReader"""
+    return StoreReader(path, **selection)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把 HELIOS 输出导出为分块压缩存储")
+    parser.add_argument('files', nargs='+', help=".exo 文件")
+    parser.add_argument('-o', '--output', default='.', help="输出目录")
+    parser.add_argument('--chunk-rows', type=int, default=64, help="每块的时间步数")
+    parser.add_argument('--level', type=int, default=4, help="zlib 压缩级别 0-9")
+    parser.add_argument('--compact', action='store_true', help="状态量以 float32 保存")
+    parser.add_argument('--overwrite', action='store_true', help="覆盖已存在的存储")
+    args = parser.parse_args(argv)
+
+    from .dataio import HeliosData
+    for file_path in args.files:
+        name = os.path.splitext(os.path.basename(file_path))[0] + STORE_SUFFIX
+        helios = HeliosData(file_path, compact=args.compact, chunk_size=args.chunk_rows)
+        helios.process()
+        path = export_store(helios, os.path.join(args.output, name), chunk_rows=args.chunk_rows, level=args.level,
+                            overwrite=args.overwrite)
+        if helios.raw_data is not None:
+            helios.raw_data.close()
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+"""
+合成 HELIOS 数据
+写出变量布局与 HELIOS .exo 相同的 netCDF 文件，其中埋入已知的冲击波轨迹，
+用于测试与性能基准（见 pyhelios.benchmark）
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# path: 文件路径；front: 每个时刻冲击波前方第一个未受冲击区域的下标，shape (nt,)
+# shock_radius: 埋入的冲击波界面半径（um），即该区域的内边界，shape (nt,)
+SyntheticRun = namedtuple('SyntheticRun', ['path', 'front', 'shock_radius'])
+
+
+def planted_front(nt, nr):
+    """冲击波从第 1 个区域向外传播到第 nr-2 个区域，返回每个时刻的前沿区域下标"""
+    return np.linspace(1, max(nr - 2, 1), nt).astype(int)
+
+
+def synthetic_dataset(nt=200, nr=100, seed=0, compression=3.0, noise=0.01, radius=0.01, duration=4e-9):
+    """
+    生成合成数据集（xarray.Dataset，SI/CGS 单位与 HELIOS 输出一致）
+    - nt/nr: 时间步数与区域数
+    - compression: 冲击波后方的压缩比
+    - noise: 各量的相对随机扰动幅度
+    - radius: 初始外半径（cm）；duration: 模拟时长（s）
+    返回 (dataset, front)
+    """
+    import xarray as xr
+
+    rng = np.random.default_rng(seed)
+    time = np.linspace(0, duration, nt)
+    nodes = np.linspace(0, radius, nr + 1)
+    zone_boundaries = nodes[None, :] * (1 + 0.1 * time[:, None] / duration)
+    front = planted_front(nt, nr)
+    # 冲击波后方（内侧）为压缩区
+    shocked = np.arange(nr)[None, :] < front[:, None]
+
+    def zone_field(ahead, behind):
+        values = np.where(shocked, behind, ahead)
+        values *= 1 + noise * rng.random((nt, nr))
+        return ("time_whole", "zones"), values
+
+    ds = xr.Dataset({
+        "time_whole": (("time_whole",), time),
+        "zone_boundaries": (("time_whole", "nodes"), zone_boundaries),
+        "mass_density": zone_field(1.0, compression),
+        "elec_density": zone_field(3e23, 3e23 * compression),
+        "ion_temperature": zone_field(0.025, 0.5),
+        "elec_temperature": zone_field(0.025, 0.8),
+        "radiation_temperature": zone_field(0.01, 0.1),
+        "zone_mass": (("time_whole", "zones"), np.tile(np.diff(nodes) * 1.0, (nt, 1))),
+        "ion_pressure": zone_field(1e3, 4e5),
+        "elec_pressure": zone_field(1e3, 6e5),
+        "fluid_velocity": zone_field(0.0, 2e6),
+    })
+    return ds, front
+
+
+def write_synthetic(path, nt=200, nr=100, **kwargs):
+    """
+    写出合成数据文件（netCDF3，scipy 引擎），参数同 synthetic_dataset
+    返回 SyntheticRun
+    """
+    ds, front = synthetic_dataset(nt, nr, **kwargs)
+    ds.to_netcdf(path, engine="scipy")
+    # 与 HeliosData 相同的单位换算：cm -> um
+    shock_radius = ds["zone_boundaries"].values[np.arange(nt), front] * 1e4
+    return SyntheticRun(str(path), front, shock_radius)
+
+
+def shock_error(shock_pos, run, zone_boundaries):
+    """
+    检测到的冲击波半径与埋入轨迹的偏差，以前沿处的区域宽度为单位（跳过被置为0的第一个时刻）
+    - zone_boundaries: 处理后的区域边界（um），shape (nt, nr+1)
+    """
+    rows = np.arange(1, len(run.front))
+    width = zone_boundaries[rows, run.front[rows] + 1] - zone_boundaries[rows, run.front[rows]]
+    return np.abs(np.asarray(shock_pos)[rows] - run.shock_radius[rows]) / width
@@ -0,0 +1,330 @@
+"""
+监视目录并自动处理新完成的模拟
+定期扫描目录，.exo 文件的大小与修改时间在 settle 秒内不再变化后视为写完，放入队列，
+由有界的进程池依次处理：写入处理后数据的磁盘缓存、计算冲击波轨迹与 max_* 序列、导出标准报告图
+任务状态逐条追加到 JSON Lines 台账，重启后已完成（且源文件未改变）的运行不再处理，
+排队中或处理到一半的运行重新排队；失败的运行按指数退避重试有限次数
+
+命令行用法:
+    python -m pyhelios.watch runs/ -o processed/ -j 2 --settle 60 --interval 10
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batch import find_runs
+from .cache import source_identity
+
+# 任务状态
+QUEUED, RUNNING, DONE, ERROR = 'queued', 'running', 'done', 'error'
+
+
+class JobLedger:
+    '''
+    持久化的任务台账（JSON Lines），每次状态变化追加一行并立即写盘，
+    打开时重放得到每个文件的最新记录；compact() 只保留最新记录
+    - path: 台账文件路径
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 写入中断的最后一行
+                        continue
+                    self.records[record['file']] = record
+
+    def get(self, file_path):
+        return self.records.get(os.path.abspath(file_path))
+
+    def record(self, file_path, state, identity=None, **info):
+        """追加一条状态记录并返回它；identity 缺省时沿用上一条记录的"""
+        file_path = os.path.abspath(file_path)
+        previous = self.records.get(file_path, {})
+        identity = identity or {k: previous.get(k) for k in ('size', 'mtime_ns')}
+        record = dict(info, file=file_path, state=state, size=identity.get('size'),
+                      mtime_ns=identity.get('mtime_ns'), time=time.time())
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[file_path] = record
+        return record
+
+    def is_current(self, file_path, states, identity=None):
+        """最新记录的状态在 states 中，且记录的源文件大小/修改时间与当前一致"""
+        record = self.get(file_path)
+        if record is None or record['state'] not in states:
+            return False
+        identity = identity or source_identity(file_path)
+        return (record['size'], record['mtime_ns']) == (identity['size'], identity['mtime_ns'])
+
+    def pending(self):
+        """排队中或处理到一半（进程被中断）的文件，按记录时间排序"""
+        return [r['file'] for r in sorted(self.records.values(), key=lambda r: r['time'])
+                if r['state'] in (QUEUED, RUNNING)]
+
+    def compact(self):
+        """重写台账，每个文件只保留最新记录（原子替换）"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            for record in sorted(self.records.values(), key=lambda r: r['time']):
+                f.write(json.dumps(record, default=str) + '\n')
+        os.replace(tmp, self.path)
+
+
+def process_run(file_path, out_dir, plots=None, formats=('png',), density_threshold=1.1, config=None,
+                **helios_kwargs):
+    '''
+    处理一个运行（在工作进程中执行）
+    - 运行只打开与处理一次，各步骤共用；写入处理后数据的磁盘缓存（helios_kwargs 默认 cache=True），
+      之后的打开直接命中缓存
+    - 汇总行与冲击波轨迹见 batch.summarize_run，轨迹保存在 out_dir/<运行名>/
+    - 冲击波轨迹与 max_* 序列保存为 out_dir/<运行名>/<运行名>_series.npz
+    - 标准报告图见 export.export_run
+    返回 {'summary', 'series', 'figures'}，失败时抛出异常
+    '''
+    from .batch import summarize_run
+    from .core import PyHelios
+    from .export import export_run
+
+    helios_kwargs.setdefault('cache', True)
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    run_dir = os.path.join(out_dir, stem)
+    helios = PyHelios(file_path, config=config, **helios_kwargs)
+    helios.load_and_process()
+    row = summarize_run(file_path, density_threshold=density_threshold, track_dir=run_dir, helios=helios)
+    if row['status'] != 'ok':
+        raise RuntimeError(row['error'])
+    row.pop('traceback', None)
+    series = os.path.join(run_dir, f"{stem}_series.npz")
+    np.savez(series, time=helios.get('time_whole'),
+             shock_pos=helios.get('shock_pos', density_threshold=density_threshold),
+             max_pressure=helios.get('max_pressure'), max_density=helios.get('max_density'),
+             max_pressure_raw=helios.get('max_pressure', smooth=False),
+             max_density_raw=helios.get('max_density', smooth=False))
+    figures = export_run(file_path, out_dir, plots=plots, formats=formats, helios=helios)
+    return {'summary': row, 'series': series, 'figures': figures}
+
+
+def _process_task(file_path, kwargs):
+    """工作进程中执行的任务，异常以字符串返回"""
+    try:
+        return process_run(file_path, **kwargs), None
+    except Exception as exc:
+        return None, f"{type(exc).__name__}: {exc}\n{traceback.format_exc()}"
+
+
+class WatchDaemon:
+    '''
+    监视目录的处理守护进程
+    - paths: 监视的目录（或文件）；pattern: 目录中查找文件的模式
+    - out_dir: 输出目录；ledger: 台账路径，默认 out_dir/pyhelios_jobs.jsonl
+    - workers: 进程数，1 时在当前进程中顺序处理（扫描在处理期间暂停）
+    - settle: 文件大小与修改时间保持不变多少秒后视为写完
+    - interval: 扫描间隔（秒）
+    - retries: 失败（工作进程崩溃、磁盘已满等）后在源文件未改变时重试的次数
+    - retry_delay: 第一次重试前等待的秒数，之后每次加倍
+    - progress: 可选回调 progress(record)，每次任务状态变化时调用
+    - process_kwargs: 传给 process_run 的参数（plots/formats/density_threshold/config 与 PyHelios 参数）
+    '''
+    def __init__(self, paths, out_dir, ledger=None, workers=2, settle=30.0, interval=5.0, pattern='*.exo',
+                 retries=3, retry_delay=60.0, progress=None, clock=time.monotonic, **process_kwargs):
+        self.paths = list(paths)
+        self.out_dir = out_dir
+        self.ledger = JobLedger(ledger or os.path.join(out_dir, 'pyhelios_jobs.jsonl'))
+        self.workers = max(int(workers), 1)
+        self.settle = settle
+        self.interval = interval
+        self.pattern = pattern
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.progress = progress
+        self.clock = clock
+        self.process_kwargs = dict(process_kwargs, out_dir=out_dir)
+        # 文件 -> (size, mtime_ns, 最近一次发生变化的时刻)
+        self._seen = {}
+        self.queue = deque()
+        self._running = {}
+        # 失败的文件 -> 可以重试的时刻（重启后立即可以重试）
+        self._retry_at = {}
+        self._pool = None
+        # 重启：排队中或被中断的任务，源文件未改变时直接重新排队，否则重新等待写完
+        for file_path in self.ledger.pending():
+            if os.path.exists(file_path) and self.ledger.is_current(file_path, (QUEUED, RUNNING)):
+                self.queue.append(file_path)
+        self.ledger.compact()
+
+    def _notify(self, record):
+        if self.progress:
+            self.progress(record)
+
+    def scan(self):
+        """扫描监视目录，返回本次新确认写完、且尚未处理过当前版本的文件"""
+        now = self.clock()
+        ready = []
+        for file_path in find_runs(self.paths, self.pattern):
+            file_path = os.path.abspath(file_path)
+            try:
+                identity = source_identity(file_path)
+            except OSError:
+                continue
+            key = (identity['size'], identity['mtime_ns'])
+            seen = self._seen.get(file_path)
+            if seen is None or seen[:2] != key:
+                self._seen[file_path] = key + (now,)
+                continue
+            if identity['size'] == 0 or now - seen[2] < self.settle:
+                continue
+            if file_path in self.queue or file_path in self._running.values():
+                continue
+            if self.ledger.is_current(file_path, (DONE, QUEUED, RUNNING), identity):
+                continue
+            attempts = 0
+            if self.ledger.is_current(file_path, (ERROR,), identity):
+                # 当前版本已失败：次数用完或退避未结束时不重试
+                attempts = self.ledger.get(file_path).get('attempts', 1)
+                if attempts > self.retries or now < self._retry_at.get(file_path, now):
+                    continue
+            self._notify(self.ledger.record(file_path, QUEUED, identity, attempts=attempts))
+            self.queue.append(file_path)
+            ready.append(file_path)
+        return ready
+
+    def _attempts(self, file_path):
+        return (self.ledger.get(file_path) or {}).get('attempts', 0)
+
+    def _finish(self, file_path, result, error):
+        if error:
+            attempts = self._attempts(file_path) + 1
+            self._retry_at[file_path] = self.clock() + self.retry_delay * 2 ** (attempts - 1)
+            record = self.ledger.record(file_path, ERROR, error=error, attempts=attempts)
+        else:
+            record = self.ledger.record(file_path, DONE, **result)
+        self._notify(record)
+        return record
+
+    def dispatch(self):
+        """把排队的文件交给进程池（最多 workers 个同时处理）；workers 为 1 时在当前进程中依次处理"""
+        while self.queue and len(self._running) < self.workers:
+            file_path = self.queue.popleft()
+            if not os.path.exists(file_path):
+                self._notify(self.ledger.record(file_path, ERROR, error="文件已不存在",
+                                                attempts=self._attempts(file_path) + 1))
+                continue
+            self._notify(self.ledger.record(file_path, RUNNING, attempts=self._attempts(file_path)))
+            if self.workers == 1:
+                self._finish(file_path, *_process_task(file_path, self.process_kwargs))
+                continue
+            if self._pool is None:
+                from .export import _init_worker
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            self._running[self._pool.submit(_process_task, file_path, self.process_kwargs)] = file_path
+
+    def collect(self):
+        """记录已完成的任务，返回它们的台账记录"""
+        records = []
+        for future in [f for f in self._running if f.done()]:
+            file_path = self._running.pop(future)
+            try:
+                result, error = future.result()
+            except Exception as exc:
+                # 工作进程异常退出等情况
+                result, error = None, f"{type(exc).__name__}: {exc}"
+            records.append(self._finish(file_path, result, error))
+        return records
+
+    def step(self):
+        """一次扫描、收集与派发"""
+        self.collect()
+        self.scan()
+        self.dispatch()
+
+    @property
+    def idle(self):
+        return not self.queue and not self._running
+
+    def run(self, stop=None, once=False):
+        '''
+        循环扫描直到 stop（threading.Event）被设置或收到 KeyboardInterrupt
+        - once: 处理完当前已写完的文件（等待 settle 秒确认）后返回
+        '''
+        start = self.clock()
+        try:
+            while stop is None or not stop.is_set():
+                self.step()
+                if once and self.idle and self.clock() - start >= self.settle:
+                    self.step()
+                    if self.idle:
+                        break
+                if stop is not None:
+                    stop.wait(self.interval)
+                else:
+                    time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """等待正在处理的任务完成并记录结果（未派发的任务留在台账中，重启后继续）"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self.collect()
+            self._pool = None
+
+
+def main(argv=None):
+    import matplotlib
+    matplotlib.use('Agg')
+    from .config import get_default_config
+    from .export import REPORT_PLOTS
+
+    parser = argparse.ArgumentParser(description="监视目录并自动处理新完成的 HELIOS 运行")
+    parser.add_argument('paths', nargs='+', help="监视的目录")
+    parser.add_argument('-o', '--out-dir', default='processed', help="输出目录（图、轨迹与序列）")
+    parser.add_argument('--ledger', default=None, help="任务台账，默认 <out-dir>/pyhelios_jobs.jsonl")
+    parser.add_argument('-j', '--workers', type=int, default=2, help="并行进程数")
+    parser.add_argument('--settle', type=float, default=30.0, help="文件多少秒不再变化后视为写完")
+    parser.add_argument('--interval', type=float, default=5.0, help="扫描间隔（秒）")
+    parser.add_argument('--pattern', default='*.exo', help="目录中查找文件的模式")
+    parser.add_argument('--plots', default=','.join(REPORT_PLOTS), help="逗号分隔的图名")
+    parser.add_argument('-f', '--formats', default='png', help="逗号分隔的输出格式")
+    parser.add_argument('--density-threshold', type=float, default=1.1)
+    parser.add_argument('--retries', type=int, default=3, help="失败的运行重试的次数")
+    parser.add_argument('--retry-delay', type=float, default=60.0, help="第一次重试前等待的秒数，之后每次加倍")
+    parser.add_argument('--compact', action='store_true', help="状态量以 float32 保存，降低内存占用")
+    parser.add_argument('--once', action='store_true', help="处理完当前已写完的文件后退出")
+    args = parser.parse_args(argv)
+
+    def progress(record):
+        error = (record.get('error') or '').splitlines()
+        print(f"{record['state']:8s} {record['file']}" + (f"  {error[0]}" if error else ''))
+
+    daemon = WatchDaemon(args.paths, args.out_dir, ledger=args.ledger, workers=args.workers, settle=args.settle,
+                         interval=args.interval, pattern=args.pattern, retries=args.retries,
+                         retry_delay=args.retry_delay, progress=progress,
+                         plots=[p.strip() for p in args.plots.split(',') if p.strip()],
+                         formats=tuple(f.strip() for f in args.formats.split(',') if f.strip()),
+                         density_threshold=args.density_threshold, config=get_default_config(),
+                         compact=args.compact)
+    daemon.run(once=args.once)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,19 @@
+"""
+测试用的小型 HELIOS 格式数据文件
+"""
+import matplotlib
+import pytest
+
+matplotlib.use("Agg")
+
+from pyhelios.synthetic import write_synthetic  # noqa: E402
+
+
+def write_helios_file(path, nt=40, nz=30):
+    """写出一个变量布局与 HELIOS .exo 相同、埋有已知冲击波的小型 netCDF 文件"""
+    return write_synthetic(path, nt=nt, nr=nz).path
+
+
+@pytest.fixture
+def helios_file(tmp_path):
+    return str(write_helios_file(tmp_path / "run.exo"))
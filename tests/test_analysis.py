@@ -0,0 +1,167 @@
+"""
+analysis 模块测试
+"""
+import numpy as np
+import pytest
+
+from pyhelios.analysis import detect_shock_front, lineout, remap_rows
+
+
+def _detect_shock_front_loop(density, radius_edges, time_edges, density_threshold=1.1):
+    '''
+    逐时刻循环的原始实现，作为向量化版本的参考
+    3点平滑按标量逐项相乘再相加（与 np.convolve(mode='same') 的定义相同，不使用 FMA）
+    '''
+    w = 1 / 3
+    shock_pos = []
+    nt = density.shape[0]
+    for t in range(nt):
+        rho = density[t, :]
+        grad = np.gradient(rho)
+        max_neg_grad_idx = np.argmin(grad)
+        rho_smooth = np.array([(rho[i-1] * w if i > 0 else 0.0) + rho[i] * w
+                               + (rho[i+1] * w if i < len(rho)-1 else 0.0) for i in range(len(rho))])
+        density_ratio = np.zeros_like(rho)
+        for i in range(1, len(rho)-1):
+            if rho_smooth[i+1] > 0:
+                density_ratio[i] = rho_smooth[i-1] / rho_smooth[i+1]
+        valid_indices = np.where((grad < 0) & (density_ratio > density_threshold))[0]
+        if len(valid_indices) > 0:
+            local_grad = grad[valid_indices]
+            relative_idx = np.argmin(local_grad)
+            idx = valid_indices[relative_idx]
+        else:
+            idx = max_neg_grad_idx if grad[max_neg_grad_idx] < 0 else np.argmin(grad)
+        idx = max(0, min(idx, len(rho)-1))
+        if radius_edges.shape[0] == density.shape[0] + 1:
+            r = 0.5 * (radius_edges[t, idx] + radius_edges[t, idx+1])
+        elif radius_edges.shape[1] == density.shape[0]:
+            r = radius_edges[idx, t]
+        else:
+            r = radius_edges[t, idx]
+        shock_pos.append(r)
+    if len(shock_pos) > 0:
+        shock_pos[0] = 0
+    return np.array(shock_pos)
+
+
+def _shocked_density(nt, nr, seed=0):
+    """带有已知冲击波阶跃与随机扰动的密度场"""
+    rng = np.random.default_rng(seed)
+    front = np.linspace(nr - 2, 1, nt).astype(int)
+    zone = np.arange(nr)
+    density = np.where(zone[None, :] < front[:, None], 1.0, 4.0)
+    density = density * (1 + 0.05 * rng.random((nt, nr)))
+    # 部分时刻只有噪声，走无有效区域的分支
+    density[nt // 3] = rng.random(nr) * 10 ** rng.uniform(-3, 3, nr)
+    density[nt // 2] = 1.0
+    return density
+
+
+@pytest.mark.parametrize("layout", ["node_edges", "transposed", "zone_centres"])
+@pytest.mark.parametrize("threshold", [1.1, 1.5, 2.0, 3.0])
+def test_detect_shock_front_matches_loop(layout, threshold):
+    nt, nr = 60, 40
+    density = _shocked_density(nt, nr)
+    time_edges = np.linspace(0, 5, nt + 1)
+    boundaries = np.cumsum(np.random.default_rng(1).random((nt + 1, nr + 1)), axis=1)
+    radius_edges = {
+        "node_edges": boundaries,
+        "transposed": boundaries[:nt, :nr + 1].T.copy(),
+        "zone_centres": boundaries[:nt, :nr],
+    }[layout]
+    expected = _detect_shock_front_loop(density, radius_edges, time_edges, threshold)
+    result = detect_shock_front(density, radius_edges, time_edges, threshold)
+    assert result.dtype == expected.dtype
+    assert np.array_equal(result, expected)
+
+
+def test_detect_shock_front_random_fields():
+    rng = np.random.default_rng(2)
+    for nr in (3, 4, 17):
+        density = rng.random((30, nr)) * 10 ** rng.uniform(-5, 5, (30, nr))
+        radius_edges = np.cumsum(rng.random((31, nr + 1)), axis=1)
+        time_edges = np.arange(31.0)
+        for threshold in (1.0, 1.1, 2.0):
+            expected = _detect_shock_front_loop(density, radius_edges, time_edges, threshold)
+            assert np.array_equal(detect_shock_front(density, radius_edges, time_edges, threshold), expected)
+
+
+def test_detect_shock_front_ratio_on_threshold():
+    # 密度比恰好等于阈值时，严格大于的判据必须与逐行实现一致
+    density = np.tile([4.0, 4.0, 4.0, 2.0, 2.0, 2.0, 1.0, 1.0], (5, 1))
+    radius_edges = np.tile(np.arange(9.0), (6, 1))
+    time_edges = np.arange(6.0)
+    for threshold in (2.0, np.nextafter(2.0, 0), np.nextafter(2.0, 3)):
+        expected = _detect_shock_front_loop(density, radius_edges, time_edges, threshold)
+        assert np.array_equal(detect_shock_front(density, radius_edges, time_edges, threshold), expected)
+
+
+def test_detect_shock_fronts_matches_single_threshold():
+    from pyhelios.analysis import detect_shock_fronts
+    nt, nr = 50, 30
+    density = _shocked_density(nt, nr, seed=3)
+    radius_edges = np.cumsum(np.ones((nt + 1, nr + 1)), axis=1)
+    time_edges = np.arange(nt + 1.0)
+    thresholds = [1.1, 1.5, 2.0, 3.0]
+    family = detect_shock_fronts(density, radius_edges, time_edges, thresholds)
+    assert family.shape == (len(thresholds), nt)
+    for row, thr in zip(family, thresholds):
+        assert np.array_equal(row, detect_shock_front(density, radius_edges, time_edges, thr))
+
+
+def test_reduce_fields_in_memory_and_chunked(helios_file):
+    from pyhelios.analysis import max_pressure, reduce_fields
+    from pyhelios.dataio import HeliosData
+    stats = ['max:pressure', 'min:elec_temperature', 'argmax_radius:mass_density',
+             ('mass_mean', 'ion_temperature'), ('volume_integral', 'pressure')]
+    helios = HeliosData(helios_file)
+    helios.process()
+    result = reduce_fields(helios, stats)
+    assert np.array_equal(result['max_pressure'], max_pressure(helios.get('pressure'), smooth=False))
+    zb = helios.get('zone_boundaries')
+    idx = np.argmax(helios.get('mass_density'), axis=1)
+    centres = 0.5 * (zb[:, :-1] + zb[:, 1:])
+    assert np.allclose(result['argmax_radius_mass_density'], centres[np.arange(len(idx)), idx])
+    mass = helios.get('zone_mass')
+    assert np.allclose(result['mass_mean_ion_temperature'],
+                       (helios.get('ion_temperature') * mass).sum(axis=1) / mass.sum(axis=1))
+    assert np.allclose(result['volume_integral_pressure'], (helios.get('pressure') * helios.get('volume')).sum(axis=1))
+    smoothed = reduce_fields(helios, stats, smooth=True)
+    assert np.allclose(smoothed['max_pressure'], max_pressure(helios.get('pressure')))
+
+    chunked = HeliosData(helios_file, chunk_size=7)
+    chunked.process()
+    chunked_result = chunked.get('reductions', stats=stats)
+    assert chunked.materialized_fields == []
+    for key, values in result.items():
+        assert np.allclose(chunked_result[key], values)
+
+
+def _remap_loop(values, zone_boundaries, weights, grid_edges):
+    """逐时刻 np.interp 的参考实现"""
+    out = np.full((len(values), len(grid_edges) - 1), np.nan)
+    for t in range(len(values)):
+        cum_w = np.concatenate(([0], np.cumsum(weights[t])))
+        cum_q = np.concatenate(([0], np.cumsum(values[t] * weights[t])))
+        w = np.diff(np.interp(grid_edges, zone_boundaries[t], cum_w))
+        q = np.diff(np.interp(grid_edges, zone_boundaries[t], cum_q))
+        out[t, w > 0] = q[w > 0] / w[w > 0]
+    return out
+
+
+def test_remap_is_conservative():
+    rng = np.random.default_rng(3)
+    zone_boundaries = np.cumsum(rng.random((12, 41)), axis=1)
+    values, weights = rng.random((12, 40)), rng.random((12, 40))
+    grid_edges = np.linspace(-1, zone_boundaries.max() + 1, 57)
+    remapped, grid_weights = remap_rows(values, zone_boundaries, weights, grid_edges, return_weights=True)
+    np.testing.assert_allclose(remapped, _remap_loop(values, zone_boundaries, weights, grid_edges), rtol=1e-10)
+    np.testing.assert_allclose(np.nansum(remapped * grid_weights, axis=1), np.sum(values * weights, axis=1))
+    # 常数场投影后仍为常数
+    constant = remap_rows(np.full_like(values, 2.5), zone_boundaries, weights, grid_edges)
+    assert np.array_equal(np.isnan(constant), np.isnan(remapped))
+    np.testing.assert_allclose(constant[np.isfinite(constant)], 2.5)
+    series = lineout(remapped, grid_edges, [grid_edges[3] + 1e-9, 1e9])
+    assert np.array_equal(series[0], remapped[:, 3], equal_nan=True)
+    assert np.all(np.isnan(series[1]))
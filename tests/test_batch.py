@@ -0,0 +1,50 @@
+"""
+批量分析测试
+"""
+import numpy as np
+
+from conftest import write_helios_file
+from pyhelios.analysis import shock_breakout_time
+from pyhelios.batch import main, read_summary, run_batch
+
+
+def test_shock_breakout_time():
+    time = np.arange(5.0)
+    assert shock_breakout_time([0, 1, 2, 5, 6], time, 4.5) == 3.0
+    assert np.isnan(shock_breakout_time([0, 1, 2, 3, 3], time, np.full(5, 4.5)))
+
+
+def test_run_batch_isolates_failures_and_resumes(tmp_path):
+    runs = [str(write_helios_file(tmp_path / f"run{i}.exo", nt=20 + i, nz=15)) for i in range(2)]
+    broken = tmp_path / "broken.exo"
+    broken.write_text("not a netcdf file")
+    output = str(tmp_path / "summary.csv")
+    rows = run_batch(runs + [str(broken)], output, workers=2)
+    assert sorted(row['status'] for row in rows) == ['error', 'ok', 'ok']
+    summary = read_summary(output)
+    assert len(summary) == 3
+    ok = [row for row in summary if row['status'] == 'ok']
+    assert {int(row['n_times']) for row in ok} == {20, 21}
+    assert all(float(row['peak_density']) > 0 for row in ok)
+    assert np.load(ok[0]['shock_track_file']).shape[0] == 2
+    # 重新运行只处理失败的文件
+    missing = str(tmp_path / "missing.exo")
+    rows = run_batch(runs + [str(broken), missing], output, workers=1)
+    assert [row['status'] for row in rows] == ['error', 'error']
+    # 失败的文件替换原来的行，不重复追加
+    summary = read_summary(output)
+    assert sorted(row['file'] for row in summary) == sorted(str(p) for p in runs + [broken, tmp_path / "missing.exo"])
+    # 改变的文件重新处理后替换原来的行
+    write_helios_file(runs[0], nt=25, nz=15)
+    rows = run_batch(runs, output, workers=1)
+    assert [int(row['n_times']) for row in rows] == [25]
+    summary = read_summary(output)
+    assert len(summary) == 4
+    assert [int(row['n_times']) for row in summary if row['file'] == runs[0]] == [25]
+    # 统计参数改变后重新处理已完成的文件
+    assert run_batch(runs, output, workers=1) == []
+    rows = run_batch(runs, output, workers=1, density_threshold=2.0)
+    assert sorted(row['file'] for row in rows) == sorted(runs) and all(row['status'] == 'ok' for row in rows)
+    assert run_batch(runs, output, workers=1, density_threshold=2.0) == []
+    assert len(read_summary(output)) == 4
+    assert main([str(tmp_path), '-o', output, '-j', '1']) == 1
@@ -0,0 +1,62 @@
+"""
+能量与质量收支测试
+"""
+import numpy as np
+import pytest
+
+from pyhelios.budget import EV_TO_K, KINETIC_FACTOR, RADIATION_CONSTANT, energy_budget
+from pyhelios.dataio import HeliosData
+
+
+def _budget_loop(helios, r_min):
+    """逐时刻循环的参考实现"""
+    zb, mass = helios.get('zone_boundaries'), helios.get('zone_mass')
+    kinetic, radiation, outside = [], [], []
+    for t in range(helios.n_times):
+        centers = 0.5 * (zb[t, :-1] + zb[t, 1:])
+        region = centers >= r_min
+        v = helios.get('fluid_velocity')[t]
+        kinetic.append(np.sum((0.5 * KINETIC_FACTOR * mass[t] * v ** 2)[region]))
+        volume = mass[t] / helios.get('mass_density')[t]
+        radiation.append(np.sum((RADIATION_CONSTANT * (helios.get('rad_temperature')[t] * EV_TO_K) ** 4 * volume)[region]))
+        outside.append(np.sum(mass[t][region]))
+    return np.array(kinetic), np.array(radiation), np.array(outside)
+
+
+def test_budget_matches_loop_and_streams(helios_file):
+    helios = HeliosData(helios_file)
+    helios.process()
+    r_min = 20.0
+    budget = helios.get('budget', quantities=['kinetic', 'radiation', 'ablated_mass', 'total', 'thermal_ion'],
+                        r_range=(r_min, None), ablation_radius=r_min)
+    kinetic, radiation, outside = _budget_loop(helios, r_min)
+    assert np.allclose(budget['kinetic'], kinetic)
+    assert np.allclose(budget['radiation'], radiation)
+    assert np.allclose(budget['ablated_mass'], outside)
+    assert np.all(budget['total'] >= budget['kinetic'])
+
+    whole = helios.get('budget', quantities=['mass'])['mass']
+    parts = [helios.get('budget', quantities=['mass'], zones=zones)['mass'] for zones in [(None, 10), (10, None)]]
+    assert np.allclose(parts[0] + parts[1], whole)
+
+    chunked = HeliosData(helios_file, chunk_size=7)
+    chunked.process()
+    streamed = energy_budget(chunked, ['kinetic', 'radiation', 'ablated_mass'], r_range=(r_min, None),
+                             ablation_radius=r_min)
+    assert chunked.materialized_fields == []
+    for key, values in streamed.items():
+        assert np.allclose(values, budget[key])
+
+    with pytest.raises(ValueError):
+        helios.get('budget', quantities=['ablated_mass'])
+
+
+def test_plot_budget(helios_file):
+    import matplotlib.pyplot as plt
+    from pyhelios import PyHelios
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    ax = helios.plot_budget(['kinetic', 'thermal', 'mass'])
+    assert len(ax.get_lines()) == 2
+    assert ax.get_legend() is not None
+    plt.close(ax.figure)
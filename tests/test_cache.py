@@ -0,0 +1,107 @@
+"""
+磁盘缓存测试
+"""
+import os
+
+import numpy as np
+
+from pyhelios.cache import ProcessedCache
+from pyhelios.dataio import FIELDS, HeliosData
+
+
+def test_cache_roundtrip(helios_file, tmp_path):
+    cache = ProcessedCache(str(tmp_path / "cache"))
+    first = HeliosData(helios_file, cache=cache)
+    first.load()
+    first.process()
+    shock_pos = first.get('shock_pos')
+
+    second = HeliosData(helios_file, cache=cache)
+    second.load()
+    second.process()
+    assert second.raw_data is None
+    reference = HeliosData(helios_file)
+    reference.process()
+    for name in FIELDS:
+        assert np.array_equal(second.get(name), reference.get(name))
+    assert 'shock_pos__density_threshold=1.1' in second._cache_entry
+    assert np.array_equal(second.get('shock_pos'), shock_pos)
+
+
+def test_cache_invalidation_and_eviction(helios_file, tmp_path):
+    cache = ProcessedCache(str(tmp_path / "cache"))
+    HeliosData(helios_file, cache=cache).process()
+    HeliosData(helios_file, cache=cache, zone_range=(0, 10)).process()
+    assert len(cache.entries()) == 2
+    # 源文件改变后旧条目失效并被清除
+    st = os.stat(helios_file)
+    os.utime(helios_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    helios = HeliosData(helios_file, cache=cache)
+    helios.load()
+    assert helios.raw_data is not None
+    helios.process()
+    assert len(cache.entries()) == 1
+    cache.max_bytes = 1
+    HeliosData(helios_file, cache=cache, zone_range=(0, 5)).process()
+    assert len(cache.entries()) == 1
+
+
+def test_process_progress_and_abort(helios_file, tmp_path):
+    cache = ProcessedCache(str(tmp_path / "cache"))
+    calls = []
+
+    def abort(done, total, name):
+        calls.append(name)
+        if done == 2:
+            raise KeyboardInterrupt
+
+    helios = HeliosData(helios_file, cache=cache)
+    helios.load()
+    try:
+        helios.process(progress=abort)
+    except KeyboardInterrupt:
+        pass
+    # 中止后不留下半成品条目
+    assert calls == list(FIELDS[:3])
+    assert not helios.processed
+    assert os.listdir(cache.cache_dir) == []
+
+    steps = []
+    helios.process(progress=lambda done, total, name: steps.append((done, total)))
+    assert steps == [(i, len(FIELDS)) for i in range(len(FIELDS))]
+    prefetched = []
+    helios.prefetch(['mass_density', 'pressure'], progress=lambda done, total, name: prefetched.append(name))
+    assert prefetched == ['mass_density', 'pressure', '']
+    assert set(helios.materialized_fields) == {'mass_density', 'pressure'}
+
+
+def test_cache_with_chunk_size(helios_file, tmp_path):
+    cache = ProcessedCache(str(tmp_path / "cache"))
+    chunked = HeliosData(helios_file, cache=cache, chunk_size=7)
+    chunked.process()
+    assert chunked.processed and chunked._cache_entry is not None
+    reference = HeliosData(helios_file)
+    reference.process()
+    for name in FIELDS:
+        assert np.array_equal(chunked.get(name), reference.get(name)), name
+    assert np.array_equal(chunked.get('shock_pos'), reference.get('shock_pos'))
+
+
+def test_concurrent_store_same_key(helios_file, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+    cache = ProcessedCache(str(tmp_path / "cache"))
+    barrier = threading.Barrier(8)
+    values = np.arange(1000.0)
+
+    def fields():
+        yield 'a', values
+        barrier.wait()
+        yield 'b', values * 2
+
+    with ThreadPoolExecutor(8) as pool:
+        entries = list(pool.map(lambda _: cache.store(helios_file, {'x': 1}, fields()), range(8)))
+    assert len({entry.path for entry in entries}) == 1
+    assert len(cache.entries()) == 1
+    assert not [name for name in os.listdir(cache.cache_dir) if name.startswith('.')]
+    assert np.array_equal(entries[0].load('b'), values * 2)
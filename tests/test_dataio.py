@@ -0,0 +1,201 @@
+"""
+dataio 模块测试
+"""
+import shutil
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from pyhelios.analysis import remap_rows
+from pyhelios.dataio import COMPACT_FIELDS, HeliosData
+
+
+def test_process_is_lazy(helios_file):
+    helios = HeliosData(helios_file)
+    helios.process()
+    assert helios.materialized_fields == []
+    density = helios.get('mass_density')
+    assert helios.materialized_fields == ['mass_density']
+    assert helios.get('mass_density') is density
+    assert 'radius_edges' in helios.data
+    assert 'time' not in helios.data
+    assert helios.materialized_fields == ['mass_density']
+
+
+def test_fields_match_eager_conversion(helios_file):
+    helios = HeliosData(helios_file)
+    helios.process()
+    raw = xr.open_dataset(helios_file)
+    time_whole = raw['time_whole'].values * 1e9
+    zone_boundaries = raw['zone_boundaries'].values * 1e4
+    time_diff = np.diff(time_whole) / 2
+    time_edges = np.concatenate(([time_whole[0] - time_diff[0]], time_whole[:-1] + time_diff, [time_whole[-1] + time_diff[-1]]))
+    radius_diff = np.diff(zone_boundaries, axis=0) / 2
+    radius_edges = np.vstack((zone_boundaries[0, :] - radius_diff[0, :],
+                              zone_boundaries[:-1, :] + radius_diff,
+                              zone_boundaries[-1, :] + radius_diff[-1, :]))
+    pressure = (raw['ion_pressure'].values + raw['elec_pressure'].values) * 1e-5
+    assert np.array_equal(helios.get('time_edges'), time_edges)
+    assert np.array_equal(helios.get('radius_edges'), radius_edges)
+    assert np.array_equal(helios.get('pressure'), pressure)
+    assert np.array_equal(helios.get('fluid_velocity'), raw['fluid_velocity'].values / 100000)
+    assert np.array_equal(helios.get('volume'), raw['zone_mass'].values / raw['mass_density'].values)
+    assert helios.get('shock_pos').shape == time_whole.shape
+    raw.close()
+
+
+def test_selection_matches_full_slice(helios_file):
+    full = HeliosData(helios_file)
+    full.process()
+    time_ns = full.get('time_whole')
+    subset = HeliosData(helios_file, time_range=(time_ns[5], time_ns[30]), zone_range=(4, 20), time_stride=3)
+    subset.process()
+    rows = slice(5, 31, 3)
+    assert np.array_equal(subset.get('time_whole'), time_ns[rows])
+    assert np.array_equal(subset.get('mass_density'), full.get('mass_density')[rows, 4:20])
+    assert np.array_equal(subset.get('zone_boundaries'), full.get('zone_boundaries')[rows, 4:21])
+    assert np.array_equal(subset.get('pressure'), full.get('pressure')[rows, 4:20])
+    time_sub = time_ns[rows]
+    diff = np.diff(time_sub) / 2
+    assert np.allclose(subset.get('time_edges')[1:-1], time_sub[:-1] + diff)
+    assert subset.get('radius_edges').shape == (len(time_sub) + 1, 17)
+    assert subset.get('shock_pos').shape == time_sub.shape
+    assert subset.get('max_density').shape == time_sub.shape
+
+
+def test_select_resets_fields(helios_file):
+    helios = HeliosData(helios_file)
+    helios.process()
+    assert helios.get('mass_density').shape == (40, 30)
+    helios.select(zone_range=(0, 10))
+    assert helios.materialized_fields == []
+    assert helios.get('mass_density').shape == (40, 10)
+    helios.select(time_range=(None, 1.0))
+    assert helios.get('time_whole').max() <= 1.0
+
+
+def test_chunked_mode_matches_in_memory(helios_file):
+    full = HeliosData(helios_file, zone_range=(2, 28))
+    full.process()
+    chunked = HeliosData(helios_file, zone_range=(2, 28), chunk_size=7)
+    chunked.process()
+    for key in ('shock_pos', 'max_pressure', 'max_density'):
+        assert np.array_equal(chunked.get(key), full.get(key))
+    # 流式分析不会把整个字段留在内存中
+    assert chunked.materialized_fields == []
+    for key in ('pressure', 'volume', 'time_edges', 'radius_edges', 'fluid_velocity'):
+        assert np.array_equal(chunked.get(key), full.get(key))
+
+
+def test_iter_chunks_edges(helios_file):
+    helios = HeliosData(helios_file, chunk_size=9)
+    helios.process()
+    radius_edges = helios.get('radius_edges')
+    for rows, chunk in helios.iter_chunks('radius_edges', 'pressure'):
+        assert len(chunk['pressure']) == rows.stop - rows.start
+        assert np.array_equal(chunk['radius_edges'], radius_edges[rows.start:rows.stop + 1])
+
+
+def test_results_are_memoized_per_parameters(helios_file):
+    helios = HeliosData(helios_file, config={'result_cache_size': 2})
+    helios.process()
+    shock = helios.get('shock_pos')
+    assert helios.get('shock_pos', density_threshold=1.1) is shock
+    other = helios.get('shock_pos', density_threshold=2.0)
+    assert other is not shock
+    assert helios.get('max_pressure', smooth=False) is helios.get('max_pressure', smooth=False)
+    # 超出容量时最久未使用的结果被丢弃
+    assert helios.get('shock_pos') is not shock
+    first = helios.get('max_density')
+    helios.select(zone_range=(0, 10))
+    assert helios.get('max_density') is not first
+    with pytest.raises(TypeError):
+        helios.get('shock_pos', smooth=True)
+
+
+def test_shock_fronts_family(helios_file):
+    helios = HeliosData(helios_file)
+    helios.process()
+    family = helios.get('shock_fronts', density_thresholds=[1.1, 2.0])
+    assert family.shape == (2, 40)
+    assert np.array_equal(family[1], helios.get('shock_pos', density_threshold=2.0))
+    assert helios.get('shock_fronts', density_thresholds=(1.1, 2.0)) is family
+    chunked = HeliosData(helios_file, chunk_size=6)
+    chunked.process()
+    assert np.array_equal(chunked.get('shock_fronts', density_thresholds=[1.1, 2.0]), family)
+
+
+def test_refresh_reads_only_appended_steps(helios_file, tmp_path):
+    growing = str(tmp_path / "growing.exo")
+    with xr.open_dataset(helios_file) as ds:
+        ds.isel(time_whole=slice(0, 25)).load().to_netcdf(growing, engine="scipy")
+    helios = HeliosData(growing, chunk_size=10)
+    helios.process()
+    radius_edges = helios.get('radius_edges')
+    helios.get('pressure')
+    shock = helios.get('shock_pos')
+    helios.get('shock_fronts', density_thresholds=[1.1, 2])
+    helios.get('max_pressure')
+    helios.get('reductions', stats=['max:pressure'])
+    assert helios.refresh() == 0
+    materialized = sorted(helios.materialized_fields)
+
+    shutil.copy(helios_file, growing)
+    assert helios.refresh() == 15
+    full = HeliosData(helios_file)
+    full.process()
+    assert sorted(helios.materialized_fields) == materialized
+    for name in ('radius_edges', 'pressure', 'time_edges', 'mass_density'):
+        assert np.array_equal(helios.get(name), full.get(name))
+    assert np.array_equal(helios.get('radius_edges')[:25], radius_edges[:25])
+    assert np.array_equal(helios.get('shock_pos')[:25], shock)
+    for key, params in (('shock_pos', {}), ('shock_fronts', {'density_thresholds': [1.1, 2]}), ('max_pressure', {})):
+        assert np.array_equal(helios.get(key, **params), full.get(key, **params))
+    # 无法增量更新的结果被丢弃
+    assert not any(key == 'reductions' for key, _ in helios._results)
+
+
+def test_compact_mode(helios_file):
+    full = HeliosData(helios_file)
+    full.process()
+    compact = HeliosData(helios_file, compact=True)
+    compact.process()
+    for name in ('mass_density', 'pressure', 'volume', 'fluid_velocity', 'radius_edges', 'time_edges'):
+        values = compact.get(name)
+        assert values.dtype == (np.float32 if name in COMPACT_FIELDS else np.float64)
+        np.testing.assert_allclose(values, full.get(name), rtol=1e-6)
+    footprint, reference = compact.memory_footprint(), full.memory_footprint()
+    assert footprint['pressure'] * 2 == reference['pressure']
+    assert footprint['radius_edges'] == reference['radius_edges']
+    assert compact.get('shock_pos').shape == full.get('shock_pos').shape
+
+
+def test_remap_is_cached_and_chunked(helios_file):
+    helios = HeliosData(helios_file)
+    helios.process()
+    grid_edges, density = helios.remap('mass_density', n_radius=50)
+    assert density.shape == (40, 50) and len(grid_edges) == 51
+    assert helios.remap('mass_density', n_radius=50)[1] is density
+    # 密度按体积加权，网格覆盖全部物质时总质量守恒
+    _, grid_volume = remap_rows(helios.get('mass_density'), helios.get('zone_boundaries'), helios.get('volume'),
+                                grid_edges, return_weights=True)
+    np.testing.assert_allclose(np.nansum(density * grid_volume, axis=1), helios.get('zone_mass').sum(axis=1))
+    chunked = HeliosData(helios_file, chunk_size=7)
+    chunked.process()
+    np.testing.assert_allclose(chunked.remap('mass_density', n_radius=50)[1], density)
+    assert chunked.materialized_fields == []
+    assert helios.lineout([10.0, 50.0], 'fluid_velocity', n_radius=50).shape == (2, 40)
+
+
+def test_missing_variable_raises(helios_file, tmp_path):
+    path = str(tmp_path / "no_rad.exo")
+    with xr.open_dataset(helios_file) as raw:
+        raw.drop_vars('radiation_temperature').load().to_netcdf(path, engine='scipy')
+    helios = HeliosData(path)
+    helios.process()
+    # 文件缺少变量时读取出错，而不是返回 None
+    with pytest.raises(KeyError):
+        helios.get('rad_temperature')
+    assert helios.get('no_such_field') is None
+    assert helios.data.get('no_such_field', 0) == 0
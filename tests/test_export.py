@@ -0,0 +1,67 @@
+"""
+报告图导出测试
+"""
+import os
+
+from conftest import write_helios_file
+from pyhelios.export import REPORT_PLOTS, export_report, output_path
+
+
+def test_export_report_writes_and_skips_up_to_date(tmp_path):
+    runs = [str(write_helios_file(tmp_path / f"run{i}.exo", nt=20, nz=12)) for i in range(2)]
+    out_dir = str(tmp_path / "figures")
+    results = export_report(runs, out_dir, formats=('png', 'svg'), workers=2, common={'xlim': (0, 3)})
+    for run in runs:
+        assert results[run]['errors'] == []
+        assert len(results[run]['written']) == 2 * len(REPORT_PLOTS)
+        assert os.path.exists(output_path(run, out_dir, 'density', 'svg'))
+    # 输出比源文件新时跳过
+    again = export_report(runs, out_dir, plots=['density', 'pressure'], formats=('png',), workers=1)
+    assert all(r['written'] == [] for r in again.values())
+    os.utime(runs[0], (os.path.getatime(runs[0]), os.path.getmtime(runs[0]) + 100))
+    again = export_report(runs, out_dir, plots=['density', 'pressure'], formats=('png',), workers=1)
+    assert len(again[runs[0]]['written']) == 2 and again[runs[1]]['written'] == []
+
+
+def test_per_plot_kwargs_override_common(tmp_path, monkeypatch):
+    import matplotlib
+    from pyhelios.core import PyHelios
+    run = str(write_helios_file(tmp_path / "run.exo", nt=20, nz=12))
+    calls = {}
+    original = PyHelios.plot_density
+
+    def spy(self, **kwargs):
+        calls['density'] = kwargs
+        return original(self, **kwargs)
+
+    monkeypatch.setattr(PyHelios, 'plot_density', spy)
+    backend = matplotlib.get_backend()
+    results = export_report([run], str(tmp_path / "figures"), plots=['density'], workers=1,
+                            common={'xlim': (0, 3), 'ylim': (0, 50)}, plot_kwargs={'density': {'xlim': (1, 2)}})
+    assert results[run]['errors'] == []
+    kwargs = dict(calls['density'])
+    assert kwargs.pop('ax') is not None
+    assert kwargs == {'shocktrack': True, 'xlim': (1, 2), 'ylim': (0, 50)}
+    # 在当前进程中导出不改变调用者的后端
+    assert matplotlib.get_backend() == backend
+
+
+def test_split_only_cached_runs(tmp_path):
+    from pyhelios.config import get_default_config
+    from pyhelios.dataio import HeliosData
+    run = str(write_helios_file(tmp_path / "run.exo", nt=20, nz=12))
+    config = dict(get_default_config(), cache_dir=str(tmp_path / "cache"))
+    plots = ['density', 'pressure', 'eletemp']
+    tasks = []
+
+    def export(cache):
+        tasks.clear()
+        return export_report([run], str(tmp_path / "figures"), plots=plots, workers=3, config=config, force=True,
+                             cache=cache, progress=lambda file_path, written, error: tasks.append(len(written)))
+
+    # 未缓存的运行不拆分，避免每个进程都重新处理整个运行
+    assert export(True)[run]['errors'] == []
+    assert tasks == [3]
+    assert HeliosData(run, config, cache=True)._lookup_cache()
+    assert export(True)[run]['errors'] == []
+    assert tasks == [1, 1, 1]
@@ -0,0 +1,129 @@
+"""
+绘图模块测试
+"""
+import shutil
+
+import matplotlib.pyplot as plt
+import numpy as np
+import xarray as xr
+
+from pyhelios import PyHelios
+from pyhelios.plotting import decimate_mesh, update_plot
+
+
+def test_decimate_mesh_keeps_extrema_and_geometry():
+    nt, nr = 1000, 400
+    time_edges = np.linspace(0, 10, nt + 1)
+    radius_edges = np.tile(np.linspace(0, 100, nr + 1), (nt + 1, 1))
+    values = np.ones((nt, nr))
+    values[523, 211] = 50.0
+    values[100, 10] = -80.0
+    te, re, vals = decimate_mesh(time_edges, radius_edges, values, (200, 100))
+    assert vals.shape == (200, 100)
+    assert te.shape == (201,) and re.shape == (201, 101)
+    assert vals.max() == 50.0 and vals.min() == -80.0
+    assert te[0] == time_edges[0] and te[-1] == time_edges[-1]
+    # 只保留显示范围内的单元
+    te, re, vals = decimate_mesh(time_edges, radius_edges, values, (2000, 2000), xlim=(2, 3), ylim=(10, 20))
+    assert te[0] <= 2 and te[-1] >= 3 and len(te) < 120
+    assert re.min() <= 10 and re.max() >= 20 and re.shape[1] <= 44
+
+
+def test_field_plot_lod(helios_file):
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    full = helios.plot_pressure()
+    coarse = helios.plot_pressure(lod=True, lod_pixels=(10, 5), rasterized=True)
+    assert coarse.collections[0].get_array().size == 50
+    assert coarse.collections[0].get_rasterized()
+    assert np.isclose(coarse.collections[0].get_array().max(), full.collections[0].get_array().max())
+    plt.close('all')
+
+
+def test_plot_radius_single_collection(helios_file):
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    ax = helios.plot_radius(zone_stride=4, regions=[(0, 10, 'red')])
+    assert len(ax.lines) == 0 and len(ax.collections) == 1
+    segments = ax.collections[0].get_segments()
+    n_nodes = helios.get('zone_boundaries').shape[1]
+    assert len(segments) == len(range(0, n_nodes, 4)) + (0 if (n_nodes - 1) % 4 == 0 else 1)
+    assert np.array_equal(segments[-1][:, 1], helios.get('zone_boundaries')[:, -1])
+    colors = ax.collections[0].get_colors()
+    assert tuple(colors[0]) == (1.0, 0.0, 0.0, 1.0) and tuple(colors[-1]) == (0.0, 0.0, 0.0, 1.0)
+    plt.close('all')
+
+
+def test_dashboard_shares_mesh_and_swaps_data(helios_file):
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    dashboard = helios.plot_dashboard(['mass_density', 'pressure', 'elec_temperature'], ncols=2)
+    meshes = dashboard.meshes
+    assert len(meshes) == 3
+    assert all(np.array_equal(m.get_coordinates(), meshes[0].get_coordinates()) for m in meshes)
+    assert np.array_equal(meshes[1].get_array(), helios.get('pressure').T)
+    mesh = meshes[1]
+    dashboard.set_field(1, 'ion_temperature')
+    assert dashboard.meshes[1] is mesh
+    assert np.array_equal(mesh.get_array(), helios.get('ion_temperature').T)
+    assert 'Ion Temperature' in dashboard.axes[1].get_title()
+    assert mesh.get_clim() == (helios.get('ion_temperature').min(), helios.get('ion_temperature').max())
+    dashboard.axes[0].set_xlim(1, 2)
+    assert dashboard.axes[2].get_xlim() == (1, 2)
+    lod = helios.plot_dashboard(lod=True, lod_pixels=(8, 4))
+    assert lod.meshes[0].get_array().shape == (4, 8)
+    plt.close('all')
+
+
+def test_plot_into_given_axes_and_update(helios_file):
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    fig = plt.figure()
+    n_figs = len(plt.get_fignums())
+    ax = fig.add_subplot(111)
+    assert helios.plot_pressure(ax=ax) is ax
+    mesh = ax.collections[0]
+    update_plot(ax, xlim=(0, 1), cmap='viridis')
+    assert ax.collections[0] is mesh
+    assert ax.get_xlim() == (0, 1)
+    assert mesh.get_cmap().name == 'viridis'
+
+    ax.figure.clf()
+    ax = fig.add_subplot(111)
+    helios.plot_radius(ax=ax)
+    update_plot(ax, line_width=2, line_color='red')
+    coll = ax.collections[0]
+    assert coll.get_linewidths()[0] == 2
+    assert tuple(coll.get_colors()[0]) == (1, 0, 0, 1)
+    # 没有新建 figure
+    assert len(plt.get_fignums()) == n_figs
+    plt.close(fig)
+
+
+def test_live_plot_follows_appended_steps(helios_file, tmp_path):
+    growing = str(tmp_path / "growing.exo")
+    with xr.open_dataset(helios_file) as ds:
+        ds.isel(time_whole=slice(0, 20)).load().to_netcdf(growing, engine="scipy")
+    helios = PyHelios(growing)
+    helios.load_and_process()
+    live = helios.live_plot('plot_density', shocktrack=True)
+    shutil.copy(helios_file, growing)
+    updates = []
+    helios.follow(interval=0, plots=[live], idle_timeout=0,
+                  callback=lambda h, rows: updates.append((rows.start, rows.stop)))
+    assert updates == [(20, 40)]
+    assert live.ax.collections[0].get_array().size == 40 * 30
+    assert len(live.ax.lines[0].get_xdata()) == 40
+    plt.close(live.fig)
+
+
+def test_remapped_image_and_lineout(helios_file):
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    ax = helios.plot_remapped('pressure', n_radius=60)
+    assert len(ax.images) == 1 and ax.images[0].get_array().shape == (60, 40)
+    assert not ax.collections
+    plt.close(ax.figure)
+    ax = helios.plot_lineout([20.0, 60.0], 'pressure', n_radius=60)
+    assert len(ax.lines) == 2
+    plt.close(ax.figure)
@@ -0,0 +1,44 @@
+"""
+点查询测试
+"""
+import numpy as np
+
+from pyhelios.dataio import HeliosData
+from pyhelios.probe import ProbeIndex
+
+
+def _probe_loop(values, time, zone_boundaries, t, r):
+    """逐点扫描的参考实现（最近时刻之前的时刻，区域量）"""
+    out = []
+    for ti, ri in zip(t, r):
+        row = max(min(np.searchsorted(time, ti, side='right') - 1, len(time) - 1), 0)
+        zb = zone_boundaries[row]
+        zone = next((k for k in range(len(zb) - 1) if zb[k] <= ri < zb[k + 1]), None)
+        out.append(np.nan if zone is None else values[row, zone])
+    return np.array(out)
+
+
+def test_probe_matches_scan(helios_file):
+    helios = HeliosData(helios_file)
+    helios.process()
+    time, zb = helios.get('time_whole'), helios.get('zone_boundaries')
+    rng = np.random.default_rng(5)
+    t = rng.choice(time, 500)
+    r = rng.uniform(-5, zb.max() + 5, 500)
+    density = helios.get('mass_density')
+    assert np.array_equal(helios.probe('mass_density', t, r), _probe_loop(density, time, zb, t, r), equal_nan=True)
+    assert helios.probe_index() is helios.probe_index()
+
+
+def test_probe_time_interpolation_and_nodes():
+    time = np.array([0.0, 1.0, 3.0])
+    zone_boundaries = np.array([[0.0, 1, 2, 3], [0, 2, 4, 6], [0, 3, 6, 9]])
+    values = np.array([[1.0, 2, 3], [10, 20, 30], [100, 200, 300]])
+    index = ProbeIndex(time, zone_boundaries)
+    # t=0.5 时两侧分别在各自的网格上取样：r=1.5 在第0时刻的区域1、第1时刻的区域0
+    np.testing.assert_allclose(index.sample(values, 0.5, 1.5), 0.5 * (2 + 10))
+    np.testing.assert_allclose(index.sample(values, [[2.0], [3.0]], [1.0, 8.0]), [[55, np.nan], [100, 300]])
+    assert np.isnan(index.sample(values, 4.0, 1.0))
+    # 节点量在区域内线性插值
+    np.testing.assert_allclose(index.sample(zone_boundaries, 1.0, [0.5, 5.0]), [0.5, 5.0])
+    np.testing.assert_allclose(index.sample(values, 0.8, 1.5, time_interp=False), 10)
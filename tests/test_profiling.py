@@ -0,0 +1,68 @@
+"""
+阶段计时测试
+"""
+import json
+
+import pytest
+
+from pyhelios import PyHelios
+from pyhelios.profiling import PROFILER
+
+
+@pytest.fixture
+def profiler():
+    PROFILER.reset()
+    PROFILER.enable(memory=True)
+    yield PROFILER
+    PROFILER.disable()
+    PROFILER.reset()
+
+
+def test_stages_are_recorded(helios_file, profiler, tmp_path):
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    helios.get('shock_pos')
+    summary = helios.profile_summary()
+    stages = summary['stages']
+    for name in ('io.open_dataset', 'io.read', 'io.field.mass_density', 'analysis.shock_pos',
+                 'analysis.detect_shock_front'):
+        assert stages[name]['count'] >= 1
+    nbytes = helios.get('mass_density').nbytes
+    assert summary['variables']['mass_density']['bytes'] == nbytes
+    # 读取字节数计入外层阶段
+    assert stages['analysis.shock_pos']['bytes'] >= nbytes
+    assert stages['io.field.mass_density']['peak_bytes'] >= nbytes
+
+    trace = json.load(open(helios.export_trace(str(tmp_path / "trace.json"))))
+    assert {e['ph'] for e in trace['traceEvents']} == {'X'}
+    assert any(e['name'] == 'io.open_dataset' and e['cat'] == 'io' for e in trace['traceEvents'])
+
+
+def test_disabled_records_nothing(helios_file):
+    PROFILER.reset()
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    helios.get('shock_pos')
+    assert list(PROFILER.events) == []
+
+
+def test_bounded_events_and_explicit_enable(helios_file):
+    from pyhelios.config import get_default_config
+    from pyhelios.profiling import Profiler
+    profiler = Profiler(max_events=3)
+    profiler.enable()
+    for _ in range(5):
+        with profiler.stage('io.read', var='x', bytes=10):
+            pass
+    assert len(profiler.events) == 3
+    assert profiler.summary()['stages']['io.read']['count'] == 5
+    assert profiler.summary()['variables']['x']['bytes'] == 50
+    # 打开数据文件不改变全局记录器的状态
+    PROFILER.reset()
+    PyHelios.enable_profiling()
+    try:
+        PyHelios(helios_file, dict(get_default_config(), profile=False)).load_and_process()
+        assert PROFILER.enabled and PROFILER.summary()['stages']
+    finally:
+        PROFILER.disable()
+        PROFILER.reset()
@@ -5,3 +5,17 @@ PyHelios 测试用例
 def test_import():
     from pyhelios import PyHelios
     assert PyHelios is not None
+
+
+def test_plots_render(helios_file):
+    import matplotlib.pyplot as plt
+    from pyhelios import PyHelios
+    helios = PyHelios(helios_file)
+    helios.load_and_process()
+    for name in ('radius', 'density', 'eletemp', 'iontemp', 'radtemp', 'pressure',
+                 'fluidvel', 'shocktrack', 'max_pressure', 'max_density'):
+        ax = getattr(helios, f'plot_{name}')(xlim=(0, 3))
+        assert ax is not None
+    helios.plot_density(shocktrack=True)
+    helios.plot_shocktrack(density_thresholds=[1.1, 1.5, 2.0])
+    plt.close('all')
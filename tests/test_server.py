@@ -0,0 +1,99 @@
+"""
+常驻服务测试
+"""
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import write_helios_file
+from pyhelios.dataio import HeliosData
+from pyhelios.server import HeliosClient, RunPool, make_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    pool = RunPool(root=str(tmp_path))
+    server = make_server(port=0, pool=pool)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_mirrors_local_results(server, helios_file):
+    client = HeliosClient(f"http://127.0.0.1:{server.server_address[1]}")
+    remote = client.open(helios_file)
+    local = HeliosData(helios_file)
+    local.process()
+    assert remote.info['n_times'] == local.n_times
+    assert np.array_equal(remote.get('mass_density'), local.get('mass_density'))
+    assert np.array_equal(remote.get('shock_pos', density_threshold=2), local.get('shock_pos', density_threshold=2))
+    assert np.array_equal(remote.field('radius_edges', rows=(5, 10), zones=(2, 6)), local.get('radius_edges')[5:11, 2:7])
+    t, r = np.linspace(0, 4, 50), np.full(50, 30.0)
+    assert np.array_equal(remote.probe('pressure', t, r), local.probe('pressure', t, r), equal_nan=True)
+    budget = remote.budget(['kinetic', 'mass'])
+    assert set(budget) == {'kinetic', 'mass'}
+
+    png = remote.plot_max_pressure()
+    assert png.startswith(b'\x89PNG')
+    # 同一运行的重复请求由内存返回
+    assert remote.plot_max_pressure() == png
+    assert len(server.RequestHandlerClass.pool.runs) == 1
+    assert client.runs()[0]['bytes'] > 0
+    with pytest.raises(RuntimeError, match='400'):
+        remote.get('no_such_field')
+
+
+def test_pool_evicts_least_recently_used(tmp_path):
+    paths = [str(write_helios_file(tmp_path / f"run{i}.exo")) for i in range(3)]
+    pool = RunPool(max_bytes=1)
+    runs = [pool.get(path) for path in paths]
+    for run in runs:
+        run.helios.data['mass_density']
+        run.size = run.nbytes()
+    assert pool.trim(keep=runs[-1]) == 2
+    assert list(pool.runs) == [runs[-1].key]
+    with pytest.raises(PermissionError):
+        RunPool(root=str(tmp_path / "sub")).get(paths[0])
+
+
+def test_negative_stops_failed_open_and_symlink_close(server, helios_file, tmp_path):
+    client = HeliosClient(f"http://127.0.0.1:{server.server_address[1]}")
+    pool = server.RequestHandlerClass.pool
+    with pytest.raises(RuntimeError, match='404'):
+        client.open(str(tmp_path / "missing.exo"))
+    assert client.runs() == []
+
+    link = tmp_path / "link.exo"
+    os.symlink(helios_file, link)
+    remote = client.open(str(link))
+    local = HeliosData(helios_file)
+    local.process()
+    assert np.array_equal(remote.field('time_edges', rows=(0, -1)), local.get('time_edges')[:-1])
+    assert np.array_equal(remote.field('mass_density', rows=(0, -1)), local.get('mass_density')[:-1])
+    assert np.array_equal(remote.field('zone_boundaries', rows=(-3, None), zones=(-5, -1)),
+                          local.get('zone_boundaries')[-3:, -6:-1])
+    assert np.array_equal(remote.lineout([20, 40], 'pressure'), local.lineout([20, 40], 'pressure'))
+    remote.select(zone_range=(0, 10))
+    assert remote.get('mass_density').shape[1] == 10
+    assert len(pool.runs) == 2
+    client.close(str(link))
+    assert client.runs() == []
+
+
+def test_resident_size_counts_memoized_results(tmp_path):
+    path = str(write_helios_file(tmp_path / "run.exo"))
+    run = RunPool().get(path)
+    before = run.nbytes()
+    grid_edges, values = run.helios.remap('mass_density', n_radius=2000)
+    assert run.nbytes() >= before + values.nbytes + grid_edges.nbytes
+    # 跟随模式的预留容量按整个存储计
+    density = run.helios.data['mass_density']
+    buf = np.empty((4 * len(density),) + density.shape[1:])
+    buf[:len(density)] = density
+    run.helios._buffers['mass_density'] = buf
+    run.helios.data['mass_density'] = buf[:len(density)]
+    assert run.helios.resident_bytes() >= buf.nbytes + values.nbytes
@@ -0,0 +1,73 @@
+"""
+分块压缩存储测试
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from pyhelios.dataio import FIELDS, HeliosData
+from pyhelios.store import StoreReader, main
+
+
+def test_store_round_trip(helios_file, tmp_path):
+    helios = HeliosData(helios_file)
+    helios.process()
+    helios.get('pressure')
+    path = helios.to_store(str(tmp_path / "run.phstore"), chunk_rows=8)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    assert meta['provenance']['source']['path'] == os.path.abspath(helios_file)
+    assert len(os.listdir(os.path.join(path, 'mass_density'))) == 5
+
+    stored = HeliosData(path)
+    stored.process()
+    assert stored.raw_data is None and stored.n_times == helios.n_times
+    for name in FIELDS:
+        assert np.array_equal(stored.get(name), helios.get(name)), name
+    # 分析结果直接取自存储
+    assert helios.result_name('shock_pos') in stored._cache_entry
+    assert np.array_equal(stored.get('shock_pos'), helios.get('shock_pos'))
+    assert stored.refresh() == 0
+    with pytest.raises(FileExistsError):
+        helios.to_store(path)
+
+
+def test_store_reads_only_needed_chunks(helios_file, tmp_path, monkeypatch):
+    helios = HeliosData(helios_file)
+    path = helios.to_store(str(tmp_path / "run.phstore"), chunk_rows=8)
+    helios.process()
+    opened = []
+    real_open = open
+
+    def tracking_open(file, *args, **kwargs):
+        opened.append(os.path.relpath(str(file), path))
+        return real_open(file, *args, **kwargs)
+
+    reader = StoreReader(path)
+    monkeypatch.setattr('builtins.open', tracking_open)
+    window = reader.load('mass_density', slice(10, 14))
+    assert np.array_equal(window, helios.get('mass_density')[10:14])
+    assert opened == [os.path.join('mass_density', '1')]
+    monkeypatch.undo()
+
+    time = helios.get('time_whole')
+    subset = HeliosData(path, time_range=(time[9], time[30]), zone_range=(5, 20), time_stride=3)
+    subset.process()
+    reference = HeliosData(helios_file, time_range=(time[9], time[30]), zone_range=(5, 20), time_stride=3)
+    reference.process()
+    assert subset.n_times == reference.n_times
+    for name in ('mass_density', 'zone_boundaries', 'time_edges', 'radius_edges', 'volume'):
+        assert np.allclose(subset.get(name), reference.get(name)), name
+    assert np.array_equal(subset.get('shock_pos'), reference.get('shock_pos'))
+
+
+def test_store_cli_streams_in_chunks(helios_file, tmp_path):
+    assert main([helios_file, '-o', str(tmp_path), '--chunk-rows', '16']) == 0
+    stored = HeliosData(str(tmp_path / "run.phstore"), chunk_size=5)
+    stored.process()
+    reference = HeliosData(helios_file)
+    reference.process()
+    assert np.array_equal(stored.get('max_pressure'), reference.get('max_pressure'))
+    assert np.allclose(stored.get('radius_edges'), reference.get('radius_edges'))
@@ -0,0 +1,50 @@
+"""
+合成数据与基准测试
+"""
+import numpy as np
+
+from pyhelios.benchmark import STAGES, compare, run_scale
+from pyhelios.dataio import HeliosData
+from pyhelios.synthetic import shock_error, write_synthetic
+
+
+def test_planted_shock_is_detected(tmp_path):
+    run = write_synthetic(tmp_path / "run.exo", nt=60, nr=50)
+    helios = HeliosData(run.path)
+    helios.process()
+    assert helios.get('mass_density').shape == (60, 50)
+    assert np.all(np.diff(run.front) >= 0)
+    error = shock_error(helios.get('shock_pos'), run, helios.get('zone_boundaries'))
+    assert error.max() <= 1.0
+
+
+def test_benchmark_scale(tmp_path):
+    result = run_scale(40, 30, work_dir=str(tmp_path), chunk_size=16)
+    assert set(result['stages']) == set(STAGES)
+    assert all(values['time'] > 0 for values in result['stages'].values())
+    assert result['shock_ok']
+    slower = {'bench': dict(result, stages={stage: {'time': values['time'] * 10, 'peak_bytes': values['peak_bytes']}
+                                            for stage, values in result['stages'].items()})}
+    assert compare(slower, {'bench': result}) == [('bench', stage, 'time', slower['bench']['stages'][stage]['time'],
+                                                   result['stages'][stage]['time']) for stage in STAGES]
+
+
+def test_benchmark_leaves_profiler_tracing(tmp_path):
+    import tracemalloc
+
+    import matplotlib
+
+    from pyhelios.profiling import PROFILER
+    backend = matplotlib.get_backend()
+    PROFILER.reset()
+    PROFILER.enable(memory=True)
+    try:
+        result = run_scale(30, 20, work_dir=str(tmp_path))
+        assert tracemalloc.is_tracing()
+        stages = PROFILER.summary()['stages']
+        assert stages['benchmark.process']['peak_bytes'] == result['stages']['process']['peak_bytes'] > 0
+    finally:
+        PROFILER.disable()
+        PROFILER.reset()
+    assert not tracemalloc.is_tracing()
+    assert matplotlib.get_backend() == backend
@@ -0,0 +1,128 @@
+"""
+监视目录自动处理测试
+"""
+import os
+
+import numpy as np
+import pytest
+
+from conftest import write_helios_file
+from pyhelios.watch import DONE, QUEUED, WatchDaemon
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def watch_env(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYHELIOS_CACHE_DIR', str(tmp_path / "cache"))
+    runs, out = tmp_path / "runs", tmp_path / "out"
+    runs.mkdir()
+    return runs, out
+
+
+def _daemon(runs, out, clock, **kwargs):
+    return WatchDaemon([str(runs)], str(out), workers=1, settle=10, clock=clock, plots=['max_pressure'], **kwargs)
+
+
+def test_waits_until_stable_then_processes(watch_env):
+    runs, out = watch_env
+    clock = FakeClock()
+    states = []
+    daemon = _daemon(runs, out, clock, progress=lambda record: states.append(record['state']))
+    path = write_helios_file(runs / "shot.exo", nt=20, nz=10)
+    daemon.step()
+    clock.now = 5
+    # 文件仍在增长
+    write_helios_file(runs / "shot.exo", nt=25, nz=10)
+    daemon.step()
+    clock.now = 12
+    daemon.step()
+    assert states == []
+    clock.now = 20
+    daemon.step()
+    assert states == ['queued', 'running', 'done']
+    record = daemon.ledger.get(path)
+    assert record['state'] == DONE and record['summary']['n_times'] == 25
+    series = np.load(record['series'])
+    assert len(series['shock_pos']) == len(series['max_pressure']) == 25
+    assert all(os.path.exists(f) for f in record['figures'])
+    assert os.listdir(os.environ['PYHELIOS_CACHE_DIR'])
+
+    # 重启后不再处理已完成的运行
+    restarted = _daemon(runs, out, clock)
+    restarted.step()
+    clock.now = 40
+    assert restarted.scan() == [] and restarted.idle
+    # 源文件改变后重新处理
+    write_helios_file(runs / "shot.exo", nt=30, nz=10)
+    restarted.step()
+    clock.now = 60
+    restarted.step()
+    assert restarted.ledger.get(path)['summary']['n_times'] == 30
+
+
+def test_restart_keeps_queued_runs(watch_env):
+    runs, out = watch_env
+    clock = FakeClock()
+    path = write_helios_file(runs / "shot.exo", nt=20, nz=10)
+    daemon = _daemon(runs, out, clock)
+    daemon.scan()
+    clock.now = 20
+    assert daemon.scan() == [path]
+    assert daemon.ledger.get(path)['state'] == QUEUED
+    # 进程在处理前退出
+    restarted = _daemon(runs, out, clock)
+    assert list(restarted.queue) == [path]
+    restarted.dispatch()
+    assert restarted.ledger.get(path)['state'] == DONE
+    with open(restarted.ledger.path) as f:
+        assert len(f.readlines()) == 3
+
+
+def test_failed_runs_retry_with_backoff(watch_env, monkeypatch):
+    import pyhelios.watch as watch
+    from pyhelios.core import PyHelios
+    runs, out = watch_env
+    clock = FakeClock()
+    calls = []
+    process_run = watch.process_run
+
+    def flaky(file_path, **kwargs):
+        calls.append(clock.now)
+        if len(calls) < 3:
+            raise OSError("No space left on device")
+        return process_run(file_path, **kwargs)
+
+    opened = []
+    load_and_process = PyHelios.load_and_process
+    monkeypatch.setattr(watch, 'process_run', flaky)
+    monkeypatch.setattr(PyHelios, 'load_and_process',
+                        lambda self, **kw: (opened.append(1), load_and_process(self, **kw)))
+    states = []
+    daemon = _daemon(runs, out, clock, retries=2, retry_delay=10,
+                     progress=lambda record: states.append((record['state'], record.get('attempts'))))
+    path = write_helios_file(runs / "shot.exo", nt=20, nz=10)
+    for now in (0, 20, 25, 30, 45, 50, 200):
+        clock.now = now
+        daemon.step()
+    # 第一次失败后等 10 秒重试，第二次失败后等 20 秒
+    assert calls == [20, 30, 50]
+    assert states == [('queued', 0), ('running', 0), ('error', 1), ('queued', 1), ('running', 1), ('error', 2),
+                      ('queued', 2), ('running', 2), ('done', None)]
+    assert daemon.ledger.get(path)['state'] == DONE
+    # 运行只打开与处理一次
+    assert len(opened) == 1
+
+    # 重试次数用完后不再处理，直到源文件改变
+    monkeypatch.setattr(watch, 'process_run', lambda file_path, **kwargs: 1 / 0)
+    write_helios_file(runs / "shot.exo", nt=22, nz=10)
+    for now in (300, 400, 500, 1000, 5000):
+        clock.now = now
+        daemon.step()
+    assert [r for r in states[9:] if r[0] == 'error'] == [('error', 1), ('error', 2), ('error', 3)]